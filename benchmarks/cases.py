@@ -0,0 +1,291 @@
+from dataclasses import dataclass
+
+import numpy as np
+import sympy as sp
+
+# Registered cases, in run order
+CASES = []
+
+
+@dataclass
+class Case:
+    group: str
+    name: str
+    setup: callable     # setup() -> the callable to time, so setup cost stays out of the numbers
+
+    @property
+    def key(self):
+        return f"{self.group}/{self.name}"
+
+
+def benchmark(group, sizes=(None,)):
+    # Register setup(size) once per size, named after the function and the size
+    def register(setup):
+        for size in sizes:
+            name = setup.__name__ if size is None else f"{setup.__name__}[{size}]"
+            CASES.append(Case(group, name, lambda size=size: setup(size) if size is not None else setup()))
+        return setup
+    return register
+
+
+def symbolic(func):
+    # SymPy caches results, so every timed call starts from an empty cache
+    def run():
+        sp.core.cache.clear_cache()
+        return func()
+    return run
+
+
+# Reference systems of increasing size: linear chains, then polynomial systems
+def linear_chain(n):
+    lines = ["dx1/dt = s - k*x1"] + [f"dx{i}/dt = k*x{i - 1} - k*x{i}" for i in range(2, n + 1)]
+    return "\n".join(lines)
+
+
+SYSTEMS = {
+    'linear-2': linear_chain(2),
+    'linear-4': linear_chain(4),
+    'linear-8': linear_chain(8),
+    'pitchfork': "dx/dt = r*x - x**3\ndy/dt = -y",
+    'lotka-volterra': "dx/dt = x*(a - b*y)\ndy/dt = y*(d*x - c)",
+    'lorenz': "dx/dt = s*(y - x)\ndy/dt = x*(r - z) - y\ndz/dt = x*y - b*z",
+    'competition-3': "dx/dt = x*(1 - x - a*y - b*z)\ndy/dt = y*(1 - c*x - y - d*z)\ndz/dt = z*(1 - e*x - f*y - z)",
+    'quintic': "dx/dt = x**5 - x - 1\ndy/dt = x - y",
+}
+
+
+def coupled_cubic(n):
+    # n bistable units in a ring: 3^n candidate roots, so Newton has work to do
+    lines = [f"dx{i}/dt = r*x{i} - x{i}**3 + c*x{(i + 1) % n}" for i in range(n)]
+    return "\n".join(lines)
+
+
+# Right-hand sides
+
+@benchmark("rhs", sizes=('two', 'three'))
+def compartment_rhs(size):
+    from util.ensemble import MODELS
+
+    model = MODELS['Two compartment' if size == 'two' else 'Three compartment']
+    graph = model.graph(*model.defaults)
+    y = np.asarray(model.y0, dtype=float)
+    return lambda: graph.rhs(10.0, y)
+
+
+@benchmark("rhs", sizes=(20, 200, 2000))
+def phase_model_grid(size):
+    from util.pages.phase import model
+
+    Y1, Y2 = np.meshgrid(np.linspace(-10, 20, size), np.linspace(0, 60, size))
+    y = [Y1, np.zeros_like(Y1), Y2]
+    return lambda: model(y, 0, 'wake')
+
+
+@benchmark("rhs", sizes=(100, 1000))
+def network_rhs(size):
+    from util.compartments import parse_network
+    from util.pages.network import chain
+
+    graph, y0 = parse_network(chain(size))
+    return lambda: graph.rhs(10.0, y0)
+
+
+# 100-day simulations
+
+def _hundred_days(name):
+    from util.ensemble import MODELS
+
+    model = MODELS[name]
+    t = np.arange(0.0, 24 * 100, 0.01)
+    return model, t
+
+
+@benchmark("simulate", sizes=('two', 'three'))
+def propagate_100_days(size):
+    from util.propagator import propagate
+
+    model, t = _hundred_days('Two compartment' if size == 'two' else 'Three compartment')
+    systems = model.system(*model.defaults)
+    return lambda: propagate(systems, model.y0, t)
+
+
+def two_compartment_odeint(y, t, a12_wake, A_wake, A_sleep, a, k):
+    # The simulation pages' right-hand sides before the propagator, as odeint called them
+    awake = (t % 24 >= 8) & (t % 24 < 24)
+    a12 = a12_wake * awake + a * a12_wake * (1 - awake)
+    return [A_wake * awake + A_sleep * (1 - awake) - a12 * y[0], a12 * y[0] - k * y[1]]
+
+
+def three_compartment_odeint(y, t, A_wake, A_sleep, a12_wake, k, a, a13_wake, a23_wake):
+    awake = (t % 24 >= 8) & (t % 24 < 24)
+    scale = awake + a * (1 - awake)
+    a12, a13, a23 = a12_wake * scale, a13_wake * scale, a23_wake * scale
+    B, C, P = y
+    return [A_wake * awake + A_sleep * (1 - awake) - (a12 + a13) * B, a12 * B - a23 * C, a23 * C + a13 * B - k * P]
+
+
+@benchmark("simulate", sizes=('two', 'three'))
+def odeint_100_days(size):
+    # Reference for propagate_100_days: the original pages' solve
+    from scipy.integrate import odeint
+
+    model, t = _hundred_days('Two compartment' if size == 'two' else 'Three compartment')
+    rhs = two_compartment_odeint if size == 'two' else three_compartment_odeint
+    return lambda: odeint(rhs, model.y0, t, args=model.defaults)
+
+
+@benchmark("simulate", sizes=('two', 'three'))
+def lsoda_100_days(size):
+    from util.integrate import integrate_segmented
+
+    model, t = _hundred_days('Two compartment' if size == 'two' else 'Three compartment')
+    graph = model.graph(*model.defaults)
+    return lambda: integrate_segmented(graph.rhs, model.y0, (t[0], t[-1]), t, 'LSODA')
+
+
+@benchmark("simulate", sizes=('two', 'three'))
+def periodic_state(size):
+    from util.steady_state import periodic_linear
+
+    model, _ = _hundred_days('Two compartment' if size == 'two' else 'Three compartment')
+    systems = model.system(*model.defaults)
+    return lambda: periodic_linear(systems)
+
+
+# Phase plane
+
+@benchmark("phase_plane", sizes=(20, 100, 400))
+def plot_phase_plane(size):
+    from util.pages.phase import plot_phase_plane
+
+    y1, y2 = np.linspace(-10, 20, size), np.linspace(0, 60, size)
+    return lambda: plot_phase_plane(y1, y2, 'wake', 'Brain', 'Plasma', 10.0, 40.0, "bench", nullclines=True,
+                                    n_trajectories=100, kind='stable node')
+
+
+@benchmark("phase_plane", sizes=(100, 1000))
+def trajectories(size):
+    from util.newton import seeds
+    from util.pages.two_phase import model
+    from util.phase_plane import trajectories
+
+    box = [(0, 800), (0, 200)]
+    start = seeds(box, size)
+    return lambda: trajectories(lambda y: model(y, 0, 'wake'), start, 24.0, bounds=box)
+
+
+# Equilibria
+
+@benchmark("equilibrium", sizes=tuple(SYSTEMS))
+def find_equilibrium(size):
+    from util.pages.equilibrium import find_equilibrium
+
+    equations = SYSTEMS[size].split('\n')
+    variables = [eq.split('=')[0].strip().split('/')[0][1:] for eq in equations]
+    return symbolic(lambda: find_equilibrium(equations, variables))
+
+
+@benchmark("equilibrium", sizes=(2, 10, 20))
+def find_equilibria(size):
+    from util.kernels import compile_system
+    from util.newton import find_equilibria
+
+    compiled = compile_system(coupled_cubic(size))
+    values = {'r': 1.0, 'c': 0.1}
+    return lambda: find_equilibria(compiled, values, [(-2, 2)] * size, n_seeds=500)
+
+
+@benchmark("equilibrium", sizes=(2, 10))
+def equilibria_on_grid(size):
+    from util.kernels import compile_system
+    from util.newton import equilibria_on_grid
+
+    compiled = compile_system(coupled_cubic(size))
+    grid = np.linspace(-1, 1, 101)[None]
+    return lambda: equilibria_on_grid(compiled, {'r': 1.0, 'c': 0.1}, ['r'], grid, [(-2, 2)] * size, n_seeds=16)
+
+
+# Bifurcation
+
+def _bifurcation(system_name, points):
+    from util.kernels import parse_system
+    from util.pages.bifurcation import bifurcation_curves, equilibrium_kernels, solve_equilibrium
+
+    system = parse_system(SYSTEMS[system_name])
+    kernels = equilibrium_kernels(system, solve_equilibrium(system))
+    swept = system.parameters[0]
+    constants = {p: 1.0 for p in system.parameters[1:]}
+    return bifurcation_curves, (system, kernels, swept, (0.1, 10.0, points), constants), swept
+
+
+@benchmark("bifurcation", sizes=('pitchfork', 'lorenz'))
+def equilibrium_kernels(size):
+    from util.kernels import parse_system
+    from util.pages.bifurcation import equilibrium_kernels, solve_equilibrium
+
+    system = parse_system(SYSTEMS[size])
+    points = solve_equilibrium(system)
+    return symbolic(lambda: equilibrium_kernels(system, points))
+
+
+@benchmark("bifurcation", sizes=(100, 10000, 1000000))
+def bifurcation_curves(size):
+    curves, args, _ = _bifurcation('lorenz', size)
+    return lambda: curves(*args)
+
+
+@benchmark("bifurcation", sizes=(100, 10000))
+def plot_bifurcation(size):
+    from util.pages.bifurcation import plot_bifurcation
+
+    curves, args, swept = _bifurcation('pitchfork', size)
+    evaluated = curves(*args)
+    return lambda: plot_bifurcation(evaluated, swept)
+
+
+# Rendering
+
+@benchmark("render", sizes=(2000, 240000))
+def line_figure_png(size):
+    import io
+    import matplotlib.pyplot as plt
+
+    t = np.linspace(0, 2400, size)
+    y = np.sin(t)
+
+    def run():
+        fig, ax = plt.subplots(figsize=(12, 4))
+        ax.plot(t, y)
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=200, bbox_inches='tight')
+        plt.close(fig)
+    return run
+
+
+@benchmark("render", sizes=(240000,))
+def decimated_line_figure_png(size):
+    import io
+    import matplotlib.pyplot as plt
+    from util.timeseries import decimate
+
+    t = np.linspace(0, 2400, size)
+    y = np.sin(t)
+
+    def run():
+        fig, ax = plt.subplots(figsize=(12, 4))
+        ax.plot(*decimate(t, y, t[0], t[-1]))
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=200, bbox_inches='tight')
+        plt.close(fig)
+    return run
+
+
+@benchmark("render", sizes=(240000,))
+def line_panels_png(size):
+    # Three decimated panels drawn on the reused template figure
+    from util.render import encode, line_panels
+    from util.timeseries import decimate
+
+    t = np.linspace(0, 2400, size)
+    series = [(*decimate(t, np.sin(k * t), t[0], t[-1]), f"y{k}") for k in (1, 2, 3)]
+    return lambda: encode(line_panels(series, (t[0], t[-1]), markers=np.arange(0, 2400, 100.0)), 'png')
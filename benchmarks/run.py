@@ -0,0 +1,140 @@
+# Headless benchmarks of the hot paths: python benchmarks/run.py [-k pattern] [--baseline file]
+#
+# Results are written as JSON (benchmarks/results/latest.json by default) and compared with
+# benchmarks/baseline.json when it exists; --save-baseline replaces the baseline.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import matplotlib
+matplotlib.use("Agg")
+
+from benchmarks.cases import CASES
+
+BASELINE = os.path.join(HERE, "baseline.json")
+RESULTS = os.path.join(HERE, "results", "latest.json")
+
+
+def measure(func, repeat=5, min_time=0.05, budget=10.0):
+    """Seconds per call: each of `repeat` rounds runs enough calls to last min_time.
+
+    Rounds stop early once budget seconds are spent, after at least three.
+    """
+    began = time.perf_counter()
+    func()
+    first = time.perf_counter() - began
+    loops = max(1, int(min_time / max(first, 1e-9)))
+    times = []
+    spent = first
+    for _ in range(repeat):
+        began = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - began
+        times.append(elapsed / loops)
+        spent += elapsed
+        if len(times) >= 3 and spent > budget:
+            break
+    return {"median": statistics.median(times), "min": min(times), "loops": loops, "rounds": len(times)}
+
+
+def environment():
+    import numpy
+    import scipy
+    import sympy
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "numpy": numpy.__version__, "scipy": scipy.__version__,
+            "sympy": sympy.__version__, "matplotlib": matplotlib.__version__, "machine": platform.machine(),
+            "processor": platform.processor(), "cpus": os.cpu_count(), "commit": commit,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def run(pattern="", repeat=5, budget=10.0):
+    results = {}
+    for case in CASES:
+        if pattern not in case.key:
+            continue
+        func = case.setup()
+        results[case.key] = measure(func, repeat, budget=budget)
+        print(f"{case.key:55s} {format_time(results[case.key]['median']):>10s}", flush=True)
+    return {"environment": environment(), "results": results}
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def compare(current, baseline, threshold=0.25):
+    """Rows (case, baseline, current, ratio, verdict) by best round time, the least noisy statistic."""
+    rows = []
+    for key, result in current["results"].items():
+        if key not in baseline["results"]:
+            rows.append((key, None, result["min"], None, "new"))
+            continue
+        before = baseline["results"][key]["min"]
+        ratio = result["min"] / before
+        verdict = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 / (1 + threshold) else ""
+        rows.append((key, before, result["min"], ratio, verdict))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the hot paths and compare with a baseline.")
+    parser.add_argument("-k", dest="pattern", default="", help="only cases whose group/name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per case")
+    parser.add_argument("--budget", type=float, default=10.0, help="seconds per case before rounds stop early")
+    parser.add_argument("--out", default=RESULTS, help="where to write the results JSON")
+    parser.add_argument("--baseline", default=BASELINE, help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative change reported as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on a regression")
+    args = parser.parse_args(argv)
+
+    current = run(args.pattern, args.repeat, args.budget)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with; run with --save-baseline to store one.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print(f"\nAgainst the baseline of {baseline['environment'].get('time', '?')} "
+          f"(commit {baseline['environment'].get('commit') or '?'}):")
+    regressions = 0
+    for key, before, after, ratio, verdict in compare(current, baseline, args.threshold):
+        if ratio is None:
+            print(f"{key:55s} {'':>10s} {format_time(after):>10s} {'':>7s} {verdict}")
+            continue
+        print(f"{key:55s} {format_time(before):>10s} {format_time(after):>10s} {ratio:6.2f}x {verdict}")
+        regressions += verdict == "slower"
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
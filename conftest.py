@@ -0,0 +1 @@
+# Lets `pytest` import util and benchmarks from the repository root, as the app does
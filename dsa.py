@@ -1,23 +1,28 @@
 import warnings
 warnings.simplefilter(action="ignore", category=FutureWarning)
 import streamlit as st
+
+# Must be the first Streamlit call of every run
+st.set_page_config(layout="wide")
+
 from multiapp import MultiApp
-from util.pages.home_page import home_page
-from util.pages.equilibrium import equilibrium
-from util.pages.phase import main
-from util.pages.two_phase import two_phase
-from util.pages.bifurcation import bifurcation_page
-from util.pages.two_compartment_sim import sim
-from util.pages.three_compartment_sim import sim_three_compartment
+from util.pages.instrumentation import instrumentation_panel
+from util.pages.startup_report import startup_report
 
 app = MultiApp()
 
-app.add_app("Home Page", home_page)
-app.add_app("Equilibrium Analysis", equilibrium)
-app.add_app("Phase Plane Analysis", main)
-app.add_app("2C Phase Analysis", two_phase)
-app.add_app("Bifurcation Analysis", bifurcation_page)
-app.add_app("Two Compartment Simulation", sim)
-app.add_app("Three Compartment Simulation", sim_three_compartment)
+# Pages are imported the first time they are opened, so a new worker only loads what it shows
+app.add_app("Home Page", "util.pages.home_page:home_page")
+app.add_app("Equilibrium Analysis", "util.pages.equilibrium:equilibrium")
+app.add_app("Phase Plane Analysis", "util.pages.phase:main")
+app.add_app("2C Phase Analysis", "util.pages.two_phase:two_phase")
+app.add_app("Phase Portrait", "util.pages.portrait:portrait_page")
+app.add_app("Bifurcation Analysis", "util.pages.bifurcation:bifurcation_page")
+app.add_app("Two Compartment Simulation", "util.pages.two_compartment_sim:sim")
+app.add_app("Three Compartment Simulation", "util.pages.three_compartment_sim:sim_three_compartment")
+app.add_app("Sensitivity Analysis", "util.pages.sensitivity:sensitivity_page")
+app.add_app("Parameter Fitting", "util.pages.fitting:fitting_page")
+app.add_app("Compartment Network", "util.pages.network:network_page")
 app.run()
-
+instrumentation_panel(app.last_run)
+startup_report(app)
@@ -1,20 +1,49 @@
+import importlib
+import sys
+import time
+
 import streamlit as st
 
+from util import instrument
+
+# Seconds spent importing each page module, the first time this process opened it
+LOAD_TIMES = {}
+
 class MultiApp:
     def __init__(self):
         self.apps = []
+        self.last_run = None     # instrumentation record of the page run by run()
 
     def add_app(self, title, func):
+        # func is a callable, or a 'module:function' path imported when the page is first opened
         self.apps.append({
             "title": title,
             "function": func
         })
 
+    def load(self, app):
+        func = app['function']
+        if not isinstance(func, str):
+            return func
+        module, _, name = func.partition(':')
+        if module not in sys.modules:
+            began = time.perf_counter()
+            importlib.import_module(module)
+            LOAD_TIMES[module] = time.perf_counter() - began
+        return getattr(sys.modules[module], name)
+
+    def modules(self):
+        return [app['function'].partition(':')[0] for app in self.apps if isinstance(app['function'], str)]
+
     def run(self):
         app = st.sidebar.selectbox(
             'Navigation',
             self.apps,
             format_func=lambda app: app['title'])
 
-        app['function']()
-
+        # The panel's checkbox decides before the page runs whether allocations are traced
+        trace = st.session_state.get("instrument_trace", False)
+        with instrument.rerun(app['title'], trace) as self.last_run:
+            with instrument.stage("import"):
+                func = self.load(app)
+            func()
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from util.compartments import DENSE_LIMIT, CompartmentGraph, parse_network, periodic_state, simulate
+from util.propagator import propagate
+from util.schedule import Schedule
+from util.steady_state import periodic_linear
+
+
+def network(n, schedule, seed=0):
+    # A chain with a few side routes back up it and elimination from every tenth compartment
+    rng = np.random.default_rng(seed)
+    graph = CompartmentGraph(schedule=schedule)
+    graph.add_input('C0', 50.0, 10.0)
+    for i in range(n - 1):
+        graph.add_transfer(f'C{i}', f'C{i + 1}', rng.uniform(0.3, 1.0), rng.uniform(0.5, 1.5))
+    for i in rng.choice(np.arange(1, n), 20, replace=False):
+        graph.add_transfer(f'C{i}', f'C{rng.integers(i)}', rng.uniform(0.05, 0.2))
+    for i in range(0, n, 10):
+        graph.add_transfer(f'C{i}', None, 0.1)
+    graph.add_transfer(f'C{n - 1}', None, 0.5)
+    return graph
+
+
+@pytest.fixture(scope="module")
+def large():
+    graph = network(DENSE_LIMIT + 50, Schedule.daily(22.0, 8.0))
+    assert len(graph) > DENSE_LIMIT
+    return graph
+
+
+@pytest.mark.parametrize("t", [np.arange(0.0, 60.0, 0.5), np.array([0.0, 0.3, 5.0, 22.0, 22.1, 30.0, 47.9])],
+                         ids=["uniform", "irregular"])
+def test_sparse_simulation_matches_the_dense_propagator(large, t):
+    y0 = np.linspace(0.0, 5.0, len(large))
+    sparse = simulate(large, y0, t)
+    dense = propagate(large.systems(), y0, t, schedule=large.schedule)
+    np.testing.assert_allclose(sparse, dense, rtol=1e-8, atol=1e-10 * np.abs(dense).max())
+
+
+def test_sparse_periodic_state_matches_the_dense_solver(large):
+    y = periodic_state(large)
+    orbit = periodic_linear(large.systems(), dt=1.0, schedule=large.schedule)
+    np.testing.assert_allclose(y, orbit.y0, rtol=1e-7, atol=1e-10 * np.abs(orbit.y0).max())
+    # One period from it returns to it
+    period = simulate(large, y, [0.0, large.schedule.period])
+    np.testing.assert_allclose(period[-1], y, rtol=1e-7, atol=1e-10 * np.abs(y).max())
+
+
+def test_network_text():
+    graph, y0 = parse_network("-> A: 2, 1\nA -> B: 0.5, 2  # asleep twice as fast\nB -> : 0.1\nB = 3")
+    assert graph.compartments == ['A', 'B']
+    np.testing.assert_array_equal(y0, [0.0, 3.0])
+    np.testing.assert_array_equal(graph.rate_matrix('sleep', dense=True), [[-1.0, 0.0], [1.0, -0.1]])
+    np.testing.assert_array_equal(graph.input_vector('sleep'), [1.0, 0.0])
+    with pytest.raises(ValueError, match="line 2"):
+        parse_network("A -> B: 1\nA -> B: fast")
@@ -0,0 +1,28 @@
+import numpy as np
+
+from util.continuation import newton_equilibrium, trace
+from util.kernels import compile_system
+
+
+def test_fold_of_the_saddle_node():
+    compiled = compile_system("dx/dt = r - x**2", use_disk=False)
+    x0, ok = newton_equilibrium(compiled, {"r": 1.0}, [1.0])
+    assert ok
+    branch = trace(compiled, "r", {}, x0, 1.0, (-1.0, 2.0))
+    assert branch.converged
+    folds = [point for point in branch.special if point["kind"] == "LP"]
+    assert len(folds) == 1
+    assert abs(folds[0]["parameter"]) < 1e-8 and abs(folds[0]["state"][0]) < 1e-4
+    # Upper half stable, lower half unstable
+    np.testing.assert_array_equal(branch.stable, branch.states[:, 0] > 0)
+    np.testing.assert_allclose(branch.states[:, 0] ** 2, branch.parameter, atol=1e-8)
+
+
+def test_hopf_of_the_normal_form():
+    compiled = compile_system("dx/dt = mu*x - y - x*(x**2 + y**2)\ndy/dt = x + mu*y - y*(x**2 + y**2)",
+                              use_disk=False)
+    branch = trace(compiled, "mu", {}, [0.0, 0.0], -1.0, (-1.0, 1.0))
+    hopf = [point for point in branch.special if point["kind"] == "H"]
+    assert len(hopf) == 1 and abs(hopf[0]["parameter"]) < 1e-6
+    np.testing.assert_array_equal(branch.stable, branch.parameter < 0)
+    assert branch.parameter.min() <= -1.0 + 1e-9 and branch.parameter.max() >= 1.0
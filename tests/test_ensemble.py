@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from util.ensemble import MODELS, run_ensemble, simulate
+from util.propagator import propagate
+from util.steady_state import periodic_linear
+
+MODEL = MODELS['Two compartment']
+
+
+def samples(count):
+    scale = np.random.default_rng(2).uniform(0.8, 1.2, (count, len(MODEL.defaults)))
+    return scale * np.asarray(MODEL.defaults)
+
+
+def test_every_row_matches_its_own_simulation():
+    P = samples(4)
+    t, Y, _ = simulate(MODEL, P, days=3, dt=0.1, start='initial')
+    for row, y in zip(P, Y):
+        np.testing.assert_allclose(y, propagate(MODEL.system(*row), MODEL.y0, t), rtol=1e-8)
+
+
+def test_periodic_start_is_on_the_cycle():
+    P = samples(3)
+    t, Y, summaries = simulate(MODEL, P, dt=0.1)
+    assert t[-1] == pytest.approx(24.0)
+    for row, y, peak in zip(P, Y, summaries['Brain', 'peak']):
+        orbit = periodic_linear(MODEL.system(*row))
+        np.testing.assert_allclose(y[0], orbit.y0, rtol=1e-8)
+        np.testing.assert_allclose(y[-1], orbit.y0, rtol=1e-6)
+        assert peak == pytest.approx(orbit.y[:, 0].max(), rel=1e-3)
+
+
+def test_periodic_start_takes_no_days():
+    with pytest.raises(ValueError):
+        simulate(MODEL, samples(1), days=10, start='periodic')
+
+
+def test_chunks_join_in_order():
+    P = samples(10)
+    whole = run_ensemble('Two compartment', P, chunk=10, workers=1)
+    chunked = run_ensemble('Two compartment', P, chunk=3, workers=1)
+    for key in whole:
+        np.testing.assert_array_equal(whole[key], chunked[key])
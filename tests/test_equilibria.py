@@ -0,0 +1,99 @@
+import sympy as sp
+import pytest
+
+from util.equilibria import MAX_BRANCHES, solve_equilibria
+from util.kernels import parse_system
+
+
+def solve(text):
+    system = parse_system(text)
+    return solve_equilibria(system.expressions, system.state_symbols)
+
+
+def as_set(solutions):
+    return {tuple(sorted((str(k), sp.simplify(v)) for k, v in s.items())) for s in solutions}
+
+
+def residuals_vanish(text, solutions):
+    system = parse_system(text)
+    for solution in solutions:
+        for expr in system.expressions:
+            assert abs(complex(sp.N(expr.subs(solution)))) < 1e-8
+
+
+def reference(text):
+    system = parse_system(text)
+    return sp.solve([sp.Eq(e, 0) for e in system.expressions], system.state_symbols, dict=True)
+
+
+@pytest.mark.parametrize("text", [
+    "dx1/dt = s - k*x1\ndx2/dt = k*x1 - k*x2\ndx3/dt = k*x2 - k*x3",
+    "dx/dt = a*x + b*y - 1\ndy/dt = c*x - y + 2",
+])
+def test_linear_matches_sympy(text):
+    solutions, method = solve(text)
+    assert method == 'linear'
+    assert as_set(solutions) == as_set(reference(text))
+
+
+def test_float_coefficients_use_numpy():
+    text = "dB/dt = 55.5 - 0.0737*B\ndP/dt = 0.0737*B - 0.3466*P"
+    solutions, method = solve(text)
+    assert method == 'linear' and len(solutions) == 1
+    residuals_vanish(text, solutions)
+
+
+def test_singular_linear_systems():
+    # A line of equilibria, and none at all
+    solutions, _ = solve("dx/dt = y - x\ndy/dt = x - y")
+    assert as_set(solutions) == as_set(reference("dx/dt = y - x\ndy/dt = x - y"))
+    assert solve("dx/dt = x + y - 1\ndy/dt = x + y - 2")[0] == []
+
+
+@pytest.mark.parametrize("text", ["dx/dt = r*x - x**3\ndy/dt = -y", "dx/dt = x*(a - b*y)\ndy/dt = y*(d*x - c)"])
+def test_small_polynomial_systems_go_to_sympy(text):
+    solutions, method = solve(text)
+    assert method == 'general'
+    assert as_set(solutions) == as_set(reference(text))
+
+
+def test_competition_of_three_species():
+    text = "dx/dt = x*(1 - x - a*y - b*z)\ndy/dt = y*(1 - c*x - y - d*z)\ndz/dt = z*(1 - e*x - f*y - z)"
+    solutions, method = solve(text)
+    assert method == 'polynomial'
+    assert len(solutions) == 8
+    assert {sp.Symbol(v): 0 for v in 'xyz'} in solutions
+    for solution in solutions:
+        for expr in parse_system(text).expressions:
+            assert sp.cancel(expr.subs(solution)) == 0
+
+
+def test_numeric_quintic_has_every_root():
+    text = "dx/dt = x**5 - x - 1\ndy/dt = x - y"
+    solutions, method = solve(text)
+    assert method == 'polynomial' and len(solutions) == 5
+    assert sum(1 for s in solutions if s[sp.Symbol('x')].is_real) == 1
+    residuals_vanish(text, solutions)
+
+
+def test_zeros_of_a_denominator_are_dropped():
+    solutions, _ = solve("dx/dt = (x - 1)*(x - 2)/(x - 1) + y\ndy/dt = y")
+    assert as_set(solutions) == {(('x', 2), ('y', 0))}
+
+
+def test_inconsistent_polynomial_system():
+    assert solve("dx/dt = x**2 + 1 - y\ndy/dt = y - x**2")[0] == []
+
+
+def test_too_many_branches_fall_back_to_sympy():
+    n = 9
+    assert 2 ** n > MAX_BRANCHES
+    text = "\n".join(f"dx{i}/dt = x{i}*(x{i} - 1)" for i in range(n))
+    solutions, method = solve(text)
+    assert method == 'general' and len(solutions) == 2 ** n
+
+
+def test_non_polynomial_system():
+    solutions, method = solve("dx/dt = sin(x)\ndy/dt = exp(y) - 1")
+    assert method == 'general'
+    assert as_set(solutions) == as_set(reference("dx/dt = sin(x)\ndy/dt = exp(y) - 1"))
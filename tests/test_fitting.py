@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from util.ensemble import MODELS
+from util.fitting import fit, predict, read_measurements
+from util.schedule import Schedule
+
+MODEL = MODELS['Two compartment']
+
+
+def measurements(params, t, noise=0.0, seed=0, **kwargs):
+    y = predict(MODEL, params, t, **kwargs)
+    y = y * (1 + noise * np.random.default_rng(seed).standard_normal(y.shape))
+    return dict(zip(MODEL.compartments, y.T))
+
+
+def test_recovers_parameters_from_noisy_data():
+    truth = np.array(MODEL.defaults) * [1.0, 1.3, 0.8, 1.0, 1.2]
+    t = np.arange(24.0 * 97, 24 * 100, 1.0)
+    data = measurements(truth, t, noise=0.01)
+    fitted = ('A_wake', 'A_sleep', 'k')
+    result = fit('Two compartment', MODEL.defaults, fitted, t, data, n_starts=2, workers=1)
+    assert result.success
+    expected = truth[[MODEL.parameters.index(p) for p in fitted]]
+    # Sleep-time input is only weakly identified, so compare against the reported errors
+    assert np.all(np.abs(result.values - expected) < 3 * result.stderr)
+    np.testing.assert_allclose(result.values, expected, rtol=0.15)
+    assert np.all((result.lower < expected) & (expected < result.upper))
+    assert result.rmse == pytest.approx(0.01, rel=0.3)
+
+
+def test_recovers_parameters_under_a_shifted_protocol():
+    schedule = Schedule.daily(22.0, 8.0)
+    truth = np.array(MODEL.defaults) * [1.2, 0.9, 1.0, 1.0, 1.0]
+    t = np.arange(0.0, 72.0, 2.0)
+    data = measurements(truth, t, start='initial', schedule=schedule)
+    result = fit('Two compartment', MODEL.defaults, ('a12_wake', 'A_wake'), t, data, start='initial',
+                 n_starts=1, workers=1, schedule=schedule)
+    np.testing.assert_allclose(result.values, truth[[0, 1]], rtol=1e-4)
+
+
+def test_measurements_are_sorted_and_keep_missing_values():
+    t, data = read_measurements(b"t,brain,Plasma\n2,1.5,\n0,1.0,3.0\n")
+    np.testing.assert_array_equal(t, [0.0, 2.0])
+    np.testing.assert_array_equal(data['brain'], [1.0, 1.5])
+    assert data['Plasma'][0] == 3.0 and np.isnan(data['Plasma'][1])
+
+
+def test_columns_that_name_no_compartment_are_rejected():
+    t, data = read_measurements("t,Liver,Kidney\n0,1,2\n1,2,3\n")
+    with pytest.raises(ValueError, match="compartment"):
+        fit('Two compartment', MODEL.defaults, ('k',), t, data, n_starts=1, workers=1)
+
+
+def test_ragged_rows_are_rejected():
+    with pytest.raises(ValueError):
+        read_measurements("t,Brain\n0,1\n1,2,3\n")
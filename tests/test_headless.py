@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from util import headless, kernels
+from util.compartments import periodic_state, simulate
+from util.ensemble import MODELS
+from util.headless import Run, main, read_output, run_batch, run_to_file
+from util.schedule import DAY
+from util.steady_state import periodic_linear
+
+MODEL = MODELS['Two compartment']
+DECAY = "dX/dt = -k*X\ndY/dt = k*X - m*Y"
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    # Compiled kernels of the equation runs stay out of the user's cache
+    monkeypatch.setattr(kernels, "KERNEL_DIR", str(tmp_path / "kernels"))
+    monkeypatch.setattr(kernels, "KEY_FILE", str(tmp_path / "config" / "cache.key"))
+    monkeypatch.setattr(kernels, "_compiled", {})
+
+
+def reference(params=MODEL.defaults, days=2.0, step=0.5, y0=MODEL.y0):
+    t = step * np.arange(int(24 * days / step) + 1)
+    return t, simulate(MODEL.graph(*params), np.asarray(y0, dtype=float), t)
+
+
+@pytest.mark.parametrize("fmt", headless.FORMATS)
+def test_chunked_model_run_matches_the_simulation(tmp_path, fmt):
+    if fmt == 'parquet':
+        pytest.importorskip("pyarrow")
+    run = Run(model='Two compartment', days=2.0, dt=0.1, stride=5)
+    path = str(tmp_path / f"run.{fmt}")
+    meta = run_to_file(run, path, chunk_rows=7)
+    columns, data = read_output(path)
+    t, y = reference()
+    assert columns == ['t', 'Brain', 'Plasma'] and meta['rows'] == len(t) == len(data)
+    np.testing.assert_allclose(data[:, 0], t, rtol=1e-12)
+    np.testing.assert_allclose(data[:, 1:], y, rtol=1e-9)
+    np.testing.assert_allclose(list(meta['final_state'].values()), y[-1], rtol=1e-9)
+
+
+def test_periodic_start_is_the_entrained_cycle(tmp_path):
+    path = str(tmp_path / "cycle.npy")
+    run_to_file(Run(model='Two compartment', start='periodic', days=3.0, dt=0.5), path, chunk_rows=10)
+    _, data = read_output(path)
+    orbit = periodic_linear(MODEL.graph(*MODEL.defaults).systems())
+    np.testing.assert_allclose(data[0, 1:], orbit.y0, rtol=1e-8)
+    # Every whole day lands back on the start state
+    np.testing.assert_allclose(data[::int(DAY / 0.5), 1:], np.tile(orbit.y0, (4, 1)), rtol=1e-7)
+
+
+def test_equation_run_matches_the_exact_solution(tmp_path):
+    run = Run(equations=DECAY, parameters={'k': 0.3, 'm': 0.1}, y0={'X': 2.0, 'Y': 0.0},
+              days=1.0, dt=0.25, method='LSODA')
+    path = str(tmp_path / "decay.npz")
+    run_to_file(run, path, chunk_rows=16)
+    columns, data = read_output(path)
+    t = data[:, 0]
+    X = 2.0 * np.exp(-0.3 * t)
+    Y = 2.0 * 0.3 / (0.1 - 0.3) * (np.exp(-0.3 * t) - np.exp(-0.1 * t))
+    assert columns == ['t', 'X', 'Y'] and t[-1] == 24.0
+    np.testing.assert_allclose(data[:, 1:], np.column_stack([X, Y]), rtol=1e-6, atol=1e-9)
+
+
+def test_invalid_runs_are_rejected(tmp_path):
+    path = str(tmp_path / "bad.npy")
+    with pytest.raises(ValueError, match="parameters"):
+        run_to_file(Run(equations=DECAY, parameters={'k': 0.3}, y0=[1.0, 0.0]), path)
+    with pytest.raises(ValueError, match="periodic"):
+        run_to_file(Run(equations=DECAY, parameters={'k': 0.3, 'm': 0.1}, y0=[1.0, 0.0], start='periodic'), path)
+    with pytest.raises(ValueError, match="exactly one"):
+        run_to_file(Run(), path)
+    with pytest.raises(ValueError, match="format"):
+        run_to_file(Run(model='Two compartment'), str(tmp_path / "bad.csv"))
+
+
+def test_command_line_run(tmp_path, capsys):
+    path = str(tmp_path / "brain.npy")
+    assert main(["--model", "Two compartment", "--set", "k=0.4", "--days", "2", "--dt", "0.5",
+                 "--y0", "100,10", "--out", path]) == 0
+    assert "97 rows x 3 columns" in capsys.readouterr().out
+    params = [0.4 if name == 'k' else v for name, v in zip(MODEL.parameters, MODEL.defaults)]
+    _, y = reference(params, y0=[100.0, 10.0])
+    np.testing.assert_allclose(read_output(path)[1][:, 1:], y, rtol=1e-9)
+
+    assert main(["--model", "Two compartment", "--set", "q=1", "--out", path]) == 1
+    assert "no parameters ['q']" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main(["--model", "Two compartment", "--equations", "x.txt", "--out", path])
+
+
+def test_csv_batch_writes_one_file_per_row(tmp_path):
+    table = tmp_path / "runs.csv"
+    table.write_text("k,A_wake\n0.3,50\n0.4,60\n")
+    out = tmp_path / "batch"
+    assert main(["--model", "Two compartment", "--params", str(table), "--days", "2", "--dt", "0.5",
+                 "--out", str(out), "--workers", "1"]) == 0
+    for i, (k, A_wake) in enumerate([(0.3, 50.0), (0.4, 60.0)]):
+        values = {'k': k, 'A_wake': A_wake}
+        params = [values.get(name, v) for name, v in zip(MODEL.parameters, MODEL.defaults)]
+        _, y = reference(params)
+        np.testing.assert_allclose(read_output(str(out / f"run_{i:04d}.npy"))[1][:, 1:], y, rtol=1e-9)
+
+
+def test_batch_in_worker_processes(tmp_path):
+    runs = [Run(model='Two compartment', start='periodic', days=1.0, dt=1.0, parameters={'k': k})
+            for k in (0.3, 0.4)]
+    metas = run_batch(runs, str(tmp_path), workers=2)
+    for run, meta in zip(runs, metas):
+        graph = MODEL.graph(*[run.parameters.get(n, v) for n, v in zip(MODEL.parameters, MODEL.defaults)])
+        np.testing.assert_allclose(list(meta['final_state'].values()), periodic_state(graph), rtol=1e-7)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from util.compartments import two_compartment
+from util.integrate import METHODS, integrate_segmented
+from util.propagator import propagate
+
+ARGS = (0.0737390, 55.557583, 7.348874, 1.01, 0.346573)
+Y0 = [600, 15.5]
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_segmented_matches_the_propagator(method):
+    graph = two_compartment(*ARGS)
+    t = np.arange(0.0, 72.0, 0.1)
+    sol, info = integrate_segmented(graph.rhs, Y0, (0.0, t[-1]), t, method, jac=graph.jac)
+    np.testing.assert_allclose(sol, propagate(graph.systems(), Y0, t), rtol=1e-6, atol=1e-6)
+    # One segment per sleep/wake block
+    assert info['segments'] == 6
+
+
+def test_output_for_a_window_only():
+    graph = two_compartment(*ARGS)
+    t = np.arange(0.0, 96.0, 0.1)
+    window = t[(t >= 50.0) & (t <= 70.0)]
+    sol, _ = integrate_segmented(graph.rhs, Y0, (0.0, 70.0), window)
+    np.testing.assert_allclose(sol, propagate(graph.systems(), Y0, t)[(t >= 50.0) & (t <= 70.0)], rtol=1e-6)
+
+
+def test_times_outside_the_span_are_rejected():
+    graph = two_compartment(*ARGS)
+    with pytest.raises(ValueError):
+        integrate_segmented(graph.rhs, Y0, (0.0, 24.0), [12.0, 30.0])
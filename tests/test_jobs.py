@@ -0,0 +1,31 @@
+import math
+import time
+
+import pytest
+
+from util.jobs import JobTimeout, _context, process_pool, run_job
+
+
+def test_workers_do_not_fork_the_server():
+    assert _context.get_start_method() in ("forkserver", "spawn")
+
+
+def test_run_job_returns_the_result():
+    assert run_job(math.factorial, 20) == math.factorial(20)
+
+
+def test_errors_are_raised_in_the_caller():
+    with pytest.raises(ValueError):
+        run_job(math.sqrt, -1.0)
+
+
+def test_timeout_kills_the_worker():
+    began = time.monotonic()
+    with pytest.raises(JobTimeout):
+        run_job(time.sleep, 30, timeout=0.5)
+    assert time.monotonic() - began < 10
+
+
+def test_process_pool():
+    with process_pool(2) as pool:
+        assert list(pool.map(math.factorial, range(5))) == [1, 1, 2, 6, 24]
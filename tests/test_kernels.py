@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from util import kernels
+from util.kernels import compile_system, parse_system
+
+LORENZ = "dx/dt = s*(y - x)\ndy/dt = x*(r - z) - y\ndz/dt = x*y - b*z"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(kernels, "KERNEL_DIR", str(tmp_path / "kernels"))
+    monkeypatch.setattr(kernels, "KEY_FILE", str(tmp_path / "config" / "cache.key"))
+    monkeypatch.setattr(kernels, "_compiled", {})
+    return tmp_path
+
+
+def test_kernels_match_sympy(cache):
+    system = parse_system(LORENZ)
+    compiled = compile_system(system)
+    p = compiled.params({"s": 10.0, "r": 28.0, "b": 8 / 3})
+    y = np.random.default_rng(1).normal(size=(3, 5))
+    F = sp.Matrix(system.expressions)
+    args = system.state_symbols + system.parameter_symbols
+    rhs = sp.lambdify(args, F)
+    jac = sp.lambdify(args, F.jacobian(system.state_symbols))
+    for i in range(y.shape[1]):
+        np.testing.assert_allclose(compiled.rhs(0.0, y[:, i], p), rhs(*y[:, i], *p)[:, 0])
+        np.testing.assert_allclose(compiled.jac(0.0, y[:, i], p), jac(*y[:, i], *p))
+    # Batched states give the same columns
+    np.testing.assert_allclose(compiled.rhs(0.0, y, p)[:, 2], compiled.rhs(0.0, y[:, 2], p))
+
+
+def test_kernel_is_reused_from_disk(cache):
+    system = parse_system(LORENZ)
+    compile_system(system)
+    path = os.path.join(kernels.KERNEL_DIR, f"{system.key}.py")
+    assert os.path.exists(path)
+    kernels._compiled.clear()
+    assert compile_system(system).source == compile_system(system, use_disk=False).source
+
+
+def test_tampered_kernel_is_not_executed(cache):
+    system = parse_system(LORENZ)
+    compile_system(system)
+    path = os.path.join(kernels.KERNEL_DIR, f"{system.key}.py")
+    with open(path) as f:
+        header, _, source = f.read().partition("\n")
+    with open(path, "w") as f:
+        f.write(f"{header}\nraise RuntimeError('executed')\n{source}")
+    kernels._compiled.clear()
+    compiled = compile_system(system)
+    assert "RuntimeError" not in compiled.source
+    # The forged file was replaced by a signed one
+    kernels._compiled.clear()
+    assert compile_system(system).source == compiled.source
+
+
+def test_without_a_key_kernels_stay_in_memory(cache, monkeypatch):
+    # A file where the key's directory should be: no key can be made
+    (cache / "config").write_text("")
+    monkeypatch.setattr(kernels, "KEY_FILE", str(cache / "config" / "cache.key"))
+    compile_system(parse_system(LORENZ))
+    assert not os.path.exists(kernels.KERNEL_DIR)
+
+
+def test_key_depends_on_sympy_version(monkeypatch):
+    key = parse_system(LORENZ).key
+    monkeypatch.setattr(sp, "__version__", "0.0")
+    assert parse_system(LORENZ).key != key
@@ -0,0 +1,64 @@
+import numpy as np
+
+from util.pipeline import Pipeline, fingerprint
+
+
+def counted(calls, name, func):
+    def stage(*args):
+        calls.append(name)
+        return func(*args)
+    return stage
+
+
+def analysis(pipeline, calls, rate, t, threshold):
+    # solve -> peaks -> count, as the bifurcation page chains its stages
+    solve = pipeline.run("solve", counted(calls, "solve", lambda r, t: np.exp(-r * t)), rate, t)
+    peaks = pipeline.run("peaks", counted(calls, "peaks", lambda y: y[y > 0.5]), solve)
+    return pipeline.run("count", counted(calls, "count", lambda p, c: int(np.sum(p > c))), peaks, threshold)
+
+
+def test_unchanged_inputs_hit_every_stage():
+    pipeline, calls = Pipeline(), []
+    t = np.linspace(0.0, 5.0, 50)
+    first = analysis(pipeline, calls, 0.5, t, 0.8)
+    second = analysis(pipeline, calls, 0.5, t.copy(), 0.8)
+    assert calls == ["solve", "peaks", "count"]
+    assert first.key == second.key and first.value == second.value
+    for stage in ("solve", "peaks", "count"):
+        assert pipeline.stats[stage]["hits"] == 1 and pipeline.stats[stage]["misses"] == 1
+
+
+def test_an_upstream_change_invalidates_everything_downstream():
+    pipeline, calls = Pipeline(), []
+    t = np.linspace(0.0, 5.0, 50)
+    before = analysis(pipeline, calls, 0.5, t, 0.8)
+    calls.clear()
+    after = analysis(pipeline, calls, 0.25, t, 0.8)
+    assert calls == ["solve", "peaks", "count"]
+    assert after.key != before.key and after.value > before.value
+    # A change to the input of the last stage only reruns that stage
+    calls.clear()
+    analysis(pipeline, calls, 0.25, t, 0.6)
+    assert calls == ["count"]
+    assert pipeline.stats["solve"]["hits"] == 1 and pipeline.stats["peaks"]["hits"] == 1
+
+
+def test_each_stage_keeps_its_most_recent_results():
+    pipeline, calls = Pipeline(size=2), []
+    square = counted(calls, "square", lambda x: x * x)
+    for x in (1, 2, 3, 1):
+        pipeline.run("square", square, x)
+    assert calls == ["square"] * 4
+    pipeline.run("square", square, 3)
+    assert len(calls) == 4
+
+
+def test_fingerprint_distinguishes_contents_types_and_shapes():
+    a = np.arange(6.0)
+    assert fingerprint(a) == fingerprint(a.copy())
+    assert fingerprint(a) != fingerprint(a.astype(np.float32))
+    assert fingerprint(a) != fingerprint(a.reshape(2, 3))
+    assert fingerprint(a[::2]) == fingerprint(np.array([0.0, 2.0, 4.0]))
+    assert fingerprint(np.array(["x", "y"], dtype=object)) != fingerprint(np.array(["x", "z"], dtype=object))
+    assert fingerprint({"a": 1, "b": 2}) == fingerprint({"b": 2, "a": 1})
+    assert fingerprint((1, 2)) != fingerprint((12,)) and fingerprint(1) != fingerprint(1.0)
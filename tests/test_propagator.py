@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from scipy.integrate import odeint
+
+from util.compartments import three_compartment, two_compartment
+from util.propagator import propagate
+from util.schedule import Schedule
+
+
+def two_model(y, t, a12_wake, A_wake, A_sleep, a, k):
+    # The two-compartment right-hand side as the page integrated it with odeint
+    awake = (t % 24 >= 8) & (t % 24 < 24)
+    a12 = a12_wake * awake + a * a12_wake * (1 - awake)
+    return [A_wake * awake + A_sleep * (1 - awake) - a12 * y[0], a12 * y[0] - k * y[1]]
+
+
+def three_model(y, t, A_wake, A_sleep, a12_wake, k, a, a13_wake, a23_wake):
+    awake = (t % 24 >= 8) & (t % 24 < 24)
+    sleep = 1 - awake
+    a12 = a12_wake * (awake + a * sleep)
+    a13 = a13_wake * (awake + a * sleep)
+    a23 = a23_wake * (awake + a * sleep)
+    B, C, P = y
+    return [A_wake * awake + A_sleep * sleep - (a12 + a13) * B, a12 * B - a23 * C, a23 * C + a13 * B - k * P]
+
+
+MODELS = [
+    (two_compartment, two_model, (0.0737390, 55.557583, 7.348874, 1.01, 0.346573), [600, 15.5]),
+    (three_compartment, three_model, (59.935858, 7.443667, 0.346573, 0.346573, 1.01, 0.1, 0.057762), [600, 600, 15]),
+]
+
+
+def reference(model, y0, t, args):
+    # odeint restarted at every switch, so the discontinuities do not limit its accuracy
+    sol = np.empty((len(t), len(y0)))
+    y = np.asarray(y0, dtype=float)
+    edges = np.union1d(np.arange(0.0, t[-1], 24.0), np.arange(8.0, t[-1], 24.0))
+    edges = np.append(edges, t[-1])
+    for start, end in zip(edges[:-1], edges[1:]):
+        inside = (t >= start) & (t <= end)
+        grid = np.union1d([start, end], t[inside])
+        # Evaluate inside the block so the state of its own stretch holds at the endpoints
+        mid = 0.5 * (start + end)
+        segment = odeint(lambda y, s: model(y, mid, *args), y, grid, rtol=1e-11, atol=1e-11)
+        sol[inside] = segment[np.searchsorted(grid, t[inside])]
+        y = segment[-1]
+    return sol
+
+
+@pytest.mark.parametrize("build, model, args, y0", MODELS, ids=["two", "three"])
+def test_propagate_matches_odeint(build, model, args, y0):
+    t = np.arange(0.0, 24 * 5, 0.01)
+    exact = propagate(build(*args).systems(), y0, t)
+    direct = odeint(model, y0, t, args=args, rtol=1e-10, atol=1e-10, hmax=0.5)
+    restarted = reference(model, y0, t, args)
+    np.testing.assert_allclose(exact, restarted, rtol=1e-7, atol=1e-6)
+    # The page's original odeint call, which steps over the switches
+    np.testing.assert_allclose(exact, direct, rtol=1e-5, atol=1e-3)
+
+
+def test_propagate_unevenly_spaced_times():
+    graph = two_compartment(*MODELS[0][2])
+    t = np.sort(np.random.default_rng(0).uniform(0.0, 72.0, 300))
+    t = np.concatenate([[0.0], t])
+    even = np.linspace(0.0, 72.0, 7201)
+    exact = propagate(graph.systems(), MODELS[0][3], t)
+    dense = propagate(graph.systems(), MODELS[0][3], even)
+    for i in range(2):
+        np.testing.assert_allclose(exact[:, i], np.interp(t, even, dense[:, i]), rtol=1e-4)
+
+
+def test_propagate_custom_schedule():
+    schedule = Schedule.daily(22.0, 8.0)
+    graph = two_compartment(*MODELS[0][2], schedule=schedule)
+    t = np.arange(0.0, 48.0, 0.05)
+
+    def model(y, s):
+        M, b = graph.systems()[schedule.state_at(s)]
+        return M @ y + b
+
+    sol = propagate(graph.systems(), MODELS[0][3], t, schedule=schedule)
+    np.testing.assert_allclose(sol, odeint(model, MODELS[0][3], t, rtol=1e-10, atol=1e-10, hmax=0.05),
+                               rtol=1e-5, atol=1e-4)
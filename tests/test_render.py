@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from util import render
+from util.pipeline import Pipeline
+from util.render import FigureCache, figure, line_panels, rendered
+
+
+@pytest.fixture(autouse=True)
+def figures(monkeypatch):
+    cache = FigureCache()
+    monkeypatch.setattr(render, "figures", cache)
+    return cache
+
+
+def plotter(calls):
+    def draw(t, y):
+        calls.append(1)
+        fig, ax = figure((3, 2))
+        ax.plot(t, y)
+        return fig
+    return draw
+
+
+def test_a_figure_is_drawn_once_per_key(figures):
+    calls = []
+    draw = plotter(calls)
+    t = np.linspace(0.0, 1.0, 20)
+    first = rendered(("page", t, t ** 2), lambda: draw(t, t ** 2), dpi=20)
+    second = rendered(("page", t.copy(), t ** 2), lambda: draw(t, t ** 2), dpi=20)
+    assert first == second and first.startswith(b"\x89PNG")
+    assert len(calls) == 1 and figures.stats()["hits"] == 1
+    # Other data, another format or resolution is another figure
+    rendered(("page", t, t ** 3), lambda: draw(t, t ** 3), dpi=20)
+    assert rendered(("page", t, t ** 2), lambda: draw(t, t ** 2), fmt="svg", dpi=20).startswith("<?xml")
+    rendered(("page", t, t ** 2), lambda: draw(t, t ** 2), dpi=30)
+    assert len(calls) == 4 and figures.stats()["entries"] == 4
+
+
+def test_figures_follow_the_pipeline_stages_they_show():
+    pipeline, calls = Pipeline(), []
+    draw = plotter(calls)
+    t = np.linspace(0.0, 5.0, 30)
+
+    def view(rate, label):
+        solve = pipeline.run("solve", lambda r: np.exp(-r * t), rate)
+        return rendered(("decay", solve.key, label), lambda: draw(t, solve.value), dpi=20)
+
+    first = view(0.5, "A")
+    assert view(0.5, "A") == first and len(calls) == 1
+    assert view(0.25, "A") != first and len(calls) == 2
+    view(0.25, "B")
+    assert len(calls) == 3 and pipeline.stats["solve"]["misses"] == 2
+
+
+def test_cache_is_bounded_in_bytes():
+    cache = FigureCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"5678")
+    cache.get("a")
+    cache.put("c", b"9012")
+    assert cache.get("b") is None and cache.get("a") == b"1234"
+    assert cache.stats()["bytes"] == 8
+    # A single entry larger than the bound is still kept
+    cache.put("d", b"x" * 20)
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 20
+
+
+def test_line_panels_reuse_their_layout_with_new_data():
+    t = np.linspace(0.0, 48.0, 100)
+    with render.lock:
+        fig = line_panels([(t, np.sin(t), "Brain"), (t, np.cos(t), "Plasma")], (0.0, 48.0), markers=[8.0, 32.0])
+        (ax, line, switches), _ = render._templates[('line_panels', 2, 12.0, 4.0, "Time (hr)")][1]
+        first = render.encode(fig, "png", 20)
+        again = line_panels([(t, 3 * np.sin(t), "Brain"), (t, np.cos(t), "Plasma")], (0.0, 24.0), markers=[8.0])
+        assert again is fig
+        np.testing.assert_array_equal(line.get_ydata(), 3 * np.sin(t))
+        assert ax.get_xlim() == (0.0, 24.0) and len(switches.get_segments()) == 1
+        assert ax.get_ylim()[1] >= 3.0
+        assert render.encode(fig, "png", 20) != first
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+from util.result_cache import ResultCache, result_key
+
+
+def test_key_covers_every_input():
+    t = np.arange(0.0, 10.0, 0.5)
+    key = result_key("model", (1.0, 2.0), t, [600, 15.5])
+    assert key == result_key("model", [1.0, 2.0], t.copy(), np.array([600.0, 15.5]))
+    assert key != result_key("other", (1.0, 2.0), t, [600, 15.5])
+    assert key != result_key("model", (1.0, 2.5), t, [600, 15.5])
+    assert key != result_key("model", (1.0, 2.0), t[:-1], [600, 15.5])
+    assert key != result_key("model", (1.0, 2.0), t, [600, 15.0])
+
+
+def test_compute_runs_once(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return np.arange(12.0).reshape(6, 2)
+
+    first = cache.get_or_compute("m", (1.0,), [0.0, 1.0], [0.0], compute)
+    second = cache.get_or_compute("m", (1.0,), [0.0, 1.0], [0.0], compute)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(first, second)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_other_workers_read_the_disk(tmp_path):
+    value = np.random.default_rng(0).normal(size=(100, 3))
+    ResultCache(str(tmp_path)).put("k", value)
+    other = ResultCache(str(tmp_path))
+    np.testing.assert_array_equal(other.get("k"), value)
+    assert other.disk_hits == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_disk_eviction_keeps_the_recent(tmp_path):
+    cache = ResultCache(str(tmp_path), disk_bytes=3 * 8000 + 500)
+    for i in range(5):
+        cache.put(f"k{i}", np.full(1000, float(i)))
+        # mtimes order the files; keep them distinct on coarse clocks
+        os.utime(tmp_path / f"k{i}.npy", (i, i))
+    cache.put("k5", np.full(1000, 5.0))
+    assert sorted(os.listdir(tmp_path)) == ["k3.npy", "k4.npy", "k5.npy"]
+
+
+def test_memory_is_bounded(tmp_path):
+    # No disk level: a file stands where the directory would be
+    (tmp_path / "file").write_text("")
+    cache = ResultCache(str(tmp_path / "file" / "results"), memory_bytes=2 * 8000)
+    for i in range(4):
+        cache.put(f"k{i}", np.full(1000, float(i)))
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("k0") is None
+    np.testing.assert_array_equal(cache.get("k3"), np.full(1000, 3.0))
+
+
+def test_unreadable_files_are_misses(tmp_path):
+    (tmp_path / "bad.npy").write_bytes(b"not an array")
+    cache = ResultCache(str(tmp_path))
+    assert cache.get("bad") is None
+    assert cache.misses == 1
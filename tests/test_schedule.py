@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from util.pages.protocol import nap_schedule
+from util.schedule import DAILY, DAY, Schedule
+
+
+def test_daily_matches_the_original_forcing():
+    t = np.arange(0.0, 5 * DAY, 0.25)
+    np.testing.assert_array_equal(DAILY.awake(t), (t % 24 >= 8) & (t % 24 < 24))
+    np.testing.assert_array_equal(DAILY.switches(0.0, 48.0), [8.0, 24.0, 32.0])
+
+
+def test_daily_window_across_midnight():
+    schedule = Schedule.daily(22.0, 8.0)
+    assert schedule.state_at(23.0) == 'sleep'
+    assert schedule.state_at(30.0) == 'wake'
+    assert schedule.state_at(24.0 * 3 + 5.5) == 'sleep'
+    np.testing.assert_array_equal(schedule.switches(0.0, DAY), [6.0, 22.0])
+
+
+def test_blocks_split_at_every_switch():
+    starts, ends, states = DAILY.blocks(4.0, 50.0)
+    np.testing.assert_array_equal(starts, [4.0, 8.0, 24.0, 32.0, 48.0])
+    np.testing.assert_array_equal(ends, [8.0, 24.0, 32.0, 48.0, 50.0])
+    assert list(states) == ['sleep', 'wake', 'sleep', 'wake', 'sleep']
+
+
+def test_repeated_states_merge():
+    schedule = Schedule([0.0, 8.0, 12.0, 20.0], ['sleep', 'wake', 'wake', 'sleep'], DAY)
+    np.testing.assert_array_equal(schedule.times, [0.0, 8.0, 20.0])
+    # Sleep from 20 h runs on into the next day's sleep from 0 h
+    np.testing.assert_array_equal(schedule.switches(0.0, 48.0), [8.0, 20.0, 32.0, 44.0])
+
+
+def test_from_days_skips_a_night():
+    schedule = Schedule.from_days([(0.0, 8.0), (0.0, 0.0), (0.0, 8.0)])
+    assert schedule.period is None
+    assert schedule.state_at(4.0) == 'sleep'
+    assert schedule.state_at(28.0) == 'wake'
+    assert schedule.state_at(52.0) == 'sleep'
+    assert schedule.state_at(1000.0) == 'wake'
+
+
+def test_from_text():
+    schedule = Schedule.from_text("period 48\n0 sleep  # night\n8 wake\n\n32 sleep\n40 wake\n")
+    assert schedule.period == 48.0
+    assert schedule.state_at(48.0 + 35.0) == 'sleep'
+    with pytest.raises(ValueError, match="line 2"):
+        Schedule.from_text("0 sleep\n8 nap\n")
+
+
+def test_breakpoints_outside_the_period_are_rejected():
+    with pytest.raises(ValueError):
+        Schedule([0.0, 8.0, 25.0], ['sleep', 'wake', 'sleep'], DAY)
+
+
+@pytest.mark.parametrize("start, length", [(14.0, 1.0), (22.5, 2.0), (23.0, 1.0), (23.0, 4.0)])
+def test_naps(start, length):
+    schedule = nap_schedule(start, length)
+    t = np.arange(0.0, DAY, 0.25)
+    asleep = (t < 8.0) | ((t >= start) & (t < start + length))
+    np.testing.assert_array_equal(~schedule.awake(t), asleep)
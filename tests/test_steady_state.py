@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from util.compartments import two_compartment
+from util.propagator import propagate
+from util.schedule import DAY, Schedule
+from util.steady_state import monodromy, periodic_linear, periodic_shooting
+
+ARGS = (0.0737390, 55.557583, 7.348874, 1.01, 0.346573)
+
+
+def test_periodic_linear_is_the_limit_of_a_long_simulation():
+    systems = two_compartment(*ARGS).systems()
+    orbit = periodic_linear(systems)
+    assert orbit.converged
+    assert orbit.residual < 1e-8
+    assert np.all(np.abs(orbit.multipliers) < 1)
+    np.testing.assert_allclose(orbit.y[-1], orbit.y0, rtol=1e-8)
+    # Forty days from the page's initial conditions settle onto the same cycle
+    t = np.arange(0.0, 40 * DAY + 0.5, 1.0)
+    np.testing.assert_allclose(propagate(systems, [600, 15.5], t)[-1], orbit.y0, rtol=1e-6)
+
+
+def test_monodromy_of_a_shifted_schedule():
+    schedule = Schedule.daily(22.0, 8.0)
+    systems = two_compartment(*ARGS, schedule=schedule).systems()
+    Phi, c = monodromy(systems, schedule=schedule)
+    y = np.array([100.0, 10.0])
+    np.testing.assert_allclose(Phi @ y + c, propagate(systems, y, [0.0, DAY], schedule=schedule)[-1], rtol=1e-10)
+
+
+def test_non_repeating_schedule_is_rejected():
+    systems = two_compartment(*ARGS).systems()
+    with pytest.raises(ValueError):
+        periodic_linear(systems, schedule=Schedule([0.0, 8.0], ['sleep', 'wake']))
+
+
+def test_shooting_agrees_with_the_linear_solver():
+    graph = two_compartment(*ARGS)
+    linear = periodic_linear(graph.systems())
+    orbit = periodic_shooting(lambda t, y: graph.rhs(t, y), [600, 15.5])
+    assert orbit.converged
+    np.testing.assert_allclose(orbit.y0, linear.y0, rtol=1e-6)
+    np.testing.assert_allclose(np.sort(np.abs(orbit.multipliers)), np.sort(np.abs(linear.multipliers)),
+                               atol=1e-5)
+
+
+def test_shooting_a_nonlinear_system():
+    # Logistic growth whose rate drops while asleep: the orbit repeats after one day
+    def rhs(t, y):
+        r = 0.3 if t % DAY >= 8.0 else 0.05
+        return r * y * (1 - y / 50.0) - 0.02 * y
+
+    orbit = periodic_shooting(rhs, [10.0])
+    assert orbit.converged
+    np.testing.assert_allclose(orbit.y[-1], orbit.y[0], rtol=1e-6)
+    assert orbit.y0[0] > 0 and np.abs(orbit.multipliers[0]) < 1
+
+
+def test_shooting_from_the_orbit_still_reports_multipliers():
+    graph = two_compartment(*ARGS)
+    start = periodic_linear(graph.systems()).y0
+    orbit = periodic_shooting(lambda t, y: graph.rhs(t, y), start)
+    assert orbit.converged and orbit.iterations == 1
+    assert np.all(np.isfinite(orbit.multipliers))
+
+
+def test_shooting_needs_an_iteration():
+    with pytest.raises(ValueError):
+        periodic_shooting(lambda t, y: -y, [1.0], max_iter=0)
+
+
+@pytest.mark.parametrize("t0, dt", [(0.0, 0.07), (2336.0, 0.01), (2336.0, 0.07)])
+def test_orbit_samples_end_on_the_period(t0, dt):
+    graph = two_compartment(*ARGS)
+    linear = periodic_linear(graph.systems(), t0=t0, dt=dt)
+    orbit = periodic_shooting(lambda t, y: graph.rhs(t, y), linear.y0, t0=t0, dt=dt)
+    for result in (linear, orbit):
+        assert result.t[0] == t0 and result.t[-1] == t0 + DAY
+        assert np.all(np.diff(result.t) > 0)
+        assert np.all(np.isfinite(result.y))
+    np.testing.assert_allclose(orbit.y[-1], orbit.y0, rtol=1e-6)
+    np.testing.assert_allclose(orbit.y, linear.y, rtol=1e-5)
+
+
+def test_unconverged_orbit_describes_its_last_point():
+    graph = two_compartment(*ARGS)
+    rhs = lambda t, y: graph.rhs(t, y)
+    orbit = periodic_shooting(rhs, [600, 15.5], tol=1e-30, max_iter=1)
+    assert not orbit.converged
+    Py = periodic_shooting(rhs, orbit.y0, tol=1e30, max_iter=1).y[-1]
+    assert orbit.residual == pytest.approx(np.linalg.norm(Py - orbit.y0), rel=1e-6)
+    np.testing.assert_allclose(orbit.y[0], orbit.y0)
@@ -0,0 +1,69 @@
+import numpy as np
+
+from util.timeseries import decimate, lttb, visible
+
+
+def reference_lttb(x, y, n_out):
+    # Straightforward LTTB over the same buckets: interior points split at `edges`
+    n = len(x)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < n_out - 2:
+            nxt = slice(edges[i + 1], edges[i + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    return np.array(keep + [n - 1])
+
+
+def test_matches_the_reference():
+    rng = np.random.default_rng(3)
+    x = np.cumsum(rng.uniform(0.5, 1.5, 5003))
+    y = np.cumsum(rng.normal(size=5003))
+    for n_out in (3, 10, 257, 1000):
+        np.testing.assert_array_equal(lttb(x, y, n_out), reference_lttb(x, y, n_out))
+
+
+def test_one_point_per_bucket_with_the_ends():
+    x = np.linspace(0.0, 100.0, 10001)
+    keep = lttb(x, np.sin(x), 500)
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_spikes_survive():
+    x = np.arange(100000, dtype=float)
+    y = np.zeros_like(x)
+    y[31337], y[77777] = 5.0, -3.0
+    keep = lttb(x, y, 200)
+    assert 31337 in keep and 77777 in keep
+
+
+def test_short_series_are_kept():
+    x = np.arange(10.0)
+    np.testing.assert_array_equal(lttb(x, x, 10), np.arange(10))
+    np.testing.assert_array_equal(lttb(x, x, 2), np.arange(10))
+
+
+def test_decimate_covers_the_window():
+    t = np.arange(0.0, 2400.0, 0.01)
+    y = np.sin(t)
+    window = visible(t, 100.0, 200.0)
+    assert t[window][0] < 100.0 and t[window][-1] > 200.0
+    tw, yw = decimate(t, y, 100.0, 200.0, n_out=800)
+    assert len(tw) == 800
+    assert tw[0] <= 100.0 and tw[-1] >= 200.0
+    np.testing.assert_array_equal(yw, np.sin(tw))
+    # A window with fewer samples than n_out is returned whole
+    tw, _ = decimate(t, y, 100.0, 101.0, n_out=800)
+    assert len(tw) == 103
@@ -0,0 +1,220 @@
+import numpy as np
+import scipy.sparse as sparse
+from scipy.sparse.linalg import LinearOperator, expm_multiply, gmres
+
+from util.propagator import propagate
+from util.schedule import DAILY, STATES
+from util.steady_state import monodromy
+
+# Networks up to this size are propagated with dense matrix exponentials
+DENSE_LIMIT = 200
+
+
+class CompartmentGraph:
+    """Linear compartment network: transfers between compartments, eliminations and inputs.
+
+    Every transfer has a rate while awake and a multiplier applied to it while asleep;
+    every input has its own wake and sleep rate. In each state the model is
+    dy/dt = M y + b with a sparse rate matrix M; the schedule says which state holds when.
+    """
+
+    def __init__(self, compartments=(), schedule=DAILY):
+        self.schedule = schedule
+        self.compartments = []
+        self._index = {}
+        self.transfers = []     # (source, target or None, wake rate, sleep multiplier)
+        self.inputs = []        # (compartment, wake rate, sleep rate)
+        for name in compartments:
+            self.add_compartment(name)
+        self._matrices = None
+
+    def __len__(self):
+        return len(self.compartments)
+
+    def add_compartment(self, name):
+        if name not in self._index:
+            self._index[name] = len(self.compartments)
+            self.compartments.append(name)
+            self._matrices = None
+        return self._index[name]
+
+    def add_transfer(self, source, target, rate, sleep=1.0):
+        # target None removes the amount from the network (elimination)
+        self.add_compartment(source)
+        if target is not None:
+            self.add_compartment(target)
+        self.transfers.append((source, target, float(rate), float(sleep)))
+        self._matrices = None
+        return self
+
+    def add_input(self, compartment, wake, sleep=None):
+        self.add_compartment(compartment)
+        self.inputs.append((compartment, float(wake), float(wake if sleep is None else sleep)))
+        self._matrices = None
+        return self
+
+    def _entries(self, state):
+        # (rows, cols, values) of the rate matrix; repeated positions add up
+        source = np.array([self._index[s] for s, _, _, _ in self.transfers], dtype=int)
+        target = np.array([-1 if t is None else self._index[t] for _, t, _, _ in self.transfers], dtype=int)
+        rate = np.array([r * (m if state == 'sleep' else 1.0) for _, _, r, m in self.transfers])
+        # Each transfer leaves its source and, unless eliminated, enters its target
+        moved = target >= 0
+        rows = np.concatenate([source, target[moved]])
+        cols = np.concatenate([source, source[moved]])
+        return rows, cols, np.concatenate([-rate, rate[moved]])
+
+    def rate_matrix(self, state='wake', dense=False):
+        n = len(self)
+        rows, cols, vals = self._entries(state)
+        if dense:
+            M = np.zeros((n, n))
+            np.add.at(M, (rows, cols), vals)
+            return M
+        return sparse.csr_matrix((vals, (rows, cols)), shape=(n, n))
+
+    def input_vector(self, state='wake'):
+        b = np.zeros(len(self))
+        for name, wake, sleep in self.inputs:
+            b[self._index[name]] += sleep if state == 'sleep' else wake
+        return b
+
+    def systems(self, dense=True):
+        # {'wake': (M, b), 'sleep': (M, b)}, the form used by propagate and periodic_linear
+        return {state: (self.rate_matrix(state, dense), self.input_vector(state)) for state in STATES}
+
+    def _state(self, t):
+        if self._matrices is None:
+            self._matrices = self.systems(dense=False)
+        return self._matrices[self.schedule.state_at(t)]
+
+    def rhs(self, t, y):
+        # One sparse mat-vec; t may be a scalar and y of shape (n,) or (n, batch)
+        M, b = self._state(t)
+        return M @ y + (b if np.ndim(y) == 1 else b[:, None])
+
+    def jac(self, t, y=None):
+        return self._state(t)[0]
+
+    def equations(self, state='wake'):
+        # 'dX/dt = ...' lines for the symbolic pages, with the rates of one state written out
+        M, b = self.systems(dense=False)[state]
+        M = M.tocsr()
+        lines = []
+        for i, name in enumerate(self.compartments):
+            row = M.getrow(i)
+            terms = [f"{b[i]:.10g}"] if b[i] else []
+            terms += [f"{v:+.10g}*{self.compartments[j]}" for j, v in zip(row.indices, row.data) if v]
+            lines.append(f"d{name}/dt = {' '.join(terms) or '0'}")
+        return lines
+
+
+def parse_network(text, schedule=DAILY):
+    """Graph from lines 'source -> target: rate[, sleep multiplier]'.
+
+    An empty target is an elimination and '-> target: wake rate[, sleep rate]' is an input.
+    Lines 'name = value' set initial amounts, which are returned alongside the graph.
+    """
+    graph = CompartmentGraph(schedule=schedule)
+    initial = {}
+    for number, line in enumerate(text.split('\n'), start=1):
+        line = line.split('#')[0].strip()
+        if not line:
+            continue
+        try:
+            if '->' not in line:
+                name, value = (part.strip() for part in line.split('='))
+                graph.add_compartment(name)
+                initial[name] = float(value)
+                continue
+            route, values = line.split(':')
+            source, target = (part.strip() or None for part in route.split('->'))
+            values = [float(v) for v in values.split(',')]
+            if source is None:
+                graph.add_input(target, *values)
+            else:
+                graph.add_transfer(source, target, *values)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"line {number}: cannot read {line!r}") from e
+    y0 = np.array([initial.get(name, 0.0) for name in graph.compartments])
+    return graph, y0
+
+
+def _augmented(graph):
+    # Sparse augmented generators, as in propagator.augmented
+    G = {}
+    for state, (M, b) in graph.systems(dense=False).items():
+        G[state] = sparse.bmat([[M, sparse.csr_matrix(b[:, None])], [None, sparse.csr_matrix((1, 1))]]).tocsr()
+    return G
+
+
+def simulate(graph, y0, t, blocks=None):
+    """Exact trajectory of the network at t; large networks use sparse exponential actions."""
+    if len(graph) <= DENSE_LIMIT:
+        return propagate(graph.systems(), y0, t, blocks, graph.schedule)
+
+    t = np.asarray(t, dtype=float)
+    n = len(graph)
+    if blocks is None:
+        blocks = graph.schedule.blocks(t[0], t[-1])
+    G = _augmented(graph)
+
+    sol = np.empty((len(t), n))
+    z = np.append(y0, 1.0)
+    for start, end, state in zip(*blocks):
+        inside = np.flatnonzero((t >= start) & ((t < end) | (end == t[-1])))
+        tau = t[inside] - start
+        if len(tau) > 2 and np.allclose(np.diff(tau), tau[1] - tau[0]):
+            sol[inside] = expm_multiply(G[state], z, start=tau[0], stop=tau[-1], num=len(tau), endpoint=True)[:, :n]
+        else:
+            for i, s in zip(inside, tau):
+                sol[i] = expm_multiply(G[state] * s, z)[:n]
+        z = expm_multiply(G[state] * (end - start), z)
+    return sol
+
+
+def periodic_state(graph, tol=1e-10):
+    """State at t = 0 of the entrained cycle, the fixed point y = Phi y + c of the period map."""
+    n = len(graph)
+    if n <= DENSE_LIMIT:
+        Phi, c = monodromy(graph.systems(), schedule=graph.schedule)
+        return np.linalg.solve(np.eye(n) - Phi, c)
+
+    # Large networks: solve (I - Phi) y = c by GMRES, applying Phi through sparse exponentials;
+    # chains make I - Phi far from normal, so restarts must be long
+    G = _augmented(graph)
+    if graph.schedule.period is None:
+        raise ValueError("the schedule does not repeat, so it has no periodic steady state")
+    blocks = list(zip(*graph.schedule.blocks(0.0, graph.schedule.period)))
+
+    def period_map(z):
+        for start, end, state in blocks:
+            z = expm_multiply(G[state] * (end - start), z)
+        return z
+
+    c = period_map(np.append(np.zeros(n), 1.0))[:n]
+    operator = LinearOperator((n, n), matvec=lambda y: y - period_map(np.append(y, 0.0))[:n])
+    y, info = gmres(operator, c, rtol=tol, atol=0.0, restart=min(n, 100))
+    if info != 0:
+        raise RuntimeError("periodic steady state did not converge")
+    return y
+
+
+def two_compartment(a12_wake, A_wake, A_sleep, a, k, schedule=DAILY):
+    # Same argument order as the two-compartment page
+    graph = CompartmentGraph(('Brain', 'Plasma'), schedule)
+    graph.add_input('Brain', A_wake, A_sleep)
+    graph.add_transfer('Brain', 'Plasma', a12_wake, a)
+    graph.add_transfer('Plasma', None, k)
+    return graph
+
+
+def three_compartment(A_wake, A_sleep, a12_wake, k, a, a13_wake, a23_wake, schedule=DAILY):
+    # Same argument order as the three-compartment page
+    graph = CompartmentGraph(('Brain', 'CSF', 'Plasma'), schedule)
+    graph.add_input('Brain', A_wake, A_sleep)
+    graph.add_transfer('Brain', 'CSF', a12_wake, a)
+    graph.add_transfer('Brain', 'Plasma', a13_wake, a)
+    graph.add_transfer('CSF', 'Plasma', a23_wake, a)
+    graph.add_transfer('Plasma', None, k)
+    return graph
@@ -0,0 +1,212 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class Branch:
+    parameter: np.ndarray      # continuation parameter at each point
+    states: np.ndarray         # equilibria, shape (k, n)
+    eigenvalues: np.ndarray    # Jacobian spectrum at each point, shape (k, n)
+    stable: np.ndarray         # all eigenvalues in the open left half plane
+    special: list = field(default_factory=list)  # detected fold ('LP') and Hopf ('H') points
+    converged: bool = True
+
+
+class _Problem:
+    # F(x, lam) = 0 with every other parameter held fixed
+    def __init__(self, compiled, parameter, fixed):
+        self.compiled = compiled
+        self.index = compiled.parameters.index(parameter)
+        self.p = compiled.params({**{parameter: 0.0}, **fixed})
+
+    def _params(self, lam):
+        p = self.p.copy()
+        p[self.index] = lam
+        return p
+
+    def F(self, x, lam):
+        return self.compiled.rhs(0.0, x, self._params(lam))
+
+    def Fx(self, x, lam):
+        return self.compiled.jac(0.0, x, self._params(lam))
+
+    def Flam(self, x, lam):
+        return self.compiled.jac_p(0.0, x, self._params(lam))[:, self.index]
+
+
+def newton_equilibrium(compiled, values, guess, tol=1e-10, max_iter=50):
+    # Damped Newton for F(x) = 0 at fixed parameter values; returns (x, converged)
+    p = compiled.params(values)
+    x = np.asarray(guess, dtype=float).copy()
+    for _ in range(max_iter):
+        F = compiled.rhs(0.0, x, p)
+        norm = np.linalg.norm(F)
+        if norm < tol:
+            return x, True
+        try:
+            dx = np.linalg.solve(compiled.jac(0.0, x, p), -F)
+        except np.linalg.LinAlgError:
+            return x, False
+        damping = 1.0
+        while damping > 1e-4:
+            x_new = x + damping * dx
+            if np.linalg.norm(compiled.rhs(0.0, x_new, p)) < norm:
+                break
+            damping *= 0.5
+        x = x_new
+    return x, np.linalg.norm(compiled.rhs(0.0, x, p)) < tol
+
+
+def _tangent(problem, x, lam, previous=None):
+    # Null vector of [Fx Flam], oriented along the previous tangent
+    n = len(x)
+    A = np.hstack([problem.Fx(x, lam), problem.Flam(x, lam)[:, None]])
+    if previous is None:
+        previous = np.zeros(n + 1)
+        previous[-1] = 1.0
+    M = np.vstack([A, previous])
+    rhs = np.zeros(n + 1)
+    rhs[-1] = 1.0
+    t = np.linalg.solve(M, rhs)
+    return t / np.linalg.norm(t)
+
+
+def _correct(problem, u_pred, tangent, tol, max_iter):
+    # Newton on F(u) = 0 together with the arclength constraint tangent . (u - u_pred) = 0
+    n = len(u_pred) - 1
+    u = u_pred.copy()
+    for iteration in range(1, max_iter + 1):
+        x, lam = u[:n], u[n]
+        G = np.append(problem.F(x, lam), tangent @ (u - u_pred))
+        if np.linalg.norm(G) < tol:
+            return u, iteration, True
+        J = np.vstack([np.hstack([problem.Fx(x, lam), problem.Flam(x, lam)[:, None]]), tangent])
+        try:
+            u = u - np.linalg.solve(J, G)
+        except np.linalg.LinAlgError:
+            return u, iteration, False
+        if not np.all(np.isfinite(u)):
+            return u, iteration, False
+    x, lam = u[:n], u[n]
+    return u, max_iter, np.linalg.norm(problem.F(x, lam)) < tol
+
+
+def _refine_fold(problem, x, lam, tol=1e-10, max_iter=20, eps=1e-6):
+    # Moore-Spence system F = 0, Fx v = 0, c.v = 1; second derivatives by central differences
+    n = len(x)
+    x0, lam0 = x, lam
+    v = np.linalg.svd(problem.Fx(x, lam))[2][-1]
+    c = v.copy()
+    z = np.concatenate([x, v, [lam]])
+    for _ in range(max_iter):
+        x, v, lam = z[:n], z[n:2 * n], z[2 * n]
+        Fx = problem.Fx(x, lam)
+        G = np.concatenate([problem.F(x, lam), Fx @ v, [c @ v - 1.0]])
+        if np.linalg.norm(G) < tol:
+            return x, lam
+        B = (problem.Fx(x + eps * v, lam) - problem.Fx(x - eps * v, lam)) / (2 * eps)
+        C = (problem.Fx(x, lam + eps) - problem.Fx(x, lam - eps)) @ v / (2 * eps)
+        J = np.zeros((2 * n + 1, 2 * n + 1))
+        J[:n, :n] = Fx
+        J[:n, 2 * n] = problem.Flam(x, lam)
+        J[n:2 * n, :n] = B
+        J[n:2 * n, n:2 * n] = Fx
+        J[n:2 * n, 2 * n] = C
+        J[2 * n, n:2 * n] = c
+        try:
+            z = z - np.linalg.solve(J, G)
+        except np.linalg.LinAlgError:
+            break
+    # Keep the branch point when the refinement does not settle
+    return x0, lam0
+
+
+def _hopf_test(eigenvalues, imag_tol=1e-8):
+    # Real part of the rightmost complex-conjugate pair; nan if there is none
+    complex_pairs = eigenvalues[np.abs(eigenvalues.imag) > imag_tol]
+    return complex_pairs.real.max() if len(complex_pairs) else np.nan
+
+
+def continue_branch(compiled, parameter, fixed, x0, lam0, lam_range, direction=1.0,
+                    h=0.05, h_min=1e-6, h_max=0.5, max_steps=2000, tol=1e-9, max_iter=8):
+    """Trace an equilibrium branch from (x0, lam0) by pseudo-arclength continuation.
+
+    Returns the raw points as (states, parameter values, converged); trace() joins both
+    directions and annotates the whole branch once.
+    """
+    problem = _Problem(compiled, parameter, fixed)
+    lam_lo, lam_hi = min(lam_range), max(lam_range)
+    n = len(x0)
+    u = np.append(np.asarray(x0, dtype=float), lam0)
+    previous = np.zeros(n + 1)
+    previous[-1] = direction
+    tangent = _tangent(problem, u[:n], u[n], previous)
+
+    points = [u]
+    converged = True
+    for _ in range(max_steps):
+        u_new, iterations, ok = _correct(problem, u + h * tangent, tangent, tol, max_iter)
+        if not ok:
+            h *= 0.5
+            if h < h_min:
+                converged = False
+                break
+            continue
+
+        # Adapt the step to how hard the corrector had to work
+        if iterations <= 3:
+            h = min(h * 1.3, h_max)
+        elif iterations >= max_iter - 2:
+            h = max(h * 0.7, h_min)
+
+        points.append(u_new)
+        u = u_new
+        if not lam_lo <= u[n] <= lam_hi:
+            break
+        try:
+            tangent = _tangent(problem, u[:n], u[n], tangent)
+        except np.linalg.LinAlgError:
+            converged = False
+            break
+
+    points = np.array(points)
+    return points[:, :n], points[:, n], converged
+
+
+def _annotate(problem, states, lams, converged):
+    # Spectra, stability and fold/Hopf detection along a traced branch
+    eigenvalues = np.array([np.linalg.eigvals(problem.Fx(x, lam)) for x, lam in zip(states, lams)])
+    stable = np.all(eigenvalues.real < 0, axis=1)
+    special = []
+
+    dlam = np.diff(lams)
+    for i in range(1, len(dlam)):
+        # Fold: the branch turns back in the parameter
+        if dlam[i - 1] * dlam[i] < 0:
+            x, lam = _refine_fold(problem, states[i], lams[i])
+            special.append({'kind': 'LP', 'index': i, 'parameter': lam, 'state': x})
+
+    hopf = np.array([_hopf_test(ev) for ev in eigenvalues])
+    for i in range(len(hopf) - 1):
+        a, b = hopf[i], hopf[i + 1]
+        if np.isfinite(a) and np.isfinite(b) and a * b < 0:
+            # Linear interpolation of the crossing of the imaginary axis
+            s = a / (a - b)
+            special.append({'kind': 'H', 'index': i,
+                            'parameter': lams[i] + s * (lams[i + 1] - lams[i]),
+                            'state': states[i] + s * (states[i + 1] - states[i])})
+
+    special.sort(key=lambda point: point['index'])
+    return Branch(lams, states, eigenvalues, stable, special, converged)
+
+
+def trace(compiled, parameter, fixed, x0, lam0, lam_range, **options):
+    """Both halves of the branch through (x0, lam0), joined into one Branch."""
+    (back_states, back_lams, back_ok), (states, lams, ok) = [
+        continue_branch(compiled, parameter, fixed, x0, lam0, lam_range, direction=d, **options)
+        for d in (-1.0, 1.0)]
+    problem = _Problem(compiled, parameter, fixed)
+    states = np.vstack([back_states[::-1], states[1:]])
+    lams = np.concatenate([back_lams[::-1], lams[1:]])
+    return _annotate(problem, states, lams, back_ok and ok)
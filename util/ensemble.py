@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.linalg import expm
+
+from util import instrument
+from util.jobs import MAX_JOBS, process_pool
+from util.compartments import three_compartment, two_compartment
+from util.propagator import augmented
+from util.schedule import DAILY, DAY
+
+# Samples handed to one worker process at a time
+CHUNK = 2048
+# Summaries of one compartment over the last simulated day
+OUTPUTS = ('mean', 'peak', 'trough')
+
+
+@dataclass
+class CompartmentModel:
+    graph: callable         # builds the CompartmentGraph from the parameters
+    parameters: tuple       # argument order of graph
+    defaults: tuple
+    compartments: tuple
+    y0: tuple
+
+    def system(self, *params, schedule=DAILY):
+        return self.graph(*params, schedule=schedule).systems()
+
+
+MODELS = {
+    'Two compartment': CompartmentModel(
+        two_compartment, ('a12_wake', 'A_wake', 'A_sleep', 'a', 'k'),
+        (0.0737390, 55.557583, 7.348874, 1.01, 0.346573), ('Brain', 'Plasma'), (600, 15.5)),
+    'Three compartment': CompartmentModel(
+        three_compartment, ('A_wake', 'A_sleep', 'a12_wake', 'k', 'a', 'a13_wake', 'a23_wake'),
+        (59.935858, 7.443667, 0.346573, 0.346573, 1.01, 0.1, 0.057762), ('Brain', 'CSF', 'Plasma'), (600, 600, 15)),
+}
+
+
+def generators(model, P, schedule=DAILY):
+    # Augmented generators of every parameter set, shape (batch, n + 1, n + 1) per state
+    G = {'wake': [], 'sleep': []}
+    for row in P:
+        for state, (M, b) in model.system(*row, schedule=schedule).items():
+            G[state].append(augmented(M, b))
+    return {state: np.array(g) for state, g in G.items()}
+
+
+@instrument.timed("ensemble simulate")
+def simulate(model, P, days=None, dt=0.1, start='periodic', max_points=600, schedule=DAILY):
+    """Advance every parameter set in P (batch x parameters) together over `days` days.
+
+    Each step multiplies the (batch x state) array by the batched one-step flow of the
+    current state of the schedule. start='periodic' begins on each set's entrained cycle
+    and covers the days of one period of the schedule, so it takes no `days`; otherwise
+    the run starts from model.y0 at t = 0 and lasts `days` (default 1). Returns the stored
+    times, the trajectories (batch, time, state) kept every few steps, and the last-day
+    OUTPUTS per compartment.
+    """
+    P = np.atleast_2d(np.asarray(P, dtype=float))
+    per_day = int(round(DAY / dt))
+    if start == 'periodic':
+        # The entrained cycle repeats every period, so one period shows all of it
+        if schedule.period is None:
+            raise ValueError("the schedule does not repeat, so it has no periodic steady state")
+        if days is not None:
+            raise ValueError("a periodic start covers one period of the schedule; days cannot be set")
+        days = int(np.ceil(schedule.period / DAY))
+    elif days is None:
+        days = 1
+    switches = np.concatenate([[DAY], schedule.switches(0.0, DAY * days)])
+    if not np.allclose(np.round(switches / dt) * dt, switches):
+        raise ValueError(f"dt={dt:g} h must divide the day and every switch of the schedule")
+    G = generators(model, P, schedule)
+    n = len(model.y0)
+
+    if start == 'periodic':
+        # Fixed point of each period map, built from the exact block lengths of one day
+        total = np.broadcast_to(np.eye(n + 1), (len(P), n + 1, n + 1))
+        for s, e, state in zip(*schedule.blocks(0.0, schedule.period)):
+            total = expm(G[state] * (e - s)) @ total
+        y = np.linalg.solve(np.eye(n) - total[:, :n, :n], total[:, :n, n][..., None])[..., 0]
+    else:
+        y = np.broadcast_to(np.asarray(model.y0, dtype=float), (len(P), n))
+    z = np.concatenate([y, np.ones((len(P), 1))], axis=1)
+
+    step = {state: expm(g * dt) for state, g in G.items()}
+    steps = per_day * days
+    t = dt * np.arange(steps + 1)
+    awake = schedule.awake(t[:-1] + 0.5 * dt)
+    stride = max(1, -(-steps // max_points))
+
+    kept = [z[:, :n]]
+    day = np.empty((len(P), per_day + 1, n))
+    first = steps - per_day
+    if first == 0:
+        day[:, 0] = z[:, :n]
+    for i in range(steps):
+        z = np.einsum('bij,bj->bi', step['wake' if awake[i] else 'sleep'], z)
+        if (i + 1) % stride == 0 or i + 1 == steps:
+            kept.append(z[:, :n])
+        if i + 1 >= first:
+            day[:, i + 1 - first] = z[:, :n]
+
+    times = np.concatenate([t[::stride], [t[-1]] if steps % stride else []])
+    Y = np.stack(kept, axis=1)
+    summaries = {}
+    for j, name in enumerate(model.compartments):
+        c = day[..., j]
+        # Trapezoid rule over the last day, without importing scipy.integrate
+        summaries[name, 'mean'] = dt * (c.sum(axis=1) - 0.5 * (c[:, 0] + c[:, -1])) / DAY
+        summaries[name, 'peak'] = c.max(axis=1)
+        summaries[name, 'trough'] = c.min(axis=1)
+    return times, Y, summaries
+
+
+def _summaries(name, P, days, dt, start, schedule):
+    # Worker entry point; trajectories stay in the worker, only the summaries travel back
+    return simulate(MODELS[name], P, days, dt, start, schedule=schedule)[2]
+
+
+@instrument.timed("ensemble run")
+def run_ensemble(name, P, days=None, dt=0.1, start='periodic', workers=None, chunk=CHUNK, schedule=DAILY):
+    """Last-day summaries of every row of P, computed in chunks across a process pool."""
+    P = np.atleast_2d(np.asarray(P, dtype=float))
+    chunks = [P[i:i + chunk] for i in range(0, len(P), chunk)]
+    workers = min(workers or MAX_JOBS, len(chunks))
+    if workers <= 1:
+        parts = [_summaries(name, c, days, dt, start, schedule) for c in chunks]
+    else:
+        with process_pool(workers) as pool:
+            parts = list(pool.map(_summaries, [name] * len(chunks), chunks,
+                                  [days] * len(chunks), [dt] * len(chunks), [start] * len(chunks),
+                                  [schedule] * len(chunks)))
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def bands(Y, percentiles=(5, 25, 50, 75, 95)):
+    # Percentiles across the ensemble, shape (len(percentiles), time, state)
+    return np.percentile(Y, percentiles, axis=0)
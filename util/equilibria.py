@@ -0,0 +1,210 @@
+import itertools
+import math
+
+import numpy as np
+import sympy as sp
+
+# Subsystems tried when the factors of the equations are combined; beyond this, sp.solve
+MAX_BRANCHES = 256
+# Exact polynomial systems with at most this many solutions (the product of the equations'
+# degrees) are left to sp.solve, which handles them faster than factoring does
+SMALL_SYSTEM = 4
+# How solve_equilibria found the solutions, as the pages describe it
+METHODS = {'linear': "linear algebra", 'polynomial': "factoring and Gröbner bases", 'general': "sp.solve"}
+
+
+def numerators(expressions):
+    # f = 0 where the numerator vanishes and the denominator does not
+    nums, dens = [], []
+    for expr in map(sp.sympify, expressions):
+        # together() is slow on long sums, so only expressions with a division go through it
+        if any(power.exp.is_negative for power in expr.atoms(sp.Pow)):
+            expr, den = sp.together(expr).as_numer_denom()
+        else:
+            den = sp.S.One
+        nums.append(expr)
+        dens.append(den)
+    return nums, dens
+
+
+def polynomials(expressions, symbols):
+    """Poly of each expression in the state variables it contains, or None if one is not polynomial.
+
+    Each Poly has only its own variables as generators: dense polynomials in every state
+    of a large network would cost far more than solving it.
+    """
+    polys = []
+    try:
+        for expr in expressions:
+            free = expr.free_symbols
+            gens = [s for s in symbols if s in free] or symbols[:1]
+            polys.append(sp.Poly(expr, *gens))
+    except sp.PolynomialError:
+        return None
+    return polys
+
+
+def _as_dicts(symbols, solutions):
+    # Free variables are left out, as sp.solve(..., dict=True) does
+    return [{s: v for s, v in zip(symbols, values) if v != s} for values in solutions]
+
+
+def linear_system(polys, symbols):
+    # A, b with A x = b, from the coefficients of polynomials of degree at most one
+    index = {s: j for j, s in enumerate(symbols)}
+    A, b = sp.zeros(len(polys), len(symbols)), sp.zeros(len(polys), 1)
+    for i, p in enumerate(polys):
+        for monomial, coefficient in p.terms():
+            if any(monomial):
+                A[i, index[p.gens[monomial.index(1)]]] = coefficient
+            else:
+                b[i] = -coefficient
+    return A, b
+
+
+def solve_linear(polys, symbols):
+    """Solutions of a system linear in the state variables.
+
+    A nonsingular system has one solution, from an LU factorization; with floating-point
+    coefficients (the network pages write those) NumPy does the factorization.
+    """
+    A, b = linear_system(polys, symbols)
+    if A.shape[0] == A.shape[1]:
+        if not A.free_symbols and not b.free_symbols and (A.has(sp.Float) or b.has(sp.Float)):
+            try:
+                x = np.linalg.solve(np.array(A, dtype=float), np.array(b, dtype=float)[:, 0])
+                return [dict(zip(symbols, (sp.Float(v) for v in x)))]
+            except np.linalg.LinAlgError:
+                pass
+        elif sp.cancel(A.det(method='berkowitz')) != 0:
+            return [dict(zip(symbols, (sp.cancel(v) for v in A.LUsolve(b))))]
+    # Singular or non-square: a family of solutions, or none
+    return _as_dicts(symbols, sp.linsolve((A, b), symbols))
+
+
+def _roots(poly, symbol):
+    roots = sp.roots(poly, symbol)
+    if sum(roots.values()) == sp.degree(poly, symbol):
+        return list(roots)
+    if poly.free_symbols == {symbol}:
+        # No closed form for some roots: every root numerically
+        return list(dict.fromkeys(sp.Poly(poly, symbol).nroots()))
+    # Quintics and beyond with parameters: let solve return what closed forms it can
+    return sp.solve(poly, symbol)
+
+
+def solve_triangular(polys, symbols):
+    """Solutions of a polynomial system through its lex Gröbner basis.
+
+    The basis is triangular: its last elements involve only the last variable, so the
+    variables are solved from last to first by substituting the roots found so far.
+    """
+    inexact = any(sp.sympify(p).has(sp.Float) for p in polys)
+    if inexact:
+        # Gröbner bases need exact arithmetic; the roots are evaluated back to floats at the end
+        polys = [sp.nsimplify(p, rational=True) for p in polys]
+    basis = sp.groebner(polys, *symbols, order='lex')
+    if basis.exprs == [1]:
+        return []
+    solutions = [{}]
+    for k in range(len(symbols) - 1, -1, -1):
+        symbol, later = symbols[k], set(symbols[k:])
+        relevant = [g for g in basis.exprs if symbol in g.free_symbols and g.free_symbols & set(symbols) <= later]
+        extended = []
+        for solution in solutions:
+            candidates = [sp.expand(g.subs(solution)) for g in relevant]
+            candidates = [g for g in candidates if g != 0]
+            if not candidates:
+                # Not determined by the basis: a free variable
+                extended.append(solution)
+                continue
+            g = min(candidates, key=lambda g: sp.degree(g, symbol))
+            for root in _roots(g, symbol):
+                extended.append({**solution, symbol: root})
+        solutions = extended
+    solutions = [{s: solution[s] for s in symbols if s in solution} for solution in solutions
+                 if _consistent(basis, solution)]
+    if inexact:
+        solutions = [{s: v.evalf() for s, v in solution.items()} for solution in solutions]
+    return solutions
+
+
+def _vanishes(expr, tol=1e-8, scale=1.0):
+    """Whether expr is zero: True, False, or None when that depends on the parameters.
+
+    Floats are compared with a tolerance, exact numbers at high precision; simplify() would
+    decide more cases but costs more than the whole solve.
+    """
+    expr = sp.expand(expr)
+    if expr == 0:
+        return True
+    if expr.free_symbols:
+        return None
+    if expr.has(sp.Float):
+        return abs(complex(expr.evalf())) <= tol * scale
+    return abs(complex(expr.evalf(30))) < 1e-20
+
+
+def _consistent(basis, solution):
+    # Drop partial solutions that do not extend, when that can be decided
+    scale = max([1.0] + [abs(complex(v)) for v in solution.values() if not v.free_symbols])
+    for g in basis.exprs:
+        if _vanishes(g.subs(solution), scale=scale ** sp.Poly(g).total_degree()) is False:
+            return False
+    return True
+
+
+def solve_polynomial(polys, symbols):
+    """Solutions of a polynomial system, split into subsystems along the factors of each equation.
+
+    Every choice of one irreducible factor per equation is a smaller system; most of them are
+    linear (x*(1 - x - a*y) = 0 gives x = 0 or 1 - x - a*y = 0) and solved by solve_linear,
+    the rest by solve_triangular.
+    """
+    factors = []
+    for p in polys:
+        if p.is_zero:
+            continue
+        found = list(dict.fromkeys(f.as_expr() for f, _ in sp.factor_list(p.as_expr(), *symbols)[1]))
+        if not found:
+            # A nonzero constant never vanishes
+            return []
+        factors.append(found)
+    if not factors or math.prod(len(f) for f in factors) > MAX_BRANCHES:
+        return None
+
+    solutions = []
+    for branch in itertools.product(*factors):
+        branch_polys = polynomials(branch, symbols)
+        if all(p.total_degree() <= 1 for p in branch_polys):
+            found = solve_linear(branch_polys, symbols)
+        else:
+            found = solve_triangular(branch, symbols)
+        for solution in found:
+            if solution not in solutions:
+                solutions.append(solution)
+    return solutions
+
+
+def solve_equilibria(expressions, symbols):
+    """All equilibria of dX/dt = expressions as sp.solve(..., dict=True) lists them, and the method used.
+
+    The method is a key of METHODS. Systems linear in the state go through linear algebra
+    and larger polynomial ones through factoring and Gröbner bases; the rest reach sp.solve.
+    """
+    symbols = list(symbols)
+    nums, dens = numerators(expressions)
+    polys = polynomials(nums, symbols)
+    solutions, method = None, 'general'
+    if polys is not None:
+        degrees = [p.total_degree() for p in polys]
+        if all(d <= 1 for d in degrees):
+            solutions, method = solve_linear(polys, symbols), 'linear'
+        elif math.prod(degrees) > SMALL_SYSTEM or any(p.has(sp.Float) for p in nums):
+            solutions, method = solve_polynomial(polys, symbols), 'polynomial'
+    if solutions is None:
+        return sp.solve([sp.Eq(expr, 0) for expr in expressions], symbols, dict=True), 'general'
+    # Zeros of a numerator where the denominator vanishes too are not equilibria
+    dens = [den for den in dens if den.free_symbols & set(symbols)]
+    return [solution for solution in solutions
+            if not any(_vanishes(den.subs(solution)) for den in dens)], method
@@ -0,0 +1,133 @@
+import io
+from dataclasses import dataclass
+
+import numpy as np
+
+from util import instrument
+from util.ensemble import MODELS
+from util.jobs import MAX_JOBS, process_pool
+from util.propagator import propagate
+from util.schedule import DAILY
+from util.steady_state import monodromy
+
+
+@dataclass
+class Fit:
+    names: tuple            # fitted parameters
+    values: np.ndarray      # best estimates
+    stderr: np.ndarray      # linearised standard errors
+    lower: np.ndarray       # 95 % confidence interval, from the log-parameter covariance
+    upper: np.ndarray
+    cost: float             # half the sum of squared weighted residuals
+    rmse: float
+    dof: int
+    success: bool
+    message: str
+    start_costs: np.ndarray  # final cost of every start, best first
+
+
+def read_measurements(data):
+    """Time column plus one column per measured compartment from CSV text or bytes.
+
+    The first column is time in hours; the other columns are matched to compartments by
+    header name (case-insensitive). Empty cells are missing values.
+    """
+    if isinstance(data, bytes):
+        data = data.decode()
+    table = np.genfromtxt(io.StringIO(data), delimiter=',', names=True, dtype=float, encoding=None)
+    names = table.dtype.names
+    t = np.asarray(table[names[0]], dtype=float)
+    order = np.argsort(t, kind='stable')
+    return t[order], {name: np.asarray(table[name], dtype=float)[order] for name in names[1:]}
+
+
+def match_compartments(model, columns):
+    # Column name -> compartment index, for the columns that name a compartment
+    lookup = {c.lower(): i for i, c in enumerate(model.compartments)}
+    return {name: lookup[name.lower()] for name in columns if name.lower() in lookup}
+
+
+def predict(model, params, t, start='periodic', schedule=DAILY):
+    """Exact model trajectory at the times t, from the entrained cycle or from model.y0 at t = 0."""
+    systems = model.system(*params, schedule=schedule)
+    if start == 'periodic':
+        # The periodic state at t = 0 repeats at every whole period
+        Phi, c = monodromy(systems, schedule=schedule)
+        y0 = np.linalg.solve(np.eye(len(c)) - Phi, c)
+        t_start = schedule.period * np.floor(t.min() / schedule.period)
+    else:
+        y0, t_start = np.asarray(model.y0, dtype=float), 0.0
+    return propagate(systems, y0, np.concatenate([[t_start], t]), schedule=schedule)[1:]
+
+
+def _residuals(x, model, nominal, index, t, observed, columns, weights, start, schedule=DAILY):
+    # Rates and inputs are positive, so the fit runs on log-parameters
+    params = nominal.copy()
+    params[index] = np.exp(x)
+    y = predict(model, params, t, start, schedule)
+    r = (y[:, columns] - observed) * weights
+    return r[np.isfinite(observed)]
+
+
+def _fit_one(name, nominal, index, x0, t, observed, columns, weights, start, schedule=DAILY):
+    # Worker entry point for one start
+    from scipy.optimize import least_squares
+
+    result = least_squares(_residuals, x0, method='trf', x_scale='jac',
+                           args=(MODELS[name], nominal, index, t, observed, columns, weights, start, schedule))
+    return result.x, result.fun, result.jac, result.cost, result.success, result.message
+
+
+def start_points(x0, count, spread, seed=0):
+    # The nominal point plus Latin-hypercube starts within a factor exp(±spread) of it
+    if count <= 1:
+        return x0[None]
+    from scipy.stats import qmc
+
+    sample = qmc.LatinHypercube(d=len(x0), seed=seed).random(count - 1)
+    return np.vstack([x0, x0 + spread * (2 * sample - 1)])
+
+
+@instrument.timed("fit")
+def fit(name, nominal, fitted, t, data, start='periodic', n_starts=8, spread=1.0, workers=None, seed=0,
+        schedule=DAILY):
+    """Least-squares estimates of the parameters named in `fitted` from measured compartments.
+
+    data maps column names to measurements at t, taken under the sleep/wake schedule;
+    each compartment is weighted by the inverse RMS of its data so that all of them count. Every start runs in its own
+    worker; the lowest cost wins and its Jacobian gives the confidence intervals.
+    """
+    model = MODELS[name]
+    nominal = np.asarray(nominal, dtype=float)
+    index = np.array([model.parameters.index(p) for p in fitted])
+    matched = match_compartments(model, data)
+    if not matched:
+        raise ValueError(f"no data column is named after a compartment of {name}: {model.compartments}")
+    observed = np.column_stack([data[c] for c in matched])
+    columns = np.array(list(matched.values()))
+    weights = 1.0 / np.sqrt(np.nanmean(observed ** 2, axis=0))
+
+    starts = start_points(np.log(nominal[index]), n_starts, spread, seed)
+    args = (name, nominal, index)
+    rest = (t, observed, columns, weights, start, schedule)
+    workers = min(workers or MAX_JOBS, len(starts))
+    if workers <= 1:
+        runs = [_fit_one(*args, x0, *rest) for x0 in starts]
+    else:
+        with process_pool(workers) as pool:
+            runs = [f.result() for f in [pool.submit(_fit_one, *args, x0, *rest) for x0 in starts]]
+    costs = np.array([run[3] for run in runs])
+    x, residuals, J, cost, success, message = runs[int(np.argmin(costs))]
+
+    # Covariance of the log-parameters from the Gauss-Newton Hessian
+    m, p = len(residuals), len(x)
+    dof = max(m - p, 1)
+    s2 = 2 * cost / dof
+    cov = s2 * np.linalg.pinv(J.T @ J)
+    se_log = np.sqrt(np.clip(np.diag(cov), 0, None))
+    from scipy.stats import t as student_t
+
+    q = student_t.ppf(0.975, dof)
+    values = np.exp(x)
+    return Fit(tuple(fitted), values, values * se_log, np.exp(x - q * se_log), np.exp(x + q * se_log),
+               float(cost), float(np.sqrt(2 * cost / m)), dof, bool(success), message, np.sort(costs))
@@ -0,0 +1,325 @@
+# Headless runs of the models, streamed to disk in fixed-size chunks so that memory does
+# not grow with the horizon or with the number of runs in a batch
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from util.compartments import parse_network, periodic_state, simulate
+from util.ensemble import MODELS
+from util.jobs import MAX_JOBS, process_pool
+from util.schedule import DAILY, Schedule
+
+# Rows per chunk; a chunk of a three-compartment run is about 2 MB
+CHUNK_ROWS = 65536
+FORMATS = ('npy', 'npz', 'parquet')
+
+USAGE = """examples:
+  python -m util.headless --model "Two compartment" --days 3650 --out brain.npy
+  python -m util.headless --equations lorenz.txt --params runs.csv --out results/ --format parquet"""
+
+
+@dataclass
+class Run:
+    model: str = None           # a key of MODELS
+    network: str = None         # network text, as on the Compartment Network page
+    equations: str = None       # 'dX/dt = ...' lines
+    parameters: dict = field(default_factory=dict)
+    y0: object = None           # {name: value} or a list in state order; model defaults otherwise
+    start: str = 'initial'      # or 'periodic', the entrained cycle at t = 0 (compartment models only)
+    days: float = 1.0
+    dt: float = 0.01            # step of the output grid before striding, in hours
+    stride: int = 1             # keep every stride-th point of the grid
+    protocol: str = None        # Schedule.from_text text; the regular daily protocol otherwise
+    method: str = 'LSODA'       # integrator of equation systems
+
+
+def _state(names, given, default):
+    # Start state in the order of names from a mapping, a list or the default
+    if given is None:
+        if default is None:
+            raise ValueError(f"an initial value is needed for every variable: {names}")
+        return np.asarray(default, dtype=float)
+    if isinstance(given, dict):
+        missing = [name for name in names if name not in given and default is None]
+        if missing:
+            raise ValueError(f"no initial value for {missing}")
+        return np.array([given.get(name, default[i] if default is not None else 0.0)
+                         for i, name in enumerate(names)], dtype=float)
+    y0 = np.asarray(given, dtype=float)
+    if y0.shape != (len(names),):
+        raise ValueError(f"y0 needs {len(names)} values, one per variable {names}")
+    return y0
+
+
+def prepare(run):
+    """State names, start state and advance(y, t_from, t) -> states at t for one run."""
+    schedule = Schedule.from_text(run.protocol) if run.protocol else DAILY
+    if sum(source is not None for source in (run.model, run.network, run.equations)) != 1:
+        raise ValueError("a run needs exactly one of model, network or equations")
+
+    if run.equations is not None:
+        from util.integrate import integrate_segmented
+        from util.kernels import compile_system
+
+        compiled = compile_system(run.equations)
+        missing = [p for p in compiled.parameters if p not in run.parameters]
+        if missing:
+            raise ValueError(f"no value for the parameters {missing}")
+        if run.start == 'periodic':
+            raise ValueError("a periodic start needs a compartment model")
+        p = compiled.params(run.parameters)
+        rhs = lambda t, y: compiled.rhs(t, y, p)
+        jac = lambda t, y: compiled.jac(t, y, p)
+
+        def advance(y, t_from, t):
+            # One block: equation systems have no sleep/wake forcing of their own
+            blocks = (np.array([t_from]), np.array([t[-1]]), np.array(['wake']))
+            return integrate_segmented(rhs, y, (t_from, t[-1]), t, run.method, blocks, jac=jac)[0]
+
+        return list(compiled.variables), _state(compiled.variables, run.y0, None), advance
+
+    if run.model is not None:
+        model = MODELS[run.model]
+        unknown = set(run.parameters) - set(model.parameters)
+        if unknown:
+            raise ValueError(f"{run.model} has no parameters {sorted(unknown)}; it takes {model.parameters}")
+        params = [run.parameters.get(name, default) for name, default in zip(model.parameters, model.defaults)]
+        graph, default = model.graph(*params, schedule=schedule), model.y0
+    else:
+        graph, default = parse_network(run.network, schedule)
+    names = list(graph.compartments)
+    y0 = periodic_state(graph) if run.start == 'periodic' else _state(names, run.y0, default)
+
+    def advance(y, t_from, t):
+        return simulate(graph, y, np.concatenate([[t_from], t]))[1:]
+
+    return names, y0, advance
+
+
+def output_grid(run):
+    # Number of output rows and their spacing; rows are t = k * step from t = 0
+    step = run.dt * run.stride
+    return int(np.floor(24.0 * run.days / step + 1e-9)) + 1, step
+
+
+class _NpyWriter:
+    # A .npy header for the whole array, then each chunk appended; read back memory-mapped
+    def __init__(self, path, columns, rows):
+        self.file = open(path, 'wb')
+        header = {'descr': '<f8', 'fortran_order': False, 'shape': (rows, len(columns))}
+        np.lib.format.write_array_header_1_0(self.file, header)
+
+    def write(self, chunk):
+        self.file.write(np.ascontiguousarray(chunk, dtype='<f8').tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class _NpzWriter:
+    # The same stream as a 'data' entry of an uncompressed archive, followed by the column names
+    def __init__(self, path, columns, rows):
+        self.columns = columns
+        self.zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        self.file = self.zip.open('data.npy', 'w', force_zip64=True)
+        header = {'descr': '<f8', 'fortran_order': False, 'shape': (rows, len(columns))}
+        np.lib.format.write_array_header_1_0(self.file, header)
+
+    def write(self, chunk):
+        self.file.write(np.ascontiguousarray(chunk, dtype='<f8').tobytes())
+
+    def close(self):
+        self.file.close()
+        with self.zip.open('columns.npy', 'w') as f:
+            np.lib.format.write_array(f, np.array(self.columns))
+        self.zip.close()
+
+
+class _ParquetWriter:
+    # One row group per chunk; pyarrow is only needed for this format
+    def __init__(self, path, columns, rows):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("parquet output needs pyarrow (pip install pyarrow)") from e
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema([(name, pa.float64()) for name in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, chunk):
+        arrays = [self.pa.array(chunk[:, j]) for j in range(chunk.shape[1])]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {'npy': _NpyWriter, 'npz': _NpzWriter, 'parquet': _ParquetWriter}
+
+
+def output_format(path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"unknown output format {fmt!r}; use one of {FORMATS}")
+    return fmt
+
+
+def chunks(run, chunk_rows=CHUNK_ROWS):
+    """Column names, then (t, y) arrays of at most chunk_rows rows covering the run's output grid."""
+    names, y, advance = prepare(run)
+    rows, step = output_grid(run)
+    yield names
+    t_from = 0.0
+    for first in range(0, rows, chunk_rows):
+        t = step * np.arange(first, min(first + chunk_rows, rows))
+        if first == 0:
+            # The grid starts at t = 0 with the start state itself
+            Y = np.vstack([y, advance(y, 0.0, t[1:])]) if len(t) > 1 else y[None]
+        else:
+            Y = advance(y, t_from, t)
+        yield t, Y
+        y, t_from = Y[-1], t[-1]
+
+
+def run_to_file(run, path, fmt=None, chunk_rows=CHUNK_ROWS):
+    """Stream one run to path (.npy, .npz or .parquet); metadata goes to path + '.json'.
+
+    Columns are time in hours followed by the states. Returns the metadata.
+    """
+    fmt = output_format(path, fmt)
+    began = time.perf_counter()
+    stream = chunks(run, chunk_rows)
+    columns = ['t'] + next(stream)
+    rows, step = output_grid(run)
+    writer = WRITERS[fmt](path, columns, rows)
+    try:
+        for t, Y in stream:
+            writer.write(np.column_stack([t, Y]))
+            last = Y[-1]
+    finally:
+        writer.close()
+    meta = {'columns': columns, 'rows': rows, 'step': step, 'format': fmt,
+            'final_state': dict(zip(columns[1:], last.tolist())),
+            'seconds': time.perf_counter() - began,
+            'run': {k: v for k, v in vars(run).items() if v is not None}}
+    with open(f"{path}.json", 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def read_output(path):
+    """Columns and a (rows, columns) array of a file written by run_to_file; .npy is memory-mapped."""
+    fmt = output_format(path)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        return table.column_names, np.column_stack([c.to_numpy() for c in table.columns])
+    with open(f"{path}.json") as f:
+        columns = json.load(f)['columns']
+    if fmt == 'npy':
+        return columns, np.load(path, mmap_mode='r')
+    with np.load(path) as archive:
+        return [str(c) for c in archive['columns']], archive['data']
+
+
+def _run_one(run, path, fmt, chunk_rows):
+    # Worker entry point of a batch
+    return run_to_file(run, path, fmt, chunk_rows)
+
+
+def run_batch(runs, directory, fmt='npy', chunk_rows=CHUNK_ROWS, workers=None):
+    """Write every run to directory/run_0000.<fmt>, ...; returns their metadata in order."""
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, f"run_{i:04d}.{fmt}") for i in range(len(runs))]
+    workers = min(workers or MAX_JOBS, len(runs))
+    if workers <= 1:
+        return [run_to_file(run, path, fmt, chunk_rows) for run, path in zip(runs, paths)]
+    with process_pool(workers) as pool:
+        return [f.result() for f in [pool.submit(_run_one, run, path, fmt, chunk_rows)
+                                     for run, path in zip(runs, paths)]]
+
+
+def read_runs(path, base):
+    """Runs from a parameter file: a JSON object or list of objects with Run fields, or a CSV
+    table with one run per row whose columns are parameter names. base supplies the other fields."""
+    with open(path) as f:
+        text = f.read()
+    if path.lower().endswith('.csv'):
+        rows = list(csv.DictReader(text.splitlines()))
+        return [Run(**{**vars(base), 'parameters': {**base.parameters, **{k: float(v) for k, v in row.items()}}})
+                for row in rows]
+    data = json.loads(text)
+    fields = set(Run.__dataclass_fields__)
+    runs = []
+    for item in data if isinstance(data, list) else [data]:
+        unknown = set(item) - fields
+        if unknown:
+            raise ValueError(f"unknown run settings {sorted(unknown)}")
+        runs.append(Run(**{**vars(base), **item, 'parameters': {**base.parameters, **item.get('parameters', {})}}))
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m util.headless", epilog=USAGE,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="Run a model, network or equation file and stream it to disk.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--model", choices=list(MODELS))
+    source.add_argument("--network", help="network file, one route per line")
+    source.add_argument("--equations", help="file of 'dX/dt = ...' lines")
+    parser.add_argument("--params", help="JSON or CSV parameter file; several runs make a batch")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="parameter value")
+    parser.add_argument("--y0", help="comma-separated start state")
+    parser.add_argument("--start", choices=('initial', 'periodic'), default='initial')
+    parser.add_argument("--days", type=float, default=1.0)
+    parser.add_argument("--dt", type=float, default=0.01, help="output grid step before striding (hr)")
+    parser.add_argument("--stride", type=int, default=1, help="keep every stride-th grid point")
+    parser.add_argument("--protocol", help="sleep/wake protocol file ('hour state' lines)")
+    parser.add_argument("--method", default='LSODA', help="integrator for equation systems")
+    parser.add_argument("--out", required=True, help="output file, or a directory for a batch")
+    parser.add_argument("--format", choices=FORMATS, help="output format; from the file suffix by default")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per chunk")
+    parser.add_argument("--workers", type=int, help="worker processes for a batch")
+    args = parser.parse_args(argv)
+
+    def read(path):
+        with open(path) as f:
+            return f.read()
+
+    parameters = {}
+    for item in args.set:
+        name, _, value = item.partition('=')
+        parameters[name.strip()] = float(value)
+    base = Run(model=args.model, network=args.network and read(args.network),
+               equations=args.equations and read(args.equations), parameters=parameters,
+               y0=[float(v) for v in args.y0.split(',')] if args.y0 else None, start=args.start,
+               days=args.days, dt=args.dt, stride=args.stride,
+               protocol=args.protocol and read(args.protocol), method=args.method)
+    runs = read_runs(args.params, base) if args.params else [base]
+
+    try:
+        if len(runs) == 1 and not os.path.isdir(args.out):
+            metas = [run_to_file(runs[0], args.out, args.format, args.chunk)]
+        else:
+            metas = run_batch(runs, args.out, args.format or 'npy', args.chunk, args.workers)
+    except (ValueError, RuntimeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    for meta in metas:
+        print(f"{meta['rows']} rows x {len(meta['columns'])} columns in {meta['seconds']:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+# Finished reruns kept for the panel and the JSON export
+HISTORY = int(os.environ.get("DSA_INSTRUMENT_HISTORY", 50))
+# Serve /metrics (Prometheus text) and /metrics.json on this port when set
+PORT = os.environ.get("DSA_METRICS_PORT")
+HOST = os.environ.get("DSA_METRICS_HOST", "127.0.0.1")
+
+# Events counted by the solvers, in the order the panel lists them. nfev, njev and nlu are
+# solve_ivp calls; rhs_evaluations counts the states evaluated by the batched kernels
+EVENTS = ('nfev', 'njev', 'nlu', 'segments', 'rk4_steps', 'rhs_evaluations', 'newton_iterations',
+          'jacobian_evaluations', 'pipeline_hits', 'pipeline_misses')
+
+
+@dataclass
+class Rerun:
+    page: str
+    began: float = field(default_factory=time.time)
+    seconds: float = None
+    stages: dict = field(default_factory=OrderedDict)     # stage -> {"seconds", "calls"}, nested stages inclusive
+    counters: dict = field(default_factory=dict)
+    caches: dict = field(default_factory=dict)            # cache -> hits and misses during this rerun
+    memory: dict = field(default_factory=dict)
+
+    def as_dict(self):
+        return {"page": self.page, "began": self.began, "seconds": self.seconds, "stages": dict(self.stages),
+                "counters": self.counters, "caches": self.caches, "memory": self.memory}
+
+
+# Each Streamlit session runs its script in its own thread
+_local = threading.local()
+_lock = threading.Lock()
+history = deque(maxlen=HISTORY)
+# Totals since the process started, whether or not a rerun was being recorded
+totals = {"stages": {}, "counters": {}, "reruns": {}}
+_caches = {}
+
+
+def current():
+    return getattr(_local, "rerun", None)
+
+
+def record(name, seconds):
+    rerun = current()
+    if rerun is not None:
+        entry = rerun.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+    with _lock:
+        entry = totals["stages"].setdefault(name, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+
+
+def count(**events):
+    rerun = current()
+    if rerun is not None:
+        for name, n in events.items():
+            rerun.counters[name] = rerun.counters.get(name, 0) + int(n)
+    with _lock:
+        for name, n in events.items():
+            totals["counters"][name] = totals["counters"].get(name, 0) + int(n)
+
+
+@contextmanager
+def stage(name):
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - began)
+
+
+def timed(name):
+    # Decorator form of stage()
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_cache(name, stats):
+    # stats() -> dict of numbers, e.g. ResultCache.stats
+    _caches[name] = stats
+
+
+def cache_stats():
+    return {name: stats() for name, stats in _caches.items()}
+
+
+def resident_memory():
+    # Current and peak resident set size in bytes, None where the platform does not tell
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        rss = None
+    return {"rss": rss, "peak_rss": peak}
+
+
+@contextmanager
+def rerun(page, trace_memory=False):
+    """Record the stages, solver counters, cache traffic and memory of one script run.
+
+    With trace_memory the peak of Python allocations is measured by tracemalloc, which slows
+    allocation-heavy code severalfold and sees every thread of the process.
+    """
+    import tracemalloc
+
+    run = Rerun(page)
+    before = cache_stats()
+    rss_before = resident_memory()["rss"]
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif trace_memory:
+        tracemalloc.reset_peak()
+    _local.rerun = run
+    began = time.perf_counter()
+    try:
+        yield run
+    finally:
+        run.seconds = time.perf_counter() - began
+        _local.rerun = None
+        for name, stats in cache_stats().items():
+            run.caches[name] = {k: v - before.get(name, {}).get(k, 0) for k, v in stats.items()
+                                if k in ("hits", "disk_hits", "misses")}
+        run.memory = resident_memory()
+        if rss_before is not None and run.memory["rss"] is not None:
+            run.memory["rss_growth"] = run.memory["rss"] - rss_before
+        if trace_memory:
+            run.memory["peak_python"] = tracemalloc.get_traced_memory()[1]
+        if tracing:
+            tracemalloc.stop()
+        with _lock:
+            history.append(run)
+            entry = totals["reruns"].setdefault(page, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += run.seconds
+            entry["count"] += 1
+
+
+def snapshot():
+    with _lock:
+        reruns = [run.as_dict() for run in history]
+        process = json.loads(json.dumps(totals))
+    return {"time": time.time(), "pid": os.getpid(), "memory": resident_memory(), "totals": process,
+            "caches": cache_stats(), "reruns": reruns}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metrics_text():
+    """The process totals in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+
+    def metric(name, kind, help, samples):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+
+    stages = data["totals"]["stages"]
+    metric("dsa_stage_seconds_total", "counter", "Time spent in each instrumented stage.",
+           [({"stage": s}, v["seconds"]) for s, v in stages.items()])
+    metric("dsa_stage_calls_total", "counter", "Calls of each instrumented stage.",
+           [({"stage": s}, v["calls"]) for s, v in stages.items()])
+    metric("dsa_solver_events_total", "counter", "Right-hand side, Jacobian and step counts of the solvers.",
+           [({"event": e}, n) for e, n in data["totals"]["counters"].items()])
+    reruns = data["totals"]["reruns"]
+    metric("dsa_reruns_total", "counter", "Script runs per page.", [({"page": p}, v["count"]) for p, v in reruns.items()])
+    metric("dsa_rerun_seconds_total", "counter", "Script run time per page.",
+           [({"page": p}, v["seconds"]) for p, v in reruns.items()])
+    for stat in sorted({k for stats in data["caches"].values() for k in stats}):
+        kind = "counter" if stat in ("hits", "disk_hits", "misses") else "gauge"
+        name = f"dsa_cache_{stat}" + ("_total" if kind == "counter" else "")
+        metric(name, kind, f"Cache {stat.replace('_', ' ')}.",
+               [({"cache": c}, stats[stat]) for c, stats in data["caches"].items() if stat in stats])
+    memory = data["memory"]
+    if memory["rss"] is not None:
+        metric("dsa_resident_memory_bytes", "gauge", "Resident set size of the process.", [({}, memory["rss"])])
+    if memory["peak_rss"] is not None:
+        metric("dsa_peak_resident_memory_bytes", "gauge", "Peak resident set size of the process.",
+               [({}, memory["peak_rss"])])
+    return "\n".join(lines) + "\n"
+
+
+_server = None     # False once binding the port failed
+
+
+def serve(port=PORT, host=HOST):
+    """Start the metrics endpoint once per process, in a daemon thread; returns its address or None."""
+    global _server
+    if not port:
+        return None
+    with _lock:
+        if _server is None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path == "/metrics":
+                        body, kind = metrics_text().encode(), "text/plain; version=0.0.4"
+                    elif self.path == "/metrics.json":
+                        body, kind = json.dumps(snapshot()).encode(), "application/json"
+                    else:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", kind)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                _server = ThreadingHTTPServer((host, int(port)), Handler)
+                threading.Thread(target=_server.serve_forever, daemon=True).start()
+            except OSError:
+                # Another worker of this host already serves the port; do not retry every rerun
+                _server = False
+    if not _server:
+        return None
+    return f"http://{_server.server_address[0]}:{_server.server_address[1]}"
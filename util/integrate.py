@@ -0,0 +1,61 @@
+import numpy as np
+
+from util import instrument
+from util.schedule import DAILY
+
+# Integrators offered by the simulation pages besides the exact propagator
+METHODS = ('LSODA', 'RK45', 'Radau')
+# Methods that take a sparse Jacobian
+IMPLICIT = ('Radau', 'BDF')
+
+
+@instrument.timed("integrate")
+def integrate_segmented(rhs, y0, t_span, t_eval, method='LSODA', blocks=None, rtol=1e-8, atol=1e-10,
+                        jac=None, schedule=DAILY):
+    """Integrate dy/dt = rhs(t, y), restarting the solver at every sleep/wake switch.
+
+    Inside a block the forcing is constant, so the stepper never has to locate a jump.
+    Output is produced only at t_eval, which may cover just the plotted window.
+    jac(t, y), dense or sparse, is used by the implicit methods that accept it.
+    Returns the solution at t_eval and the summed solver statistics; t_eval must lie in t_span.
+    """
+    # Only the integrator pages need scipy.integrate; the exact propagator does not
+    from scipy.integrate import solve_ivp
+
+    t_eval = np.asarray(t_eval, dtype=float)
+    if len(t_eval) and (t_eval.min() < min(t_span) or t_eval.max() > max(t_span)):
+        raise ValueError("values in t_eval are not within t_span")
+    if blocks is None:
+        blocks = schedule.blocks(*t_span)
+    # Times that given blocks leave uncovered stay nan
+    sol = np.full((len(t_eval), len(y0)), np.nan)
+    info = {'nfev': 0, 'njev': 0, 'nlu': 0, 'segments': 0}
+
+    y = np.asarray(y0, dtype=float)
+    for start, end, _ in zip(*blocks):
+        # Keep the forcing of this block at its end point, where the schedule already switched
+        last = np.nextafter(end, start)
+
+        def block_rhs(t, y):
+            return rhs(min(max(t, start), last), y)
+
+        options = {}
+        if jac is not None and method in IMPLICIT:
+            options['jac'] = lambda t, y: jac(min(max(t, start), last), y)
+
+        inside = (t_eval >= start) & ((t_eval < end) | (end == t_span[1])) & (t_eval <= end)
+        # Always ask for the block end too, so the next block starts from the exact state
+        wanted = t_eval[inside]
+        if not len(wanted) or wanted[-1] != end:
+            wanted = np.append(wanted, end)
+        result = solve_ivp(block_rhs, (start, end), y, method=method, rtol=rtol, atol=atol, t_eval=wanted, **options)
+        if not result.success:
+            raise RuntimeError(f"{method} failed between t={start:g} and t={end:g}: {result.message}")
+        sol[inside] = result.y.T[:inside.sum()]
+        y = result.y[:, -1]
+        info['nfev'] += result.nfev
+        info['njev'] += result.njev
+        info['nlu'] += result.nlu
+        info['segments'] += 1
+    instrument.count(**info)
+    return sol, info
@@ -0,0 +1,151 @@
+import hashlib
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from util import instrument
+
+# Wall-clock limit for one job and how many jobs may run at once in this server
+DEFAULT_TIMEOUT = float(os.environ.get("DSA_JOB_TIMEOUT", 30))
+MAX_JOBS = int(os.environ.get("DSA_MAX_JOBS", os.cpu_count() or 2))
+
+_slots = threading.BoundedSemaphore(MAX_JOBS)
+# Never fork the server itself: its other threads may hold locks that the child would inherit
+# held. Workers fork from a single-threaded server process instead, which has SymPy imported
+_context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+                                       else "spawn")
+if _context.get_start_method() == "forkserver":
+    _context.set_forkserver_preload(["numpy", "sympy"])
+
+
+def process_pool(workers):
+    """ProcessPoolExecutor whose workers start the way job workers do."""
+    return ProcessPoolExecutor(workers, mp_context=_context)
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _worker(conn, func, args, kwargs):
+    try:
+        conn.send(("ok", func(*args, **kwargs)))
+    except BaseException as e:
+        try:
+            conn.send(("error", e))
+        except Exception:
+            conn.send(("error", RuntimeError(repr(e))))
+    finally:
+        conn.close()
+
+
+class Job:
+    # One call running in its own worker process, so it can be killed at any time
+    def __init__(self, func, args=(), kwargs=None, key=None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.key = key
+        self.process = None
+        self.cancelled = False
+        self._conn = None
+        self._holds_slot = False
+        self._lock = threading.Lock()
+
+    def start(self, wait=None):
+        if not _slots.acquire(timeout=wait):
+            raise JobTimeout("no free worker")
+        self._holds_slot = True
+        self._conn, child = _context.Pipe(duplex=False)
+        self.process = _context.Process(target=_worker, args=(child, self.func, self.args, self.kwargs), daemon=True)
+        self.process.start()
+        child.close()
+        return self
+
+    def _release(self):
+        # cancel() may race between a rerun and the call that started the job
+        with self._lock:
+            if self._holds_slot:
+                self._holds_slot = False
+                _slots.release()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.kill()
+        self._release()
+
+    def result(self, timeout=DEFAULT_TIMEOUT, on_progress=None, interval=0.1):
+        """Wait for the job, reporting the elapsed fraction of the timeout; kills it on timeout."""
+        started = time.monotonic()
+        try:
+            while not self._conn.poll(interval):
+                if self.cancelled:
+                    raise JobCancelled()
+                elapsed = time.monotonic() - started
+                if timeout is not None and elapsed > timeout:
+                    raise JobTimeout(f"job did not finish within {timeout:g} s")
+                if not self.process.is_alive() and not self._conn.poll():
+                    raise RuntimeError("worker process exited without a result")
+                if on_progress is not None:
+                    on_progress(min(elapsed / timeout, 1.0) if timeout else None)
+            status, value = self._conn.recv()
+        finally:
+            # Also reached when Streamlit interrupts the script for a rerun
+            self.cancel()
+        if status == "error":
+            raise value
+        return value
+
+
+def job_key(func, args, kwargs):
+    # Identity of a call; a rerun with a different key supersedes the running job
+    try:
+        payload = pickle.dumps((args, sorted(kwargs.items())))
+    except Exception:
+        payload = repr((args, kwargs)).encode()
+    return f"{func.__module__}.{func.__qualname__}:" + hashlib.sha256(payload).hexdigest()
+
+
+def run_job(func, *args, timeout=DEFAULT_TIMEOUT, on_progress=None, **kwargs):
+    """Run func(*args, **kwargs) in a worker process and return its result."""
+    return Job(func, args, kwargs).start(timeout).result(timeout, on_progress)
+
+
+def run_in_session(slot, func, *args, timeout=DEFAULT_TIMEOUT, label="Working...", **kwargs):
+    """run_job with a Streamlit progress bar; a new call in the same slot cancels the old job."""
+    import streamlit as st
+
+    jobs = st.session_state.setdefault("_jobs", {})
+    key = job_key(func, args, kwargs)
+    previous = jobs.get(slot)
+    if previous is not None and previous.key != key:
+        previous.cancel()
+
+    job = Job(func, args, kwargs, key)
+    jobs[slot] = job
+    bar = st.progress(0.0, text=label)
+
+    def show(fraction):
+        if fraction is not None:
+            bar.progress(fraction, text=f"{label} ({fraction * timeout:.0f} s of {timeout:g} s)")
+
+    try:
+        with instrument.stage(f"job {slot}"):
+            job.start(timeout)
+            return job.result(timeout, show)
+    finally:
+        job.cancel()
+        bar.empty()
+        if jobs.get(slot) is job:
+            del jobs[slot]
@@ -0,0 +1,202 @@
+import hashlib
+import hmac
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import sympy as sp
+from sympy.printing.numpy import NumPyPrinter
+
+from util import instrument
+from util.paths import CACHE_DIR, KEY_FILE
+
+# Compiled kernels are written here as plain Python modules, one per system hash
+KERNEL_DIR = os.path.join(CACHE_DIR, "kernels")
+
+# Bump when the generated source changes shape so stale files are not reused; the SymPy
+# version is part of the key too, since its printers write the source
+KERNEL_VERSION = 1
+
+# The independent variable is never treated as a parameter
+TIME = sp.Symbol('t')
+
+_compiled = {}
+
+
+@dataclass
+class ParsedSystem:
+    variables: list            # state names in equation order
+    parameters: list           # remaining free symbols, sorted by name
+    expressions: list          # right-hand sides as SymPy expressions
+
+    @property
+    def state_symbols(self):
+        return [sp.Symbol(v) for v in self.variables]
+
+    @property
+    def parameter_symbols(self):
+        return [sp.Symbol(p) for p in self.parameters]
+
+    @property
+    def key(self):
+        # Normalized hash: canonical SymPy form of every right-hand side in order
+        text = "|".join([str(KERNEL_VERSION), sp.__version__, ",".join(self.variables), ",".join(self.parameters)]
+                        + [sp.srepr(expr) for expr in self.expressions])
+        return hashlib.sha256(text.encode()).hexdigest()[:20]
+
+
+@dataclass
+class CompiledSystem:
+    variables: list
+    parameters: list
+    rhs: callable       # rhs(t, y, p) -> (n, ...)
+    jac: callable       # jac(t, y, p) -> (n, n, ...), d rhs_i / d y_j
+    jac_p: callable     # jac_p(t, y, p) -> (n, m, ...), d rhs_i / d p_k
+    source: str = field(repr=False, default="")
+
+    def params(self, values):
+        # Parameter vector in kernel order from a {name: value} mapping
+        return np.array([values[name] for name in self.parameters], dtype=float)
+
+
+@instrument.timed("parse")
+def parse_system(equations):
+    # Lines of the form 'dX/dt = ...'; blank lines are ignored
+    if isinstance(equations, str):
+        equations = equations.split('\n')
+    equations = [eq.strip() for eq in equations if eq.strip()]
+    variables = [eq.split('=')[0].strip().split('/')[0][1:] for eq in equations]
+    expressions = [sp.sympify(eq.split('=', 1)[1].strip()) for eq in equations]
+    state = {sp.Symbol(v) for v in variables}
+    free = set().union(*(expr.free_symbols for expr in expressions)) if expressions else set()
+    parameters = sorted(str(s) for s in free - state - {TIME})
+    return ParsedSystem(variables, parameters, expressions)
+
+
+def _function_source(name, exprs, shape, printer, y_names, p_names):
+    # One kernel function with common subexpressions hoisted into locals
+    replacements, reduced = sp.cse(exprs, symbols=sp.numbered_symbols('_x'))
+    lines = [f"def {name}(t, y, p):"]
+    if y_names:
+        lines.append(f"    {', '.join(y_names)}, = y")
+    if p_names:
+        lines.append(f"    {', '.join(p_names)}, = p")
+    for sym, expr in replacements:
+        lines.append(f"    {sym} = {printer.doprint(expr)}")
+    values = ", ".join(printer.doprint(expr) for expr in reduced)
+    lines.append(f"    return _stack([{values}], {shape!r}, y)")
+    return "\n".join(lines)
+
+
+def generate_source(system):
+    # Rename every symbol to a safe identifier before printing
+    y_names = [f"_y{i}" for i in range(len(system.variables))]
+    p_names = [f"_p{i}" for i in range(len(system.parameters))]
+    rename = dict(zip(system.state_symbols, sp.symbols(y_names)))
+    rename.update(zip(system.parameter_symbols, sp.symbols(p_names)))
+    rename[TIME] = sp.Symbol('t')
+
+    F = sp.Matrix([expr.xreplace(rename) for expr in system.expressions])
+    Y = sp.Matrix(sp.symbols(y_names)) if y_names else sp.zeros(0, 1)
+    P = sp.Matrix(sp.symbols(p_names)) if p_names else sp.zeros(0, 1)
+    n, m = len(y_names), len(p_names)
+
+    printer = NumPyPrinter()
+    parts = [
+        f"VARIABLES = {system.variables!r}",
+        f"PARAMETERS = {system.parameters!r}",
+        _function_source("rhs", list(F), (n,), printer, y_names, p_names),
+        _function_source("jac", list(F.jacobian(Y)) if n else [], (n, n), printer, y_names, p_names),
+        _function_source("jac_p", list(F.jacobian(P)) if m else [], (n, m), printer, y_names, p_names),
+    ]
+    return "\n\n".join(parts) + "\n"
+
+
+def _stack(values, shape, y):
+    # Broadcast constants against the state so every kernel returns a full float array
+    batch = np.broadcast_shapes(np.shape(y)[1:], *(np.shape(value) for value in values))
+    out = np.empty((len(values),) + batch)
+    for i, value in enumerate(values):
+        out[i] = value
+    return out.reshape(shape + batch)
+
+
+def load_source(source, filename="<dsa-kernel>"):
+    namespace = {"numpy": np, "_stack": _stack}
+    exec(compile(source, filename, "exec"), namespace)
+    return CompiledSystem(namespace["VARIABLES"], namespace["PARAMETERS"],
+                          namespace["rhs"], namespace["jac"], namespace["jac_p"], source)
+
+
+def _secret():
+    """Key that signs kernels on disk, created on first use; None when it cannot be read or made."""
+    try:
+        with open(KEY_FILE, "rb") as f:
+            key = f.read()
+        if key:
+            return key
+    except OSError:
+        pass
+    try:
+        os.makedirs(os.path.dirname(KEY_FILE), mode=0o700, exist_ok=True)
+        fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(32))
+        with open(KEY_FILE, "rb") as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+
+def _signature(secret, source):
+    return hmac.new(secret, source.encode(), hashlib.sha256).hexdigest()
+
+
+def read_kernel(path, secret):
+    # Source of a cached kernel whose signature checks out, else None
+    try:
+        with open(path) as f:
+            header, _, source = f.read().partition("\n")
+    except (OSError, UnicodeDecodeError):
+        return None
+    signature = header.removeprefix("# hmac-sha256: ")
+    if not hmac.compare_digest(signature, _signature(secret, source)):
+        return None
+    return source
+
+
+def write_kernel(path, secret, source):
+    try:
+        os.makedirs(KERNEL_DIR, exist_ok=True)
+        # Write then rename so concurrent workers never read a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(f"# hmac-sha256: {_signature(secret, source)}\n{source}")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+@instrument.timed("compile")
+def compile_system(system, use_disk=True):
+    """Vectorized NumPy kernels for a parsed system, cached in memory and on disk.
+
+    Files on disk are executed only if they carry a valid HMAC under the key in KEY_FILE;
+    without a usable key kernels are cached in memory only.
+    """
+    if not isinstance(system, ParsedSystem):
+        system = parse_system(system)
+    key = system.key
+    if key in _compiled:
+        return _compiled[key]
+
+    path = os.path.join(KERNEL_DIR, f"{key}.py")
+    secret = _secret() if use_disk else None
+    source = read_kernel(path, secret) if secret else None
+    if source is None:
+        source = generate_source(system)
+        if secret:
+            write_kernel(path, secret, source)
+    compiled = load_source(source, path)
+    _compiled[key] = compiled
+    return compiled
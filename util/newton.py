@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from util import instrument
+from util.stability import classify
+
+
+@dataclass
+class Root:
+    state: np.ndarray
+    residual: float
+    eigenvalues: np.ndarray
+    stability: str
+
+
+def seeds(bounds, count, method='lhs', seed=0):
+    # Starting points inside [lower, upper] for every variable, shape (n, count)
+    lower, upper = np.asarray(bounds, dtype=float).T
+    n = len(lower)
+    if method == 'grid':
+        per_axis = max(2, int(round(count ** (1.0 / n))))
+        axes = [np.linspace(lo, hi, per_axis) for lo, hi in zip(lower, upper)]
+        return np.array([g.ravel() for g in np.meshgrid(*axes, indexing='ij')])
+    # Latin hypercube in plain NumPy: one random permutation of the strata per variable,
+    # jittered within each stratum (scipy.stats costs most of a second to import)
+    rng = np.random.default_rng(seed)
+    strata = rng.permuted(np.tile(np.arange(count), (n, 1)), axis=1)
+    sample = (strata + rng.random((n, count))) / count
+    return lower[:, None] + sample * (upper - lower)[:, None]
+
+
+def _columns(p, mask):
+    # Parameters of the selected columns; p is either shared (m,) or per column (m, batch)
+    return p if p.ndim == 1 else p[:, mask]
+
+
+def batched_newton(compiled, p, X, tol=1e-10, max_iter=50, max_halvings=10):
+    """Damped Newton on every column of X at once; returns (X, residual norms).
+
+    p holds the parameters shared by all columns, or one column of parameters per seed.
+    """
+    X = np.array(X, dtype=float)
+    p = np.asarray(p, dtype=float)
+    F = compiled.rhs(0.0, X, p)
+    norm = np.linalg.norm(F, axis=0)
+    active = np.isfinite(norm) & (norm >= tol)
+    # Iterations, and states passed to the kernels, for the instrumentation panel
+    iterations, evaluations, jacobians = 0, X.shape[1], 0
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        Xa, Fa, pa = X[:, active], F[:, active], _columns(p, active)
+        iterations += 1
+        evaluations += Xa.shape[1]
+        jacobians += Xa.shape[1]
+        J = np.moveaxis(compiled.jac(0.0, Xa, pa), -1, 0)
+        try:
+            dX = np.linalg.solve(J, -Fa.T[..., None])[..., 0].T
+        except np.linalg.LinAlgError:
+            # Some Jacobians are singular; least-squares steps for the whole batch
+            dX = (np.linalg.pinv(J) @ -Fa.T[..., None])[..., 0].T
+
+        # Backtrack each seed separately, re-evaluating only those whose residual grew
+        old = norm[active]
+        step = np.ones(Xa.shape[1])
+        X_new = Xa + dX
+        with np.errstate(all='ignore'):
+            F_new = compiled.rhs(0.0, X_new, pa)
+        norm_new = np.linalg.norm(F_new, axis=0)
+        worse = ~(norm_new < old)
+        for _ in range(max_halvings):
+            if not worse.any():
+                break
+            step[worse] *= 0.5
+            X_new[:, worse] = Xa[:, worse] + step[worse] * dX[:, worse]
+            with np.errstate(all='ignore'):
+                F_new[:, worse] = compiled.rhs(0.0, X_new[:, worse], _columns(pa, worse))
+            norm_new[worse] = np.linalg.norm(F_new[:, worse], axis=0)
+            evaluations += int(worse.sum())
+            worse &= ~(norm_new < old)
+
+        # Seeds that cannot decrease their residual have stalled and are dropped
+        index = np.flatnonzero(active)
+        X[:, index[~worse]] = X_new[:, ~worse]
+        F[:, index[~worse]] = F_new[:, ~worse]
+        norm[index[~worse]] = norm_new[~worse]
+        active[index] = ~worse & np.isfinite(norm_new) & (norm_new >= tol)
+    instrument.count(newton_iterations=iterations, rhs_evaluations=evaluations, jacobian_evaluations=jacobians)
+    return X, norm
+
+
+def deduplicate(points, residuals, tol):
+    # Greedy clustering through a k-d tree, keeping the best-converged member of each cluster
+    if len(points) == 0:
+        return []
+    from scipy.spatial import cKDTree
+
+    scale = np.maximum(1.0, np.abs(points).max(axis=0))
+    tree = cKDTree(points / scale)
+    taken = np.zeros(len(points), dtype=bool)
+    keep = []
+    for i in np.argsort(residuals):
+        if taken[i]:
+            continue
+        taken[tree.query_ball_point(points[i] / scale, tol)] = True
+        keep.append(i)
+    return keep
+
+
+@instrument.timed("newton")
+def find_equilibria(compiled, values, bounds, n_seeds=2000, method='lhs', tol=1e-10,
+                    max_iter=50, dedupe_tol=1e-6, accept_tol=1e-8, seed=0):
+    """All equilibria reached by damped Newton from many seeds inside bounds."""
+    p = compiled.params(values)
+    X0 = seeds(bounds, n_seeds, method, seed)
+    with np.errstate(all='ignore'):
+        X, residual = batched_newton(compiled, p, X0, tol, max_iter)
+
+    converged = np.isfinite(residual) & (residual < accept_tol)
+    points, residual = X[:, converged].T, residual[converged]
+    keep = deduplicate(points, residual, dedupe_tol)
+    if not keep:
+        return []
+
+    states = points[keep]
+    J = np.moveaxis(compiled.jac(0.0, states.T, p), -1, 0)
+    eigenvalues = np.linalg.eigvals(J)
+    kinds = classify(eigenvalues)
+    roots = [Root(states[i], float(residual[k]), eigenvalues[i], kinds[i]) for i, k in enumerate(keep)]
+    return sorted(roots, key=lambda root: tuple(root.state))
+
+
+@instrument.timed("newton")
+def equilibria_on_grid(compiled, values, names, grid, bounds, n_seeds=64, tol=1e-10, max_iter=50,
+                       dedupe_tol=1e-3, accept_tol=1e-8, seed=0):
+    """Equilibria and their stability at every point of a parameter grid, in one batched solve.
+
+    names are the varied parameters and grid their values, shape (len(names), points); the
+    other parameters come from values. Every grid point gets the same n_seeds starts. The
+    coarser dedupe_tol merges the slowly converging clusters found at degenerate points.
+    Returns (point index, states, eigenvalues, stability) with one row per equilibrium.
+    """
+    grid = np.atleast_2d(np.asarray(grid, dtype=float))
+    points = grid.shape[1]
+    p = np.repeat(compiled.params({**values, **dict.fromkeys(names, 0.0)})[:, None], points, axis=1)
+    for name, row in zip(names, grid):
+        p[compiled.parameters.index(name)] = row
+
+    # Every (grid point, seed) pair is one column of a single Newton batch
+    X0 = np.tile(seeds(bounds, n_seeds, 'lhs', seed), points)
+    P = np.repeat(p, X0.shape[1] // points, axis=1)
+    owner = np.repeat(np.arange(points), X0.shape[1] // points)
+    with np.errstate(all='ignore'):
+        X, residual = batched_newton(compiled, P, X0, tol, max_iter)
+    converged = np.isfinite(residual) & (residual < accept_tol)
+
+    keep = []
+    for k in range(points):
+        rows = np.flatnonzero(converged & (owner == k))
+        keep += [rows[i] for i in deduplicate(X[:, rows].T, residual[rows], dedupe_tol)]
+    keep = np.array(keep, dtype=int)
+    n = X.shape[0]
+    if not len(keep):
+        return np.zeros(0, dtype=int), np.zeros((0, n)), np.zeros((0, n), dtype=complex), np.zeros(0, dtype=object)
+
+    # LAPACK eigenvalues of every Jacobian, classified together
+    J = np.moveaxis(compiled.jac(0.0, X[:, keep], P[:, keep]), -1, 0)
+    eigenvalues = np.linalg.eigvals(J)
+    return owner[keep], X[:, keep].T, eigenvalues, classify(eigenvalues)
@@ -1,101 +1,315 @@
 import streamlit as st
 import sympy as sp
 import numpy as np
-import matplotlib.pyplot as plt
-
-# Initialize session state variables
-if 'equations_input' not in st.session_state:
-    st.session_state.equations_input = ""
-if 'equilibrium_points' not in st.session_state:
-    st.session_state.equilibrium_points = None
-if 'parameters' not in st.session_state:
-    st.session_state.parameters = []
-if 'variable_parameter' not in st.session_state:
-    st.session_state.variable_parameter = None
-
-def find_parameters(equations, variables):
-    sym_vars = sp.symbols(variables)
-    sym_eqns = [sp.sympify(eq.split('=')[1].strip()) for eq in equations]
-    parameters = set()
-    for eq in sym_eqns:
-        parameters.update(str(symbol) for symbol in eq.free_symbols if symbol not in sym_vars)
-    return list(parameters)
-
-def find_equilibrium(equations, variables):
-    sym_vars = sp.symbols(variables)
-    sym_eqns = [sp.sympify(eq.split('=')[1].strip()) for eq in equations]
-    eqns_at_equilibrium = [sp.Eq(eq, 0) for eq in sym_eqns]
+from util.equilibria import solve_equilibria
+from util.kernels import compile_system, parse_system
+from util.sweep import max_real_eigenvalue, point_kernels
+from util.continuation import newton_equilibrium, trace
+from util.newton import find_equilibria
+from util.jobs import JobTimeout, DEFAULT_TIMEOUT, run_in_session
+from util.pipeline import Pipeline
+from util.render import encode, figure
+
+def init_state():
+    # Session defaults; run from the page, since importing a module has no session to write to
+    if 'equations_input' not in st.session_state:
+        st.session_state.equations_input = ""
+    if 'equilibrium_points' not in st.session_state:
+        st.session_state.equilibrium_points = None
+    if 'parameters' not in st.session_state:
+        st.session_state.parameters = []
+    if 'variables' not in st.session_state:
+        st.session_state.variables = []
+    if 'variable_parameter' not in st.session_state:
+        st.session_state.variable_parameter = None
+    if 'bifurcation_plot' not in st.session_state:
+        st.session_state.bifurcation_plot = None
+
+def solve_equilibrium(system):
+    return solve_equilibria(system.expressions, system.state_symbols)[0]
+
+def find_equilibrium(system):
+    # The symbolic solve runs in a worker process that is killed if it exceeds the time limit;
+    # None records the timeout so that reruns do not start the solve again
     try:
-        equilibrium_points = sp.solve(eqns_at_equilibrium, sym_vars, dict=True)
-        return equilibrium_points
-    except Exception as e:
-        st.error(f"Error solving equilibrium points: {str(e)}")
-        return []
+        return run_in_session("bifurcation", solve_equilibrium, system, label="Solving symbolically...")
+    except JobTimeout:
+        return None
+
+def equilibrium_kernels(system, points):
+    # Symbolic work of the sweeps: one set of kernels per equilibrium, in the parse order of the parameters
+    return [point_kernels(point, system.parameters) for point in points]
+
+def parameter_values(parameters, constant_params, swept):
+    values = {**constant_params, **swept}
+    return [values[p] for p in parameters]
+
+def bifurcation_curves(system, kernels, variable_param, param_range, constant_params):
+    # Evaluate the whole sweep in one vectorized call per equilibrium coordinate
+    x_values = np.linspace(*param_range)
+    args = parameter_values(system.parameters, constant_params, {variable_param: x_values})
+    with np.errstate(all='ignore'):
+        return x_values, [{var: f(*args) for var, f in point.items()} for point in kernels]
+
+def plot_bifurcation(curves, variable_param):
+    x_values, points = curves
+    figures = []
+    for point in points:
+        for variable, y_values in point.items():
+            fig, ax = figure((10, 6))
+            ax.plot(x_values, y_values, marker='o' if len(x_values) <= 1000 else None)
+            ax.set_xlabel(variable_param)
+            ax.set_ylabel(f"{variable}*")
+            ax.set_title(f"Bifurcation diagram: {variable}* vs {variable_param}")
+            figures.append(encode(fig))
+    return figures
+
+def parameter_plane(system, kernels, compiled, param_x, x_range, param_y, y_range, constant_params):
+    X, Y = np.meshgrid(np.linspace(*x_range), np.linspace(*y_range))
+    values = {**constant_params, param_x: X, param_y: Y}
+    args = parameter_values(system.parameters, constant_params, {param_x: X, param_y: Y})
+    planes = []
+    for point in kernels:
+        with np.errstate(all='ignore'):
+            states = {var: f(*args) for var, f in point.items()}
+        # Stability needs every state coordinate of the equilibrium
+        growth = None
+        if all(var in states for var in compiled.variables):
+            with np.errstate(all='ignore'):
+                growth = max_real_eigenvalue(compiled, states, values)
+        planes.append((states, growth))
+    return X, Y, planes
+
+def plot_parameter_plane(plane, param_x, param_y):
+    X, Y, planes = plane
+    figures = []
+    for states, growth in planes:
+        n_panels = len(states) + (growth is not None)
+        fig, axes = figure((5 * n_panels, 4), 1, n_panels, squeeze=False)
+        for ax, (var, Z) in zip(axes[0], states.items()):
+            mesh = ax.pcolormesh(X, Y, Z, shading='auto', cmap='viridis')
+            fig.colorbar(mesh, ax=ax)
+            ax.set_title(f"{var}*")
+        if growth is not None:
+            ax = axes[0][-1]
+            stable = np.where(np.isnan(growth), np.nan, (growth < 0).astype(float))
+            ax.pcolormesh(X, Y, stable, shading='auto', cmap='coolwarm_r', vmin=0, vmax=1)
+            ax.set_title("Stability (blue: stable, red: unstable)")
+        for ax in axes[0]:
+            ax.set_xlabel(param_x)
+            ax.set_ylabel(param_y)
+        fig.tight_layout()
+        figures.append(encode(fig))
+    return figures
+
+def plot_branch(branch, variables, variable_param):
+    fig, axes = figure((10, 4 * len(variables)), len(variables), 1, sharex=True, squeeze=False)
+    
+    for i, (ax, var) in enumerate(zip(axes[:, 0], variables)):
+        # Solid where the equilibrium is stable, dashed where it is unstable
+        y = branch.states[:, i]
+        ax.plot(branch.parameter, np.where(branch.stable, y, np.nan), color='b', label='stable')
+        ax.plot(branch.parameter, np.where(branch.stable, np.nan, y), color='r', linestyle='dashed', label='unstable')
+        for point in branch.special:
+            ax.plot(point['parameter'], point['state'][i], 'ko')
+            ax.annotate(point['kind'], (point['parameter'], point['state'][i]),
+                        textcoords='offset points', xytext=(5, 5))
+        ax.set_ylabel(f"{var}*")
+        ax.legend()
+    axes[-1, 0].set_xlabel(variable_param)
+    axes[0, 0].set_title(f"Continuation diagram in {variable_param}")
+    return encode(fig)
+
+def plot_branches(traced, variables, variable_param):
+    branches, _ = traced
+    return [plot_branch(branch, variables, variable_param) for branch in branches]
+
+def on_branch(branch, x, lam, tol=1e-4):
+    # Does the branch cross lam at state x? Interpolate every segment that spans lam
+    d = branch.parameter - lam
+    for i in np.flatnonzero(d[:-1] * d[1:] <= 0):
+        w = 0.0 if d[i] == d[i + 1] else d[i] / (d[i] - d[i + 1])
+        crossing = branch.states[i] + w * (branch.states[i + 1] - branch.states[i])
+        segment = np.linalg.norm(branch.states[i + 1] - branch.states[i])
+        if np.linalg.norm(crossing - x) < max(tol * (1 + np.linalg.norm(x)), 0.25 * segment):
+            return True
+    return False
+
+def trace_branches(compiled, variable_param, constant_params, start, limits, guess, bounds):
+    # Every branch through the starting equilibria; returns (branches, error message)
+    lower_limit, upper_limit = limits
+    values = {**constant_params, variable_param: start}
+    if guess is not None:
+        x0, converged = newton_equilibrium(compiled, values, guess)
+        if not converged:
+            return [], "Newton's method did not converge from the initial guess. Try another guess."
+        starts = [x0]
+    else:
+        starts = [root.state for root in find_equilibria(compiled, values, bounds)]
+        if not starts:
+            return [], "No equilibria found inside the search bounds."
+    
+    branches = []
+    for x0 in starts:
+        # Equilibria on a branch that has already been traced add nothing new
+        if any(on_branch(branch, x0, start) for branch in branches):
+            continue
+        branches.append(trace(compiled, variable_param, constant_params, x0, start, (lower_limit, upper_limit),
+                              h_max=(upper_limit - lower_limit) / 50))
+    return branches, None
 
-def plot_bifurcation(variable, expression, variable_param, param_range, constant_params):
-    fig, ax = plt.subplots(figsize=(10, 6))
+def continuation_section(pipeline, system):
+    variable_param = st.selectbox("Select the parameter to continue in:", system.value.parameters, key="continuation_param")
     
-    x_values = param_range
-    y_values = []
+    constant_params = {}
+    for param in system.value.parameters:
+        if param != variable_param:
+            constant_params[param] = st.number_input(f"Value for {param}:", value=1.0, key=f"const_{param}")
     
-    for x in x_values:
-        subs_dict = {variable_param: x, **constant_params}
-        y = expression.subs(subs_dict)
-        y_values.append(float(y))
+    lower_limit = st.number_input(f"Lower limit for {variable_param}:", value=0.1)
+    upper_limit = st.number_input(f"Upper limit for {variable_param}:", value=10.0)
+    start = st.number_input(f"Starting value of {variable_param}:", value=lower_limit)
     
-    ax.plot(x_values, y_values, marker='o')
-    ax.set_xlabel(variable_param)
-    ax.set_ylabel(f"{variable}*")
-    ax.set_title(f"Bifurcation diagram: {variable}* vs {variable_param}")
-    st.pyplot(fig)
+    starting = st.radio("Starting equilibria", ("Initial guess", "Multi-start search"), horizontal=True)
+    guess = bounds = None
+    if starting == "Initial guess":
+        st.write("Initial guess for an equilibrium at the starting value:")
+        guess = [st.number_input(f"Guess for {var}:", value=1.0, key=f"guess_{var}") for var in system.value.variables]
+    else:
+        st.write("Search bounds for equilibria at the starting value:")
+        bounds = []
+        for var in system.value.variables:
+            col1, col2 = st.columns(2)
+            lower = col1.number_input(f"Lower bound for {var}:", value=-10.0, key=f"lower_{var}")
+            upper = col2.number_input(f"Upper bound for {var}:", value=10.0, key=f"upper_{var}")
+            bounds.append((lower, upper))
+    
+    if st.button("Trace Branch"):
+        st.session_state.bifurcation_plot = "Numerical continuation"
+    if st.session_state.bifurcation_plot != "Numerical continuation":
+        return
+    
+    compiled = pipeline.run("jacobian", compile_system, system)
+    traced = pipeline.run("trace", trace_branches, compiled, variable_param, constant_params, start,
+                          (lower_limit, upper_limit), guess, bounds)
+    branches, message = traced.value
+    if message:
+        st.error(message)
+        return
+    figures = pipeline.run("render", plot_branches, traced, compiled.value.variables, variable_param)
+    for branch, image in zip(branches, figures.value):
+        if not branch.converged:
+            st.warning("Continuation stopped before reaching the end of the parameter range.")
+        st.image(image)
+        for point in branch.special:
+            label = "Fold" if point['kind'] == 'LP' else "Hopf"
+            st.write(f"{label} point at {variable_param} = {point['parameter']:.6g}")
 
 def bifurcation_page():
+    init_state()
     st.title("Equilibrium Points Calculator and Bifurcation Plotter for ODEs")
     st.write("Enter your system of differential equations in the format 'dX/dt = ...' for each equation. Use a new line for each equation.")
 
+    # Parse, solve, Jacobian, evaluation and figures are memoized stages, so a rerun
+    # only redoes the stages whose own inputs changed
+    pipeline = st.session_state.setdefault("bifurcation_pipeline", Pipeline())
+    pipeline.new_run()
+
     equations_input = st.text_area("Enter the differential equations:", height=200, value=st.session_state.equations_input)
     
     if st.button("Calculate Equilibrium Points"):
         st.session_state.equations_input = equations_input
-        equations_list = [eq.strip() for eq in equations_input.split('\n') if eq.strip()]
-        variables_set = set(eq.split('=')[0].strip().split('/')[0][1:] for eq in equations_list)
-        variables_list = list(variables_set)
+        st.session_state.bifurcation_plot = None
+    equations_list = [eq.strip() for eq in st.session_state.equations_input.split('\n') if eq.strip()]
+    if not equations_list:
+        return
 
-        try:
-            st.session_state.parameters = find_parameters(equations_list, variables_list)
-            st.session_state.equilibrium_points = find_equilibrium(equations_list, variables_list)
-            
-            if st.session_state.equilibrium_points:
-                st.write("The equilibrium points for the given set of equations are:")
-                for point in st.session_state.equilibrium_points:
-                    for var, expr in point.items():
-                        st.latex(f"{sp.latex(var)}^* = {sp.latex(expr)}")
-            else:
-                st.warning("No equilibrium points found.")
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-
-    if st.session_state.equilibrium_points:
+    try:
+        system = pipeline.run("parse", parse_system, "\n".join(equations_list))
+        st.session_state.variables = system.value.variables
+        st.session_state.parameters = system.value.parameters
+        solved = pipeline.run("solve", find_equilibrium, system)
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
+        return
+    st.session_state.equilibrium_points = solved.value
+
+    if solved.value is None:
+        st.warning(f"The symbolic solve did not finish within {DEFAULT_TIMEOUT:g} s. "
+                   "Use numerical continuation to trace the equilibria instead.")
+    elif solved.value:
+        st.write("The equilibrium points for the given set of equations are:")
+        for point in solved.value:
+            for var, expr in point.items():
+                st.latex(f"{sp.latex(var)}^* = {sp.latex(expr)}")
+    else:
+        st.warning("No equilibrium points found.")
+
+    if st.session_state.parameters:
         st.write("\nNow, let's plot the bifurcation diagram.")
+        mode = st.radio("Sweep", ("One parameter", "Two parameters", "Numerical continuation"), horizontal=True)
         
-        variable_param = st.selectbox("Select the parameter to vary:", st.session_state.parameters, key="variable_param")
-        st.session_state.variable_parameter = variable_param
+        if mode == "Numerical continuation":
+            continuation_section(pipeline, system)
         
-        constant_params = {}
-        for param in st.session_state.parameters:
-            if param != variable_param:
-                constant_params[param] = st.number_input(f"Value for {param}:", value=1.0, key=f"const_{param}")
+        elif not solved.value:
+            st.warning("No symbolic equilibrium points to sweep. Try numerical continuation instead.")
         
-        lower_limit = st.number_input(f"Lower limit for {variable_param}:", value=0.1)
-        upper_limit = st.number_input(f"Upper limit for {variable_param}:", value=10.0)
-        num_points = st.number_input("Number of points:", value=100, min_value=10, max_value=1000, step=10)
+        elif mode == "One parameter":
+            variable_param = st.selectbox("Select the parameter to vary:", st.session_state.parameters, key="variable_param")
+            st.session_state.variable_parameter = variable_param
+            
+            constant_params = {}
+            for param in st.session_state.parameters:
+                if param != variable_param:
+                    constant_params[param] = st.number_input(f"Value for {param}:", value=1.0, key=f"const_{param}")
+            
+            lower_limit = st.number_input(f"Lower limit for {variable_param}:", value=0.1)
+            upper_limit = st.number_input(f"Upper limit for {variable_param}:", value=10.0)
+            num_points = st.number_input("Number of points:", value=100, min_value=10, max_value=10**6, step=10)
+            
+            # Once plotted, the diagram follows every change of the inputs
+            if st.button("Plot Bifurcation Diagram"):
+                st.session_state.bifurcation_plot = mode
+            if st.session_state.bifurcation_plot == mode:
+                kernels = pipeline.run("kernels", equilibrium_kernels, system, solved)
+                curves = pipeline.run("evaluate", bifurcation_curves, system, kernels, variable_param,
+                                      (lower_limit, upper_limit, num_points), constant_params)
+                for image in pipeline.run("render", plot_bifurcation, curves, variable_param).value:
+                    st.image(image)
+        
+        elif len(st.session_state.parameters) < 2:
+            st.warning("A two-parameter sweep needs at least two parameters.")
         
-        if st.button("Plot Bifurcation Diagram"):
-            param_range = np.linspace(lower_limit, upper_limit, num_points)
+        else:
+            param_x = st.selectbox("Parameter on the x axis:", st.session_state.parameters, key="param_x")
+            param_y = st.selectbox("Parameter on the y axis:",
+                                   [p for p in st.session_state.parameters if p != param_x], key="param_y")
             
-            for point in st.session_state.equilibrium_points:
-                for var, expr in point.items():
-                    plot_bifurcation(var, expr, variable_param, param_range, constant_params)
+            constant_params = {}
+            for param in st.session_state.parameters:
+                if param not in (param_x, param_y):
+                    constant_params[param] = st.number_input(f"Value for {param}:", value=1.0, key=f"const_{param}")
+            
+            x_lower = st.number_input(f"Lower limit for {param_x}:", value=0.1)
+            x_upper = st.number_input(f"Upper limit for {param_x}:", value=10.0)
+            y_lower = st.number_input(f"Lower limit for {param_y}:", value=0.1)
+            y_upper = st.number_input(f"Upper limit for {param_y}:", value=10.0)
+            resolution = st.number_input("Grid points per axis:", value=200, min_value=10, max_value=2000, step=10)
+            
+            if st.button("Plot Parameter Plane"):
+                st.session_state.bifurcation_plot = mode
+            if st.session_state.bifurcation_plot == mode:
+                kernels = pipeline.run("kernels", equilibrium_kernels, system, solved)
+                compiled = pipeline.run("jacobian", compile_system, system)
+                plane = pipeline.run("evaluate", parameter_plane, system, kernels, compiled, param_x,
+                                     (x_lower, x_upper, resolution), param_y, (y_lower, y_upper, resolution),
+                                     constant_params)
+                for image in pipeline.run("render", plot_parameter_plane, plane, param_x, param_y).value:
+                    st.image(image)
+
+    if pipeline.last:
+        st.caption(pipeline.summary())
 
 if __name__ == '__main__':
     bifurcation_page()
@@ -1,18 +1,67 @@
+import time
+
 import streamlit as st
 import sympy as sp
+import numpy as np
+from util.equilibria import METHODS, solve_equilibria
+from util.kernels import compile_system, parse_system
+from util.newton import equilibria_on_grid, find_equilibria
+from util.jobs import JobTimeout, DEFAULT_TIMEOUT, run_in_session
+from util.render import figure, show
 
 def find_equilibrium(equations, variables):
     # Convert strings to sympy expressions
     sym_vars = sp.symbols(variables)
     sym_eqns = [sp.sympify(eq.split('=')[1].strip()) for eq in equations]
     
-    # Create the system of equations where each dX/dt = 0
-    eqns_at_equilibrium = [sp.Eq(eq, 0) for eq in sym_eqns]
+    # Solve dX/dt = 0: linear algebra or Gröbner bases where the structure allows, else sp.solve;
+    # returns the points and the method that found them
+    return solve_equilibria(sym_eqns, sym_vars)
+
+def show_roots(roots, variables):
+    # Display numerically found equilibria as a table
+    if roots:
+        st.write("The equilibrium points for the given set of equations are:")
+        st.dataframe([{**dict(zip(variables, root.state)),
+                       "residual": root.residual, "stability": root.stability} for root in roots])
+    else:
+        st.write("No equilibrium points found.")
+
+def numeric_equilibrium_section(equations_input):
+    if not equations_input.strip():
+        st.info("Enter the differential equations to set parameter values and search bounds.")
+        return
+    try:
+        system = parse_system(equations_input)
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
+        return
     
-    # Solve the system of equations
-    equilibrium_points = sp.solve(eqns_at_equilibrium, sym_vars, dict=True)
+    # Input fields for parameters
+    st.write("Enter the values for the parameters:")
+    values = {}
+    for param in system.parameters:
+        values[param] = st.number_input(f"Value for {param}", value=1.0, key=f"numeric_param_{param}")
     
-    return equilibrium_points
+    # Search box for the Newton seeds
+    st.write("Enter the search bounds for each variable:")
+    bounds = []
+    for var in system.variables:
+        col1, col2 = st.columns(2)
+        lower = col1.number_input(f"Lower bound for {var}", value=-10.0, key=f"lower_{var}")
+        upper = col2.number_input(f"Upper bound for {var}", value=10.0, key=f"upper_{var}")
+        bounds.append((lower, upper))
+    sampling = st.selectbox("Seed placement", ("Latin hypercube", "Grid"))
+    n_seeds = st.number_input("Number of seeds", value=2000, min_value=10, max_value=10**6, step=100)
+    
+    if st.button("Find Equilibria"):
+        try:
+            roots = find_equilibria(compile_system(system), values, bounds, n_seeds,
+                                    method='lhs' if sampling == "Latin hypercube" else 'grid')
+            
+            show_roots(roots, system.variables)
+        except Exception as e:
+            st.error(f"An error occurred: {e}")
 
 def equilibrium_page():
     st.title("Equilibrium Points Calculator for ODEs")
@@ -20,26 +69,38 @@ def equilibrium_page():
 
     # Text area for input
     equations_input = st.text_area("Enter the differential equations:", height=200)
+    
+    method = st.radio("Method", ("Symbolic", "Numeric (multi-start Newton)"), horizontal=True)
+    if method == "Numeric (multi-start Newton)":
+        numeric_equilibrium_section(equations_input)
+        return
 
     if st.button("Submit"):
         if equations_input.strip():
             # Split the input into individual equations
             equations_list = [eq.strip() for eq in equations_input.split('\n') if eq.strip()]
             
-            # Extract variables from equations
-            variables_set = set()
-            for eq in equations_list:
-                # Assumes the format 'dX/dt = ...'
-                var = eq.split('=')[0].strip().split('/')[0][1:]
-                variables_set.add(var)
-            
-            variables_list = list(variables_set)
-            
             try:
-                # Find equilibrium points
-                equilibrium_points = find_equilibrium(equations_list, variables_list)
+                # Extract variables from equations, in the order they were entered
+                system = parse_system(equations_list)
+                variables_list = system.variables
+
+                # Find equilibrium points in a worker process that is killed on timeout
+                try:
+                    equilibrium_points, solved_by = run_in_session("equilibrium", find_equilibrium, equations_list,
+                                                                   variables_list, label="Solving symbolically...")
+                except JobTimeout:
+                    # Fall back to the numeric search with every parameter set to 1
+                    st.warning(f"The symbolic solve did not finish within {DEFAULT_TIMEOUT:g} s. "
+                               "Showing a numeric multi-start Newton search with every parameter set to 1.0 "
+                               "and each variable in [-10, 10].")
+                    roots = find_equilibria(compile_system(system), dict.fromkeys(system.parameters, 1.0),
+                                            [(-10.0, 10.0)] * len(system.variables))
+                    show_roots(roots, system.variables)
+                    return
                 
                 # Display results
+                st.caption(f"Solved by {METHODS[solved_by]}")
                 st.write("The equilibrium points for the given set of equations are:")
                 if isinstance(equilibrium_points, list) and equilibrium_points:
                     for point in equilibrium_points:
@@ -52,6 +113,120 @@ def equilibrium_page():
         else:
             st.error("Please enter at least one differential equation.")
 
+def eigen_decomposition(matrix):
+    return matrix.eigenvals(), matrix.eigenvects()
+
+def numeric_eigen_section(system, values):
+    # Float Jacobians at numerically found equilibria, decomposed by LAPACK
+    compiled = compile_system(system)
+    st.write("Search bounds for the equilibria:")
+    bounds = []
+    for var in system.variables:
+        col1, col2 = st.columns(2)
+        lower = col1.number_input(f"Lower bound for {var}", value=-10.0, key=f"eigen_lower_{var}")
+        upper = col2.number_input(f"Upper bound for {var}", value=10.0, key=f"eigen_upper_{var}")
+        bounds.append((lower, upper))
+    n_seeds = st.number_input("Number of seeds", value=2000, min_value=10, max_value=10**6, step=100,
+                              key="eigen_seeds")
+
+    if st.button("Analyse Equilibria"):
+        roots = find_equilibria(compiled, values, bounds, n_seeds)
+        if not roots:
+            st.write("No equilibrium points found.")
+        for root in roots:
+            st.write(f"Equilibrium {', '.join(f'{v} = {x:.6g}' for v, x in zip(system.variables, root.state))}: "
+                     f"**{root.stability}**")
+            J = compiled.jac(0.0, root.state, compiled.params(values))
+            eigenvalues, eigenvectors = np.linalg.eig(J)
+            st.dataframe([{"eigenvalue": str(np.round(lam, 8)),
+                           **{v: str(np.round(c, 6)) for v, c in zip(system.variables, eigenvectors[:, k])}}
+                          for k, lam in enumerate(eigenvalues)], use_container_width=True)
+
+    if not system.parameters:
+        return
+    st.subheader("Stability map")
+    names = st.multiselect("Parameters to vary (one or two)", system.parameters,
+                           default=system.parameters[:1], max_selections=2)
+    if not names:
+        return
+    axes = []
+    for name in names:
+        col1, col2, col3 = st.columns(3)
+        lower = col1.number_input(f"{name} from", value=values[name] - 1.0, key=f"map_lower_{name}")
+        upper = col2.number_input(f"{name} to", value=values[name] + 1.0, key=f"map_upper_{name}")
+        count = col3.number_input(f"{name} points", value=101 if len(names) == 1 else 41,
+                                  min_value=2, max_value=1000, key=f"map_points_{name}")
+        axes.append(np.linspace(lower, upper, count))
+    map_seeds = st.number_input("Seeds per parameter point", value=32, min_value=1, max_value=1000, key="map_seeds")
+
+    if st.button("Compute Stability Map"):
+        grid = np.array([g.ravel() for g in np.meshgrid(*axes, indexing='ij')])
+        began = time.perf_counter()
+        owner, states, eigenvalues, kinds = equilibria_on_grid(compiled, values, names, grid, bounds, map_seeds)
+        st.caption(f"{len(owner)} equilibria at {grid.shape[1]} parameter points in {time.perf_counter() - began:.2f} s")
+
+        def draw():
+            fig, ax = figure((10, 6))
+            if len(names) == 1:
+                # Every equilibrium of one variable against the parameter, colored by its type
+                var = system.variables[0]
+                for kind in dict.fromkeys(kinds):
+                    mask = kinds == kind
+                    ax.scatter(grid[0, owner[mask]], states[mask, 0], s=8, label=kind)
+                ax.set_xlabel(names[0])
+                ax.set_ylabel(f"{var}*")
+                if len(kinds):
+                    ax.legend()
+            else:
+                # Number of stable equilibria at each parameter pair
+                stable = np.bincount(owner[np.char.startswith(kinds.astype(str), 'stable')], minlength=grid.shape[1])
+                total = np.bincount(owner, minlength=grid.shape[1])
+                image = np.where(total > 0, stable, np.nan).reshape(len(axes[0]), len(axes[1]))
+                mesh = ax.pcolormesh(axes[0], axes[1], image.T, shading='auto', cmap='viridis')
+                fig.colorbar(mesh, ax=ax, label="Stable equilibria")
+                ax.set_xlabel(names[0])
+                ax.set_ylabel(names[1])
+            return fig
+
+        show((__name__, names, grid, owner, states, kinds), draw)
+
+def symbolic_eigen_section(Jacobian):
+    if st.button("Calculate Eigenvalues and Eigenvectors"):
+        try:
+            # Evaluate the Jacobian matrix with parameter values
+            Jacobian_eval = Jacobian.subs(st.session_state.param_values)
+            st.write("Evaluated Jacobian matrix:")
+            st.latex(sp.latex(Jacobian_eval))
+            
+            # Calculate the eigenvalues and eigenvectors in a worker process
+            try:
+                eigenvals, eigenvects = run_in_session("eigen", eigen_decomposition, Jacobian_eval,
+                                                       label="Computing eigenvectors...")
+            except JobTimeout:
+                if Jacobian_eval.free_symbols:
+                    st.error(f"The symbolic eigen-decomposition did not finish within {DEFAULT_TIMEOUT:g} s.")
+                    return
+                # Fully numeric matrix: fall back to LAPACK
+                st.warning(f"The symbolic eigen-decomposition did not finish within {DEFAULT_TIMEOUT:g} s. "
+                           "Showing floating-point results.")
+                values, vectors = np.linalg.eig(np.array(Jacobian_eval.evalf(), dtype=float))
+                eigenvals = {sp.sympify(v): 1 for v in values}
+                eigenvects = [(sp.sympify(v), 1, [sp.Matrix(vectors[:, i])]) for i, v in enumerate(values)]
+            
+            # Display eigenvalues
+            st.write("Eigenvalues:")
+            for val, multiplicity in eigenvals.items():
+                st.latex(f"Eigenvalue: {sp.latex(val)}, Multiplicity: {multiplicity}")
+            
+            # Display eigenvectors
+            st.write("Eigenvectors:")
+            for val, mult, vects in eigenvects:
+                st.latex(f"Eigenvalue: {sp.latex(val)}")
+                for vect in vects:
+                    st.latex(f"Eigenvector: {sp.latex(vect)}")
+        except Exception as e:
+            st.error(f"An error occurred while calculating eigenvalues and eigenvectors: {e}")
+
 def jacobian_page():
     st.title("Jacobian Matrix, Eigenvalues, and Eigenvectors Calculator")
     
@@ -63,69 +238,46 @@ def jacobian_page():
     if 'param_values' not in st.session_state:
         st.session_state.param_values = {}
 
+    # The submitted system stays in session state, so later buttons survive their rerun
     if st.button("Submit Equations"):
         if equations_input.strip():
-            # Save equations to session state
             st.session_state.equations = equations_input.strip()
-            
-            # Split the input into individual equations
-            equations_list = [eq.strip() for eq in st.session_state.equations.split('\n') if eq.strip()]
-            
-            # Extract variables from equations
-            variables_set = set()
-            for eq in equations_list:
-                # Assumes the format 'dX/dt = ...'
-                var = eq.split('=')[0].strip().split('/')[0][1:]
-                variables_set.add(var)
-            
-            variables_list = list(variables_set)
-            sym_vars = sp.symbols(variables_list)
-            
-            # Convert equations to sympy expressions
-            sym_eqns = [sp.sympify(eq.split('=')[1].strip()) for eq in equations_list]
-            F = sp.Matrix(sym_eqns)
-            X = sp.Matrix(sym_vars)
-            
-            # Calculate the Jacobian matrix
-            Jacobian = F.jacobian(X)
-            st.write("Jacobian matrix:")
-            st.latex(sp.latex(Jacobian))
-            
-            # Input fields for parameters
-            st.write("Enter the values for the parameters:")
-            param_values = {}
-            param_names = list(Jacobian.free_symbols - set(sym_vars))
-            for param in param_names:
-                if param not in st.session_state.param_values:
-                    st.session_state.param_values[param] = 0.0
-                st.session_state.param_values[param] = st.number_input(f"Value for {param}", value=st.session_state.param_values[param])
-            
-            if st.button("Calculate Eigenvalues and Eigenvectors"):
-                try:
-                    # Evaluate the Jacobian matrix with parameter values
-                    Jacobian_eval = Jacobian.subs(st.session_state.param_values)
-                    st.write("Evaluated Jacobian matrix:")
-                    st.latex(sp.latex(Jacobian_eval))
-                    
-                    # Calculate the eigenvalues and eigenvectors
-                    eigenvals = Jacobian_eval.eigenvals()
-                    eigenvects = Jacobian_eval.eigenvects()
-                    
-                    # Display eigenvalues
-                    st.write("Eigenvalues:")
-                    for val, multiplicity in eigenvals.items():
-                        st.latex(f"Eigenvalue: {sp.latex(val)}, Multiplicity: {multiplicity}")
-                    
-                    # Display eigenvectors
-                    st.write("Eigenvectors:")
-                    for val, mult, vects in eigenvects:
-                        st.latex(f"Eigenvalue: {sp.latex(val)}")
-                        for vect in vects:
-                            st.latex(f"Eigenvector: {sp.latex(vect)}")
-                except Exception as e:
-                    st.error(f"An error occurred while calculating eigenvalues and eigenvectors: {e}")
         else:
             st.error("Please enter at least one differential equation.")
+    if not st.session_state.equations:
+        return
+
+    # Split the input into individual equations
+    equations_list = [eq.strip() for eq in st.session_state.equations.split('\n') if eq.strip()]
+    
+    # Extract variables and convert equations to sympy expressions
+    try:
+        system = parse_system(equations_list)
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
+        return
+    sym_vars = system.state_symbols
+    F = sp.Matrix(system.expressions)
+    X = sp.Matrix(sym_vars)
+    
+    # Calculate the Jacobian matrix
+    Jacobian = F.jacobian(X)
+    st.write("Jacobian matrix:")
+    st.latex(sp.latex(Jacobian))
+    
+    # Input fields for parameters
+    st.write("Enter the values for the parameters:")
+    for param in system.parameter_symbols:
+        if param not in st.session_state.param_values:
+            st.session_state.param_values[param] = 0.0
+        st.session_state.param_values[param] = st.number_input(f"Value for {param}", value=st.session_state.param_values[param])
+    
+    mode = st.radio("Eigen-analysis", ("Symbolic", "Numeric (LAPACK at each equilibrium)"), horizontal=True)
+    if mode == "Symbolic":
+        symbolic_eigen_section(Jacobian)
+    else:
+        values = {str(param): float(st.session_state.param_values[param]) for param in system.parameter_symbols}
+        numeric_eigen_section(system, values)
 
 def equilibrium():
     st.sidebar.title("Navigation")
@@ -0,0 +1,95 @@
+import streamlit as st
+import numpy as np
+from util.ensemble import MODELS
+from util.render import figure, show
+from util.fitting import fit, match_compartments, predict, read_measurements
+from util.pages.protocol import protocol_input
+
+
+def example_csv(model, noise=0.03, seed=0):
+    # Three days of hourly samples on the entrained cycle with multiplicative noise
+    t = np.arange(24.0 * 97, 24 * 100, 1.0)
+    y = predict(model, model.defaults, t)
+    y *= 1 + noise * np.random.default_rng(seed).standard_normal(y.shape)
+    rows = [",".join(["t"] + list(model.compartments))]
+    rows += [",".join(f"{v:.6g}" for v in (ti, *yi)) for ti, yi in zip(t, y)]
+    return "\n".join(rows) + "\n"
+
+
+def fitting_page():
+    st.title("Parameter Fitting")
+    st.write("Upload a CSV with time (hr) in the first column and one column per measured "
+             "compartment, named after the compartment (e.g. `t,Brain,Plasma`).")
+
+    name = st.selectbox("Model", list(MODELS))
+    model = MODELS[name]
+    st.download_button("Example CSV", example_csv(model), file_name=f"{name.lower().replace(' ', '_')}.csv")
+    upload = st.file_uploader("Measurements", type="csv")
+    if upload is None:
+        return
+    try:
+        t, data = read_measurements(upload.getvalue())
+    except (ValueError, IndexError) as e:
+        st.error(f"Could not read the CSV: {e}")
+        return
+    matched = match_compartments(model, data)
+    if not matched:
+        st.error(f"No column is named after a compartment of this model: {', '.join(model.compartments)}")
+        return
+    st.write(f"{len(t)} samples of {', '.join(matched)} from t = {t[0]:g} to {t[-1]:g} hr")
+    schedule = protocol_input(np.ceil(max(t[-1], 0.0) / 24) + 1, key="fitting_protocol")
+    if schedule is None:
+        return
+
+    fitted = st.multiselect("Parameters to fit", model.parameters,
+                            default=[p for p in model.parameters if p != 'a'])
+    st.write("Starting values (parameters not fitted are held at these values)")
+    cols = st.columns(len(model.parameters))
+    nominal = [col.number_input(p, value=v, format="%g", key=f"fit_{p}")
+               for col, p, v in zip(cols, model.parameters, model.defaults)]
+    start = st.radio("Data start", ("On the periodic steady state", "From the model's initial conditions at t = 0"))
+    cols = st.columns(2)
+    n_starts = cols[0].number_input("Starts", min_value=1, max_value=64, value=8)
+    spread = cols[1].number_input("Start spread (log units)", min_value=0.0, max_value=5.0, value=1.0)
+    if not fitted or not st.button("Fit"):
+        return
+
+    mode = 'periodic' if start.startswith("On") else 'initial'
+    if mode == 'periodic' and schedule.period is None:
+        st.warning("This protocol does not repeat, so the model starts from its initial conditions at t = 0.")
+        mode = 'initial'
+    with st.spinner("Fitting..."):
+        try:
+            result = fit(name, nominal, fitted, t, data, mode, n_starts, spread, schedule=schedule)
+        except (ValueError, np.linalg.LinAlgError) as e:
+            st.error(f"Fit failed: {e}")
+            return
+
+    if not result.success:
+        st.warning(result.message)
+    best = np.sum(np.isclose(result.start_costs, result.cost, rtol=1e-6))
+    st.write(f"Weighted RMSE {result.rmse:.4g}; {best} of {len(result.start_costs)} starts reached the best cost")
+    st.dataframe([{'Parameter': p, 'Estimate': v, 'Std. error': se, '95 % lower': lo, '95 % upper': hi}
+                  for p, v, se, lo, hi in zip(result.names, result.values, result.stderr, result.lower, result.upper)],
+                 use_container_width=True)
+
+    params = np.array(nominal, dtype=float)
+    params[[model.parameters.index(p) for p in result.names]] = result.values
+    t_fine = np.linspace(t[0], t[-1], 2000)
+    y = predict(model, params, t_fine, mode, schedule)
+
+    def draw(column, j):
+        fig, ax = figure((12, 4))
+        ax.plot(t, data[column], 'o', markersize=4, label='Measured')
+        ax.plot(t_fine, y[:, j], linewidth=2.0, label='Fitted')
+        ax.set_xlabel("Time (hr)", fontsize=15)
+        ax.set_ylabel(f"{model.compartments[j]} Concentration", fontsize=15)
+        ax.legend()
+        return fig
+
+    for column, j in matched.items():
+        show((__name__, t, data[column], y[:, j], model.compartments[j], schedule.key()), lambda: draw(column, j))
+
+
+if __name__ == "__main__":
+    fitting_page()
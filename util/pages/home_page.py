@@ -1,7 +1,4 @@
 import streamlit as st
-from PIL import Image
-
-st.set_page_config(layout="wide")
 
 def home_page():
 
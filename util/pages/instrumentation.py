@@ -0,0 +1,41 @@
+import json
+
+import streamlit as st
+from util import instrument
+
+
+def megabytes(value):
+    return None if value is None else round(value / 2**20, 1)
+
+
+def instrumentation_panel(run):
+    # Sidebar panel: where the last run of this page spent its time, and exports of the process totals
+    address = instrument.serve()
+    with st.sidebar.expander("Instrumentation"):
+        st.checkbox("Trace Python allocations (slower)", key="instrument_trace",
+                    help="Measures the peak of Python allocations from the next run on, with tracemalloc.")
+        if run is not None and run.seconds is not None:
+            st.write(f"Last run of {run.page}: {1000 * run.seconds:.0f} ms")
+            stages = sorted(run.stages.items(), key=lambda item: -item[1]["seconds"])
+            if stages:
+                st.dataframe([{"stage": name, "ms": round(1000 * entry["seconds"], 1), "calls": entry["calls"]}
+                              for name, entry in stages], hide_index=True)
+            events = [e for e in instrument.EVENTS if e in run.counters] + \
+                     [e for e in run.counters if e not in instrument.EVENTS]
+            if events:
+                st.dataframe([{"event": e, "count": run.counters[e]} for e in events], hide_index=True)
+            traffic = [{"cache": name, "hits": stats.get("hits", 0), "disk hits": stats.get("disk_hits", 0),
+                        "misses": stats.get("misses", 0)} for name, stats in run.caches.items() if any(stats.values())]
+            if traffic:
+                st.dataframe(traffic, hide_index=True)
+            memory = {key: megabytes(value) for key, value in run.memory.items()}
+            st.caption(" · ".join(f"{key.replace('_', ' ')}: {value} MB" for key, value in memory.items()
+                                  if value is not None))
+
+        cols = st.columns(2)
+        cols[0].download_button("JSON", json.dumps(instrument.snapshot(), indent=2), file_name="dsa-metrics.json",
+                                mime="application/json", key="instrument_json")
+        cols[1].download_button("Prometheus", instrument.metrics_text(), file_name="dsa-metrics.txt",
+                                mime="text/plain", key="instrument_prometheus")
+        if address:
+            st.caption(f"Served at {address}/metrics and {address}/metrics.json")
@@ -0,0 +1,101 @@
+import streamlit as st
+import numpy as np
+from util.compartments import parse_network, periodic_state, simulate
+from util.timeseries import decimate
+from util.pages.protocol import protocol_input
+from util.render import figure, show
+
+EXAMPLE = """# The three-compartment model
+-> Brain: 59.935858, 7.443667
+Brain -> CSF: 0.346573, 1.01
+Brain -> Plasma: 0.1, 1.01
+CSF -> Plasma: 0.057762, 1.01
+Plasma -> : 0.346573
+Brain = 600
+CSF = 600
+Plasma = 15
+"""
+
+# Largest output (time points x compartments) one run may hold, about 128 MB of floats
+MAX_VALUES = 2**24
+
+
+def chain(n, source=(50.0, 10.0), rate=0.5, sleep=1.2, elimination=0.3):
+    # A linear chain of n compartments, handy for trying large networks
+    lines = [f"-> C1: {source[0]}, {source[1]}"]
+    lines += [f"C{i} -> C{i + 1}: {rate}, {sleep}" for i in range(1, n)]
+    lines.append(f"C{n} -> : {elimination}")
+    return "\n".join(lines)
+
+
+def network_page():
+    st.title("Compartment Network")
+    st.write("One line per route: `source -> target: wake rate, sleep multiplier`. "
+             "Leave the target empty for elimination, and the source empty for an input "
+             "`-> target: wake rate, sleep rate`. `name = value` sets an initial amount.")
+
+    with st.expander("Generate a chain"):
+        n = st.number_input("Compartments", min_value=2, max_value=5000, value=100)
+        if st.button("Generate"):
+            st.session_state.network_text = chain(n)
+    text = st.text_area("Network", value=st.session_state.get("network_text", EXAMPLE), height=250)
+    days = st.number_input("Days", min_value=1, max_value=365, value=10)
+    schedule = protocol_input(days, key="network_protocol")
+    if schedule is None:
+        return
+    try:
+        graph, y0 = parse_network(text, schedule)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    if not len(graph):
+        return
+    st.write(f"{len(graph)} compartments, {len(graph.transfers)} transfers, {len(graph.inputs)} inputs")
+
+    start = st.radio("Start from", ("Initial amounts", "Periodic steady state"), horizontal=True)
+    dt = st.number_input("Output step (hr)", min_value=0.01, max_value=24.0, value=0.1)
+    shown = st.multiselect("Compartments to plot", graph.compartments, default=graph.compartments[:5])
+
+    if start == "Periodic steady state":
+        try:
+            y_start = periodic_state(graph)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        except (RuntimeError, np.linalg.LinAlgError):
+            st.error("This network has no periodic steady state; every compartment needs a route out.")
+            return
+    else:
+        y_start = y0
+    rows = int(24 * days / dt) + 1
+    if rows * len(graph) > MAX_VALUES:
+        # The plot is decimated to screen resolution anyway; a coarser grid keeps memory bounded
+        dt *= int(np.ceil(rows * len(graph) / MAX_VALUES))
+        st.info(f"Output step raised to {dt:g} h so that {len(graph)} compartments over {days} days fit in memory.")
+    t = np.arange(0.0, 24 * days + 0.5 * dt, dt)
+    with st.spinner("Simulating..."):
+        sol = simulate(graph, y_start, t)
+
+    def draw():
+        fig, ax = figure((12, 5))
+        for name in shown:
+            ax.plot(*decimate(t, sol[:, graph.compartments.index(name)], t[0], t[-1]), label=name, linewidth=2.0)
+        switches = schedule.switches(t[0], t[-1])
+        # Switch markers only while they stay readable
+        for x in switches if len(switches) <= 60 else ():
+            ax.axvline(x=x, color='gray', linestyle='dashed', linewidth=1)
+        ax.set_xlabel("Time (hr)", fontsize=15)
+        ax.set_ylabel("Concentration", fontsize=15)
+        if shown:
+            ax.legend()
+        return fig
+
+    show((__name__, text, schedule.key(), start, days, dt, shown), draw)
+
+    with st.expander("Equations for the equilibrium and phase plane pages"):
+        state = st.radio("Rates of", ("wake", "sleep"), horizontal=True)
+        st.code("\n".join(graph.equations(state)))
+
+
+if __name__ == "__main__":
+    network_page()
@@ -1,7 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.integrate import odeint
 import streamlit as st
+from util.newton import seeds
+from util.phase_plane import STYLES, draw_equilibria, draw_field, draw_nullclines, draw_trajectories, trajectories
+from util.render import figure, show
+from util.stability import classify
 
 # Parameters
 A = 12.063
@@ -23,48 +25,72 @@ C_sleep = (sigma_bc*r_bc * sigma_A*A) / (sigma_cp*r_cp * (sigma_bc*r_bc+sigma_bp
 P_wake = A / r_p
 P_sleep = (sigma_A*A) / (sigma_p*r_p)
 
-# Function to compute the vector field
+# Function to compute the vector field; y may hold whole grids of states
 def model(y, t, state='wake'):
     if state == 'wake':
-        A = A
+        source = A
         a12 = r_bc
         a13 = r_bp
         a23 = r_cp
         k = r_p
     else:
-        A = sigma_A*A
+        source = sigma_A*A
         a12 = sigma_bc*r_bc
         a13 = sigma_bp*r_bp
         a23 = sigma_cp*r_cp
         k = sigma_p*r_p
     
-    dydt = np.zeros((3,))
-    dydt[0] = A - (a13 + a12) * y[0]
-    dydt[1] = a12 * y[0] - a23 * y[1]
-    dydt[2] = a23 * y[1] + a13 * y[0] - k * y[2]
-    return dydt
+    B, C, P = y
+    return np.array([source - (a13 + a12) * B,
+                     a12 * B - a23 * C,
+                     a23 * C + a13 * B - k * P])
+
+# Evaluate the field on the whole grid in one batched call
+def vector_field(Y1, Y2, state, y1_label, y2_label):
+    zeros = np.zeros_like(Y1)
+    if y1_label == 'Brain':
+        y = [Y1, zeros, Y2] if y2_label == 'Plasma' else [Y1, Y2, zeros]
+    elif y1_label == 'CSF':
+        y = [zeros, Y1, Y2]
+    dydt = model(y, 0, state=state)
+    U = dydt[0] if y1_label == 'Brain' else dydt[1]
+    V = dydt[2] if y2_label == 'Plasma' else dydt[1]
+    return U, V
+
+# Equilibrium of the full model in one state and its stability type
+def equilibrium(state):
+    point = {'Brain': B_wake, 'CSF': C_wake, 'Plasma': P_wake} if state == 'wake' else \
+            {'Brain': B_sleep, 'CSF': C_sleep, 'Plasma': P_sleep}
+    # The model is linear, so its Jacobian columns are the responses to unit states
+    J = (model(np.eye(3), 0, state) - model(np.zeros((3, 1)), 0, state))
+    return point, classify(np.linalg.eigvals(J)[None])[0]
 
 # Function to plot the phase plane
-def plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label, equilibrium_y1, equilibrium_y2, title):
+def plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label, equilibrium_y1, equilibrium_y2, title, style='Quiver',
+                     nullclines=False, n_trajectories=0, t_end=24.0, kind=None):
     Y1, Y2 = np.meshgrid(y1_range, y2_range)
-    U, V = np.zeros(Y1.shape), np.zeros(Y2.shape)
-    
-    for i in range(Y1.shape[0]):
-        for j in range(Y1.shape[1]):
-            if y1_label == 'Brain':
-                y = [Y1[i, j], 0, Y2[i, j]] if y2_label == 'Plasma' else [Y1[i, j], Y2[i, j], 0]
-            elif y1_label == 'CSF':
-                y = [0, Y1[i, j], Y2[i, j]]
-            dydt = model(y, 0, state=state)
-            U[i, j] = dydt[0] if y1_label == 'Brain' else dydt[1]
-            V[i, j] = dydt[2] if y2_label == 'Plasma' else dydt[1]
+    U, V = vector_field(Y1, Y2, state, y1_label, y2_label)
     
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.quiver(Y1, Y2, U, V, width=0.002, color='r' if state == 'wake' else 'b')
+    fig, ax = figure((10, 6))
+    mesh = draw_field(ax, Y1, Y2, U, V, style=style, color='r' if state == 'wake' else 'b')
+    if mesh is not None:
+        fig.colorbar(mesh, ax=ax, label='Speed')
+    if nullclines:
+        draw_nullclines(ax, Y1, Y2, U, V, (y1_label, y2_label))
+    box = [(y1_range[0], y1_range[-1]), (y2_range[0], y2_range[-1])]
+    if n_trajectories:
+        # Every trajectory of the planar field at once
+        field = lambda y: np.array(vector_field(y[0], y[1], state, y1_label, y2_label))
+        draw_trajectories(ax, trajectories(field, seeds(box, n_trajectories), t_end, bounds=box))
+        ax.set_xlim(*box[0])
+        ax.set_ylim(*box[1])
+    if kind is not None and box[0][0] <= equilibrium_y1 <= box[0][1] and box[1][0] <= equilibrium_y2 <= box[1][1]:
+        draw_equilibria(ax, [(equilibrium_y1, equilibrium_y2)], [kind])
     ax.set_title(title)
     ax.set_xlabel(f'{y1_label} Concentration')
     ax.set_ylabel(f'{y2_label} Concentration')
-    ax.legend()
+    if ax.get_legend_handles_labels()[0]:
+        ax.legend()
     
     return fig
 
@@ -83,16 +109,26 @@ def main():
     y2_min = st.sidebar.number_input(f"{y2_label} Min", value=-10.0 if y2_label == 'CSF' else 0.0)
     y2_max = st.sidebar.number_input(f"{y2_label} Max", value=60.0)
 
+    # Grid density and rendering
+    grid_points = st.sidebar.number_input("Grid points per axis", value=20, min_value=5, max_value=2000, step=5)
+    style = st.sidebar.selectbox("Style", STYLES)
+    nullclines = st.sidebar.checkbox("Nullclines", value=True)
+    n_trajectories = st.sidebar.number_input("Trajectories", value=100, min_value=0, max_value=5000, step=50)
+    t_end = st.sidebar.number_input("Integration time (hr)", value=24.0, min_value=0.1)
+
     # Range for plotting
-    y1_range = np.linspace(y1_min, y1_max, 20)
-    y2_range = np.linspace(y2_min, y2_max, 20)
-    
-    # Plot phase plane
-    fig = plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label,
-                           B_wake if state == 'wake' else B_sleep, C_wake if state == 'wake' else C_sleep,
-                           f"Phase Plane Plot ({y1_label} vs {y2_label}, {state.capitalize()} State)")
+    y1_range = np.linspace(y1_min, y1_max, grid_points)
+    y2_range = np.linspace(y2_min, y2_max, grid_points)
     
-    st.pyplot(fig)
+    # Plot phase plane, marking the equilibrium of the full model projected on the axes
+    point, kind = equilibrium(state)
+    draw = lambda: plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label, point[y1_label], point[y2_label],
+                                    f"Phase Plane Plot ({y1_label} vs {y2_label}, {state.capitalize()} State)",
+                                    style=style, nullclines=nullclines, n_trajectories=n_trajectories, t_end=t_end,
+                                    kind=kind)
+    # The figure is redrawn only when a control changes
+    show((__name__, state, y1_label, y2_label, y1_min, y1_max, y2_min, y2_max, grid_points, style, nullclines,
+          n_trajectories, t_end), draw)
     
 if __name__ == '__main__':
     main()
@@ -0,0 +1,129 @@
+import time
+
+import numpy as np
+import streamlit as st
+from util.kernels import compile_system, parse_system
+from util.newton import find_equilibria, seeds
+from util.phase_plane import STYLES, draw_equilibria, draw_field, draw_nullclines, draw_trajectories, trajectories
+from util.render import figure, show
+
+EXAMPLE = """dx/dt = x*(a - b*y)
+dy/dt = y*(d*x - c)"""
+
+
+def portrait_page():
+    st.title("Phase Portrait")
+    st.write("Enter an autonomous system in the format 'dX/dt = ...', one equation per line.")
+
+    equations_input = st.text_area("Enter the differential equations:", value=EXAMPLE, height=150)
+    try:
+        system = parse_system(equations_input)
+        compiled = compile_system(system)
+    except Exception as e:
+        st.error(f"An error occurred: {e}")
+        return
+    if len(system.variables) < 2:
+        st.info("A phase portrait needs at least two variables.")
+        return
+
+    values = {}
+    if system.parameters:
+        st.write("Parameter values:")
+        cols = st.columns(min(len(system.parameters), 4))
+        for i, param in enumerate(system.parameters):
+            values[param] = cols[i % len(cols)].number_input(param, value=1.0, key=f"portrait_{param}")
+    p = compiled.params(values)
+
+    # Axes, and values of the variables that are not plotted
+    cols = st.columns(2)
+    x_var = cols[0].selectbox("X axis", system.variables, index=0)
+    y_var = cols[1].selectbox("Y axis", system.variables, index=1)
+    if x_var == y_var:
+        st.info("Choose two different variables.")
+        return
+    i, j = system.variables.index(x_var), system.variables.index(y_var)
+    fixed = {v: st.number_input(f"{v} (held for the field, initial value for trajectories)", value=0.0)
+             for v in system.variables if v not in (x_var, y_var)}
+    cols = st.columns(4)
+    x_min = cols[0].number_input(f"{x_var} min", value=0.0)
+    x_max = cols[1].number_input(f"{x_var} max", value=3.0)
+    y_min = cols[2].number_input(f"{y_var} min", value=0.0)
+    y_max = cols[3].number_input(f"{y_var} max", value=3.0)
+    if x_min >= x_max or y_min >= y_max:
+        st.error("Each axis needs min < max.")
+        return
+
+    st.sidebar.subheader("Portrait")
+    grid_points = st.sidebar.number_input("Grid points per axis", value=40, min_value=5, max_value=2000, step=5)
+    style = st.sidebar.selectbox("Style", ("None",) + STYLES, index=1)
+    show_nullclines = st.sidebar.checkbox("Nullclines", value=True)
+    show_equilibria = st.sidebar.checkbox("Equilibria", value=True)
+    n_traj = st.sidebar.number_input("Trajectories", value=100, min_value=0, max_value=5000, step=50)
+    t_end = st.sidebar.number_input("Integration time", value=10.0, min_value=0.01)
+    steps = st.sidebar.number_input("RK4 steps", value=400, min_value=10, max_value=20000, step=100)
+    backward = st.sidebar.checkbox("Also integrate backwards", value=False)
+
+    began = time.perf_counter()
+    n = len(system.variables)
+    box = [(x_min, x_max), (y_min, y_max)]
+
+    def full_state(X, Y):
+        # States on the plotted plane, other variables at their held values
+        state = [None] * n
+        state[i], state[j] = X, Y
+        for v, value in fixed.items():
+            state[system.variables.index(v)] = np.full_like(X, value)
+        return np.array(state)
+
+    roots = []
+    if show_equilibria:
+        # Search the plotted box; held variables may move by about the box size
+        width = max(x_max - x_min, y_max - y_min)
+        search = [box[0] if k == i else box[1] if k == j else (fixed[v] - width, fixed[v] + width)
+                  for k, v in enumerate(system.variables)]
+        roots = find_equilibria(compiled, values, search, n_seeds=500)
+        roots = [r for r in roots if x_min <= r.state[i] <= x_max and y_min <= r.state[j] <= y_max]
+
+    def draw():
+        fig, ax = figure((10, 7))
+        Y1, Y2 = np.meshgrid(np.linspace(x_min, x_max, grid_points), np.linspace(y_min, y_max, grid_points))
+        with np.errstate(all='ignore'):
+            F = compiled.rhs(0.0, full_state(Y1, Y2), p)
+        U, V = F[i], F[j]
+        if style != "None":
+            mesh = draw_field(ax, Y1, Y2, U, V, style=style, color='gray')
+            if mesh is not None:
+                fig.colorbar(mesh, ax=ax, label='Speed')
+        if show_nullclines:
+            draw_nullclines(ax, Y1, Y2, U, V, (x_var, y_var))
+
+        if n_traj:
+            start = seeds(box, int(n_traj), 'lhs')
+            start = full_state(start[0], start[1])
+            bounds = [box[0] if k == i else box[1] if k == j else (-np.inf, np.inf) for k in range(n)]
+            field = lambda y: compiled.rhs(0.0, y, p)
+            draw_trajectories(ax, trajectories(field, start, t_end, int(steps), bounds), i, j)
+            if backward:
+                draw_trajectories(ax, trajectories(field, start, -t_end, int(steps), bounds), i, j, color='0.5')
+
+        if roots:
+            draw_equilibria(ax, [(r.state[i], r.state[j]) for r in roots], [r.stability for r in roots])
+
+        ax.set_xlim(x_min, x_max)
+        ax.set_ylim(y_min, y_max)
+        ax.set_xlabel(x_var)
+        ax.set_ylabel(y_var)
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend(loc='upper right')
+        return fig
+
+    # Field and trajectories are recomputed only when an input changes
+    show((__name__, equations_input, values, x_var, y_var, fixed, box, grid_points, style, show_nullclines,
+          show_equilibria, n_traj, t_end, steps, backward), draw)
+    st.caption(f"Computed in {time.perf_counter() - began:.2f} s")
+    if roots:
+        st.dataframe([{**dict(zip(system.variables, r.state)), "stability": r.stability} for r in roots])
+
+
+if __name__ == '__main__':
+    portrait_page()
@@ -0,0 +1,61 @@
+import streamlit as st
+from util.schedule import DAILY, DAY, Schedule
+
+PRESETS = ("Regular (asleep 0-8 h)", "Shifted sleep window", "Afternoon nap", "Sleep deprivation", "Custom")
+
+CUSTOM_EXAMPLE = """# hour state; the pattern repeats every period
+period 168
+0 sleep
+8 wake
+# one late night a week
+24 wake
+26 sleep
+34 wake
+48 sleep
+56 wake
+72 sleep
+80 wake
+96 sleep
+104 wake
+120 sleep
+128 wake
+144 sleep
+152 wake
+"""
+
+
+def nap_schedule(start, length):
+    # Night sleep from 0 to 8 h plus a nap; a nap running past midnight joins the next night's sleep
+    if start + length >= DAY:
+        return Schedule([0.0, 8.0, start], ['sleep', 'wake', 'sleep'], DAY)
+    return Schedule([0.0, 8.0, start, start + length], ['sleep', 'wake', 'sleep', 'wake'], DAY)
+
+
+def protocol_input(days, key="protocol"):
+    """Sidebar controls for the sleep/wake protocol of a simulation of `days` days; None if invalid."""
+    choice = st.sidebar.selectbox("Sleep/wake protocol", PRESETS, key=key)
+    if choice == PRESETS[0]:
+        return DAILY
+    if choice == "Shifted sleep window":
+        onset = st.sidebar.slider("Sleep onset (hr of day)", 0.0, 23.5, 22.0, step=0.5, key=f"{key}_onset")
+        hours = st.sidebar.slider("Sleep duration (hr)", 0.0, 16.0, 8.0, step=0.5, key=f"{key}_hours")
+        return Schedule.daily(onset, hours)
+    if choice == "Afternoon nap":
+        start = st.sidebar.slider("Nap start (hr of day)", 9.0, 23.0, 14.0, step=0.5, key=f"{key}_nap")
+        length = st.sidebar.slider("Nap length (hr)", 0.5, 4.0, 1.0, step=0.5, key=f"{key}_nap_hours")
+        try:
+            return nap_schedule(start, length)
+        except ValueError as e:
+            st.error(f"Protocol: {e}")
+            return None
+    if choice == "Sleep deprivation":
+        first = st.sidebar.number_input("First night without sleep (day)", 1, int(days), min(98, int(days)),
+                                        key=f"{key}_first")
+        nights = st.sidebar.number_input("Nights without sleep", 1, int(days), 1, key=f"{key}_nights")
+        return Schedule.from_days([(0.0, 0.0 if first <= i < first + nights else 8.0) for i in range(int(days) + 1)])
+    text = st.sidebar.text_area("Protocol", CUSTOM_EXAMPLE, height=250, key=f"{key}_text")
+    try:
+        return Schedule.from_text(text)
+    except ValueError as e:
+        st.error(f"Protocol: {e}")
+        return None
@@ -0,0 +1,140 @@
+import time
+
+import streamlit as st
+import numpy as np
+from util.ensemble import MODELS, OUTPUTS, bands, run_ensemble, simulate
+from util.render import figure, show
+from util.sensitivity import morris, morris_indices, saltelli, sobol_indices
+
+# Parameter sets drawn for the trajectory percentile bands
+BAND_SAMPLES = 2000
+
+
+def parameter_bounds(model):
+    # Nominal values and ranges of the parameters to vary; the others stay at their nominal value
+    varied = st.multiselect("Parameters to vary", model.parameters,
+                            default=[p for p in ('A_wake', 'a', 'k', 'a12_wake') if p in model.parameters])
+    spread = st.slider("Default range (± % of nominal)", 1, 90, 20)
+    nominal, bounds = [], []
+    for name, default in zip(model.parameters, model.defaults):
+        cols = st.columns(3)
+        value = cols[0].number_input(name, value=default, format="%g", key=f"sa_{name}")
+        nominal.append(value)
+        if name in varied:
+            lower = cols[1].number_input(f"{name} lower", value=value * (1 - spread / 100), format="%g")
+            upper = cols[2].number_input(f"{name} upper", value=value * (1 + spread / 100), format="%g")
+            bounds.append((lower, upper))
+    return varied, np.array(nominal), bounds
+
+
+def full_parameters(model, varied, nominal, X):
+    # Insert the sampled columns into copies of the nominal parameter vector
+    P = np.repeat(nominal[None], len(X), axis=0)
+    for j, name in enumerate(varied):
+        P[:, model.parameters.index(name)] = X[:, j]
+    return P
+
+
+def plot_indices(varied, S1, ST, S1_conf, ST_conf):
+    fig, ax = figure((8, 4))
+    x = np.arange(len(varied))
+    ax.bar(x - 0.2, S1, 0.4, yerr=S1_conf, capsize=4, label='First order $S_1$')
+    ax.bar(x + 0.2, ST, 0.4, yerr=ST_conf, capsize=4, label='Total $S_T$')
+    ax.set_xticks(x)
+    ax.set_xticklabels(varied)
+    ax.set_ylabel("Sobol index")
+    ax.legend()
+    return fig
+
+
+def plot_bands(model, t, Y):
+    q = bands(Y)
+    fig, axes = figure((12, 3 * len(model.compartments)), len(model.compartments), 1, sharex=True)
+    for j, (ax, name) in enumerate(zip(np.atleast_1d(axes), model.compartments)):
+        ax.fill_between(t, q[0, :, j], q[4, :, j], alpha=0.2, color='C0', label='5-95 %')
+        ax.fill_between(t, q[1, :, j], q[3, :, j], alpha=0.4, color='C0', label='25-75 %')
+        ax.plot(t, q[2, :, j], color='C0', linewidth=2.0, label='Median')
+        ax.set_ylabel(f"{name} Concentration")
+        ax.legend(loc='upper right')
+    np.atleast_1d(axes)[-1].set_xlabel("Time (hr)")
+    return fig
+
+
+def sensitivity_page():
+    st.title("Sensitivity Analysis")
+    st.write("Runs many parameter sets of a compartment model at once and reports how each "
+             "parameter drives the concentrations over one day.")
+
+    name = st.selectbox("Model", list(MODELS))
+    model = MODELS[name]
+    varied, nominal, bounds = parameter_bounds(model)
+    if not varied:
+        st.info("Select at least one parameter to vary.")
+        return
+
+    start = st.radio("Simulate", ("Periodic steady state", "From initial conditions"), horizontal=True)
+    days = None
+    if start == "From initial conditions":
+        days = st.number_input("Days (summaries use the last day)", min_value=1, max_value=200, value=10)
+    dt = st.selectbox("Time step (hr)", (0.05, 0.1, 0.25, 0.5), index=1)
+    method = st.radio("Method", ("Sobol", "Morris"), horizontal=True)
+    d = len(varied)
+    if method == "Sobol":
+        n = st.select_slider("Base samples", [2 ** m for m in range(6, 15)], value=1024)
+        st.caption(f"{n * (d + 2)} model runs")
+    else:
+        r = st.number_input("Trajectories", min_value=2, max_value=5000, value=100)
+        st.caption(f"{r * (d + 1)} model runs")
+
+    if st.button("Run"):
+        began = time.perf_counter()
+        X = saltelli(bounds, n) if method == "Sobol" else morris(bounds, r)
+        mode = 'periodic' if start == "Periodic steady state" else 'initial'
+        with st.spinner(f"Simulating {len(X)} parameter sets..."):
+            outputs = run_ensemble(name, full_parameters(model, varied, nominal, X), days, dt, mode)
+            # Percentile bands from a plain random sample of the same ranges
+            lower, upper = np.array(bounds).T
+            sample = np.random.default_rng(0).uniform(lower, upper, (BAND_SAMPLES, d))
+            t, Y, _ = simulate(model, full_parameters(model, varied, nominal, sample), days, dt, mode)
+        st.session_state.sensitivity = dict(model=name, method=method, varied=varied, bounds=bounds, X=X,
+                                            outputs=outputs, t=t, Y=Y, elapsed=time.perf_counter() - began)
+
+    result = st.session_state.get("sensitivity")
+    if result is None or result['model'] != name:
+        return
+    st.caption(f"{len(result['X'])} runs in {result['elapsed']:.1f} s")
+
+    cols = st.columns(2)
+    compartment = cols[0].selectbox("Compartment", model.compartments)
+    summary = cols[1].selectbox("Summary over the last day", OUTPUTS)
+    f = result['outputs'][compartment, summary]
+    varied, d = result['varied'], len(result['varied'])
+
+    if result['method'] == "Sobol":
+        S1, ST, S1_conf, ST_conf = sobol_indices(f, d)
+        show((__name__, varied, S1, ST, S1_conf, ST_conf), lambda: plot_indices(varied, S1, ST, S1_conf, ST_conf))
+        st.dataframe([{'Parameter': p, 'S1': first, 'S1 ± 95 %': first_conf, 'ST': total, 'ST ± 95 %': total_conf}
+                      for p, first, first_conf, total, total_conf in zip(varied, S1, S1_conf, ST, ST_conf)],
+                     use_container_width=True)
+    else:
+        mu, mu_star, sigma = morris_indices(result['X'], f, result['bounds'], len(result['X']) // (d + 1))
+
+        def draw():
+            fig, ax = figure((6, 5))
+            ax.scatter(mu_star, sigma)
+            for label, x, y in zip(varied, mu_star, sigma):
+                ax.annotate(label, (x, y), textcoords="offset points", xytext=(4, 4))
+            ax.set_xlabel(r"$\mu^*$")
+            ax.set_ylabel(r"$\sigma$")
+            return fig
+
+        show((__name__, varied, mu_star, sigma), draw)
+        st.dataframe([{'Parameter': p, 'mu': m, 'mu*': m_star, 'sigma': s}
+                      for p, m, m_star, s in zip(varied, mu, mu_star, sigma)], use_container_width=True)
+
+    st.subheader("Trajectory percentiles")
+    show((__name__, name, result['t'], result['Y']), lambda: plot_bands(model, result['t'], result['Y']))
+
+
+if __name__ == "__main__":
+    sensitivity_page()
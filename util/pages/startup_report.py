@@ -0,0 +1,18 @@
+import streamlit as st
+from multiapp import LOAD_TIMES
+
+
+def startup_report(app):
+    # Sidebar panel: what the pages opened so far cost this process, and a fresh-interpreter measurement
+    with st.sidebar.expander("Startup report"):
+        if LOAD_TIMES:
+            st.write("Page imports in this worker:")
+            st.dataframe([{"module": module, "import (ms)": round(1000 * seconds, 1)}
+                          for module, seconds in LOAD_TIMES.items()], hide_index=True)
+        if st.button("Measure every page", key="startup_measure"):
+            from util.startup import report
+
+            with st.spinner("Importing each page in a fresh interpreter..."):
+                st.session_state.startup_report = report(app.modules())
+        if "startup_report" in st.session_state:
+            st.dataframe(st.session_state.startup_report, hide_index=True)
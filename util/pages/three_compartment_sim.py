@@ -1,16 +1,15 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.integrate import odeint
+from util.compartments import three_compartment
+from util.propagator import propagate
+from util.steady_state import periodic_linear
+from util.result_cache import results
+from util.timeseries import decimate, plotly_panels
+from util.integrate import METHODS, integrate_segmented
+from util.pages.protocol import protocol_input
+from util.render import line_panels, show
 
-def model(y, t, A_wake, A_sleep, a12_wake, k, a, a13_wake, a23_wake):
-    sw_cycle = (t % 24 >= 8) & (t % 24 < 24)
-    dydt_n = np.zeros((3,))
-    B, C, P = y
-    dydt_n[0] = A_wake * sw_cycle + (A_sleep * (1 - sw_cycle)) - (a13_wake * sw_cycle + a * a13_wake * (1 - sw_cycle) + a12_wake * sw_cycle + a * a12_wake * (1 - sw_cycle)) * B
-    dydt_n[1] = (a12_wake * sw_cycle + a * a12_wake * (1 - sw_cycle)) * B - (a23_wake * sw_cycle + a * a23_wake * (1 - sw_cycle)) * C
-    dydt_n[2] = (a23_wake * sw_cycle + a * a23_wake * (1 - sw_cycle)) * C + (a13_wake * sw_cycle + a * a13_wake * (1 - sw_cycle)) * B - k * P
-    return dydt_n
+EXACT = "Exact (matrix exponential)"
 
 def sim_three_compartment():
     st.title("Three-Compartment Model: Brain, CSF, and Plasma Concentrations")
@@ -25,47 +24,57 @@ def sim_three_compartment():
     a23_wake = st.number_input("a23_wake", value=0.057762)
 
     # Solve the ODE system
-    t = np.arange(0.0, 24 * 100, 0.01)
+    start = st.radio("Start from", ("Initial conditions", "Periodic steady state"), horizontal=True)
+    solver = st.selectbox("Solver", (EXACT,) + METHODS)
     y0 = [600, 600, 15]
     args = (A_wake, A_sleep, a12_wake, k, a, a13_wake, a23_wake)
-    sol = odeint(model, y0, t, args=args)
+    schedule = protocol_input(100)
+    if schedule is None:
+        return
+    graph = three_compartment(*args, schedule=schedule)
+    systems = graph.systems()
+    if start == "Periodic steady state" and schedule.period is None:
+        st.warning("This protocol does not repeat, so the simulation starts from the initial conditions.")
+        start = "Initial conditions"
+    if start == "Periodic steady state":
+        # Skip the transient and begin the plotted days on the entrained cycle
+        orbit = periodic_linear(systems, schedule=schedule)
+        t = np.arange(schedule.period * np.floor(24.0 * 97 / schedule.period), 24 * 100, 0.01)
+        y_start = orbit.y0
+        st.caption(f"Periodic steady state: residual {orbit.residual:.2e}, "
+                   f"Floquet multipliers {np.round(np.abs(orbit.multipliers), 4)}")
+    else:
+        t = np.arange(0.0, 24 * 100, 0.01)
+        y_start = y0
 
-    # Create subplots
-    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 15), sharex=True)
+    # Only the visible window is drawn, decimated to screen resolution
+    t0, t1 = st.slider("Time window (hr)", float(t[0]), float(t[-1]), (max(2336.0, float(t[0])), float(t[-1])), step=1.0)
+    renderer = st.radio("Renderer", ("Matplotlib", "Plotly (interactive)"), horizontal=True)
 
-    # Plot Brain Concentration
-    ax1.plot(t, sol[:, 0], label='Brain', linewidth=2.0)
-    ax1.set_xlabel("Time (hr)", fontsize=15)
-    ax1.set_ylabel("Brain Concentration", fontsize=15)
-    ax1.tick_params(axis='y', labelsize=12)
-    ax1.legend()
+    if solver == EXACT:
+        sol = results.get_or_compute(f"{__name__}.model {schedule.key()}", args, t, y_start,
+                                     lambda: propagate(systems, y_start, t, schedule=schedule))
+    else:
+        # Restart the integrator at every switch and keep output only for the window
+        window = (t >= t0) & (t <= t1)
+        sol = results.get_or_compute(f"{__name__}.model/{solver}/from {t[0]:g} {schedule.key()}", args, t[window], y_start,
+                                     lambda: integrate_segmented(graph.rhs, y_start, (t[0], t1), t[window], solver,
+                                                                 jac=graph.jac, schedule=schedule)[0])
+        t = t[window]
 
-    # Plot CSF Concentration
-    ax2.plot(t, sol[:, 1], label='CSF', linewidth=2.0)
-    ax2.set_xlabel("Time (hr)", fontsize=15)
-    ax2.set_ylabel("CSF Concentration", fontsize=15)
-    ax2.tick_params(axis='y', labelsize=12)
-    ax2.legend()
+    # Dashed lines at every sleep/wake switch in view
+    markers = schedule.switches(t0, t1)
 
-    # Plot Plasma Concentration
-    ax3.plot(t, sol[:, 2], label='Plasma', linewidth=2.0)
-    ax3.set_xlabel("Time (hr)", fontsize=15)
-    ax3.set_ylabel("Plasma Concentration", fontsize=15)
-    ax3.tick_params(axis='y', labelsize=12)
-    ax3.legend()
+    if renderer == "Plotly (interactive)":
+        st.plotly_chart(plotly_panels(t, sol, ['Brain', 'CSF', 'Plasma'], (t0, t1), markers), use_container_width=True)
+        return
 
-    # Add vertical lines and set x-axis limits
-    for ax in [ax1, ax2, ax3]:
-        ax.axvline(x=2336, color='gray', linestyle='dashed', linewidth=1)
-        ax.axvline(x=2352, color='gray', linestyle='dashed', linewidth=1)
-        ax.axvline(x=2360, color='gray', linestyle='dashed', linewidth=1)
-        ax.axvline(x=2376, color='gray', linestyle='dashed', linewidth=1)
-        ax.axvline(x=2384, color='gray', linestyle='dashed', linewidth=1)
-
-    plt.xlim(2336, 2400)
-    fig.tight_layout()
-
-    st.pyplot(fig)
+    # Brain, CSF and Plasma panels, redrawn only when an input or the window changes
+    key = (__name__, args, schedule.key(), start, solver, t0, t1)
+    show(key, lambda: line_panels([(*decimate(t, sol[:, i], t0, t1), label)
+                                   for i, label in enumerate(['Brain', 'CSF', 'Plasma'])],
+                                  (t0, t1), markers, ylabels=("Brain Concentration", "CSF Concentration",
+                                                              "Plasma Concentration"), height=5))
 
 if __name__ == "__main__":
     sim_three_compartment()
@@ -1,14 +1,15 @@
 import streamlit as st
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
+from util.compartments import two_compartment
+from util.propagator import propagate
+from util.steady_state import periodic_linear
+from util.result_cache import results
+from util.timeseries import decimate, plotly_panels
+from util.integrate import METHODS, integrate_segmented
+from util.pages.protocol import protocol_input
+from util.render import line_panels, show
 
-def model(y, t, a12_wake, A_wake, A_sleep, a, k):
-    sw_cycle = (t % 24 >= 8) & (t % 24 < 24)
-    dydt_n = np.zeros((2,))
-    dydt_n[0] = A_wake * sw_cycle + A_sleep * (1 - sw_cycle) - (a12_wake * sw_cycle + a * a12_wake * (1 - sw_cycle)) * y[0]
-    dydt_n[1] = (a12_wake * sw_cycle + a * a12_wake * (1 - sw_cycle)) * y[0] - k * y[1]
-    return dydt_n
+EXACT = "Exact (matrix exponential)"
 
 def sim():
     st.title("Brain and Plasma Concentration Model")
@@ -21,40 +22,56 @@ def sim():
     a = st.number_input("a", value=1.01)
 
     # Solve the ODE system
-    t = np.arange(0.0, 24*100, 0.01)
+    start = st.radio("Start from", ("Initial conditions", "Periodic steady state"), horizontal=True)
+    solver = st.selectbox("Solver", (EXACT,) + METHODS)
     y0 = [600, 15.5]
     args = (a12_wake, A_wake, A_sleep, a, k)
-    sol = odeint(model, y0, t, args=args)
-
-    # Plot Brain Concentration
-    fig1, ax1 = plt.subplots(figsize=(12, 4))
-    ax1.plot(t, sol[:, 0], label='Brain', linewidth=2.0)
-    ax1.set_xlabel("Time (hr)", fontsize=15)
-    ax1.set_ylabel("Brain Concentration", fontsize=15)
-    ax1.tick_params(axis='y', labelsize=12)
-    ax1.axvline(x=2336, color='gray', linestyle='dashed', linewidth=1)
-    ax1.axvline(x=2352, color='gray', linestyle='dashed', linewidth=1)
-    ax1.axvline(x=2360, color='gray', linestyle='dashed', linewidth=1)
-    ax1.axvline(x=2376, color='gray', linestyle='dashed', linewidth=1)
-    ax1.axvline(x=2384, color='gray', linestyle='dashed', linewidth=1)
-    ax1.set_xlim(2335, 2396)
-    ax1.legend()
-    st.pyplot(fig1)
-
-    # Plot Plasma Concentration
-    fig2, ax2 = plt.subplots(figsize=(12, 4))
-    ax2.plot(t, sol[:, 1], label='Plasma', linewidth=2.0)
-    ax2.set_xlabel("Time (hr)", fontsize=15)
-    ax2.set_ylabel("Plasma Concentration", fontsize=15)
-    ax2.tick_params(axis='y', labelsize=12)
-    ax2.axvline(x=2336, color='gray', linestyle='dashed', linewidth=1)
-    ax2.axvline(x=2352, color='gray', linestyle='dashed', linewidth=1)
-    ax2.axvline(x=2360, color='gray', linestyle='dashed', linewidth=1)
-    ax2.axvline(x=2376, color='gray', linestyle='dashed', linewidth=1)
-    ax2.axvline(x=2384, color='gray', linestyle='dashed', linewidth=1)
-    ax2.set_xlim(2335, 2396)
-    ax2.legend()
-    st.pyplot(fig2)
+    schedule = protocol_input(100)
+    if schedule is None:
+        return
+    graph = two_compartment(*args, schedule=schedule)
+    systems = graph.systems()
+    if start == "Periodic steady state" and schedule.period is None:
+        st.warning("This protocol does not repeat, so the simulation starts from the initial conditions.")
+        start = "Initial conditions"
+    if start == "Periodic steady state":
+        # Skip the transient and begin the plotted days on the entrained cycle
+        orbit = periodic_linear(systems, schedule=schedule)
+        t = np.arange(schedule.period * np.floor(24.0*97 / schedule.period), 24*100, 0.01)
+        y_start = orbit.y0
+        st.caption(f"Periodic steady state: residual {orbit.residual:.2e}, "
+                   f"Floquet multipliers {np.round(np.abs(orbit.multipliers), 4)}")
+    else:
+        t = np.arange(0.0, 24*100, 0.01)
+        y_start = y0
+
+    # Only the visible window is drawn, decimated to screen resolution
+    t0, t1 = st.slider("Time window (hr)", float(t[0]), float(t[-1]), (max(2335.0, float(t[0])), 2396.0), step=1.0)
+    renderer = st.radio("Renderer", ("Matplotlib", "Plotly (interactive)"), horizontal=True)
+
+    if solver == EXACT:
+        sol = results.get_or_compute(f"{__name__}.model {schedule.key()}", args, t, y_start,
+                                     lambda: propagate(systems, y_start, t, schedule=schedule))
+    else:
+        # Restart the integrator at every switch and keep output only for the window
+        window = (t >= t0) & (t <= t1)
+        sol = results.get_or_compute(f"{__name__}.model/{solver}/from {t[0]:g} {schedule.key()}", args, t[window], y_start,
+                                     lambda: integrate_segmented(graph.rhs, y_start, (t[0], t1), t[window], solver,
+                                                                 jac=graph.jac, schedule=schedule)[0])
+        t = t[window]
+
+    # Dashed lines at every sleep/wake switch in view
+    markers = schedule.switches(t0, t1)
+
+    if renderer == "Plotly (interactive)":
+        st.plotly_chart(plotly_panels(t, sol, ['Brain', 'Plasma'], (t0, t1), markers), use_container_width=True)
+        return
+
+    # One figure per compartment, redrawn only when an input or the window changes
+    key = (__name__, args, schedule.key(), start, solver, t0, t1)
+    for i, label in enumerate(['Brain', 'Plasma']):
+        show(key + (label,), lambda: line_panels([(*decimate(t, sol[:, i], t0, t1), label)], (t0, t1), markers,
+                                                 ylabels=(f"{label} Concentration",)))
 
 if __name__ == "__main__":
     sim()
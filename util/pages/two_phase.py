@@ -1,7 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.integrate import odeint
 import streamlit as st
+from util.newton import seeds
+from util.phase_plane import STYLES, draw_equilibria, draw_field, draw_nullclines, draw_trajectories, trajectories
+from util.render import figure, show
+from util.stability import classify
 
 # Parameters
 A_wake = 9.992750
@@ -16,7 +18,7 @@ B_sleep = A_sleep / (a * a12_wake)
 P_wake = A_wake / k
 P_sleep = A_sleep / k
 
-# Function to compute the vector field
+# Function to compute the vector field; y may hold whole grids of states
 def model(y, t, state='wake'):
     if state == 'wake':
         A = A_wake
@@ -25,28 +27,39 @@ def model(y, t, state='wake'):
         A = A_sleep
         a12 = a * a12_wake
     
-    dydt = np.zeros((2,))
-    dydt[0] = A - a12 * y[0]
-    dydt[1] = a12 * y[0] - k * y[1]
-    return dydt
+    B, P = y
+    return np.array([A - a12 * B,
+                     a12 * B - k * P])
 
 # Function to plot the phase plane
-def plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label, title):
+def plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label, title, style='Quiver',
+                     nullclines=False, n_trajectories=0, t_end=24.0):
     Y1, Y2 = np.meshgrid(y1_range, y2_range)
-    U, V = np.zeros(Y1.shape), np.zeros(Y2.shape)
+    U, V = model([Y1, Y2], 0, state=state)
     
-    for i in range(Y1.shape[0]):
-        for j in range(Y1.shape[1]):
-            y = [Y1[i, j], Y2[i, j]]
-            dydt = model(y, 0, state=state)
-            U[i, j] = dydt[0]
-            V[i, j] = dydt[1]
-    
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.quiver(Y1, Y2, U, V, width=0.002, color='r' if state == 'wake' else 'b')
+    fig, ax = figure((10, 6))
+    mesh = draw_field(ax, Y1, Y2, U, V, style=style, color='r' if state == 'wake' else 'b')
+    if mesh is not None:
+        fig.colorbar(mesh, ax=ax, label='Speed')
+    if nullclines:
+        draw_nullclines(ax, Y1, Y2, U, V, (y1_label, y2_label))
+    box = [(y1_range[0], y1_range[-1]), (y2_range[0], y2_range[-1])]
+    if n_trajectories:
+        # Every trajectory at once, the model being vectorized
+        draw_trajectories(ax, trajectories(lambda y: model(y, 0, state), seeds(box, n_trajectories), t_end, bounds=box))
+        ax.set_xlim(*box[0])
+        ax.set_ylim(*box[1])
+
+    # Equilibrium and its type from the eigenvalues of the (linear) model
+    B, P = (B_wake, P_wake) if state == 'wake' else (B_sleep, P_sleep)
+    J = model(np.eye(2), 0, state) - model(np.zeros((2, 1)), 0, state)
+    if box[0][0] <= B <= box[0][1] and box[1][0] <= P <= box[1][1]:
+        draw_equilibria(ax, [(B, P)], classify(np.linalg.eigvals(J)[None]))
     ax.set_title(title)
     ax.set_xlabel(f'{y1_label} Concentration')
     ax.set_ylabel(f'{y2_label} Concentration')
+    if ax.get_legend_handles_labels()[0]:
+        ax.legend()
     
     return fig
 
@@ -56,8 +69,8 @@ def two_phase():
     
     # Sidebar controls
     state = st.sidebar.radio("State", ('wake', 'sleep'), index=0)
-    y1_label = st.sidebar.selectbox("Y1 Axis", ('Brain'))
-    y2_label = st.sidebar.selectbox("Y2 Axis", ('Plasma'))
+    y1_label = st.sidebar.selectbox("Y1 Axis", ('Brain',))
+    y2_label = st.sidebar.selectbox("Y2 Axis", ('Plasma',))
 
     # User input for axes ranges
     y1_min = st.sidebar.number_input(f"{y1_label} Min", value=-10.0)
@@ -65,15 +78,24 @@ def two_phase():
     y2_min = st.sidebar.number_input(f"{y2_label} Min", value=0.0)
     y2_max = st.sidebar.number_input(f"{y2_label} Max", value=60.0)
 
+    # Grid density and rendering
+    grid_points = st.sidebar.number_input("Grid points per axis", value=20, min_value=5, max_value=2000, step=5)
+    style = st.sidebar.selectbox("Style", STYLES)
+    nullclines = st.sidebar.checkbox("Nullclines", value=True)
+    n_trajectories = st.sidebar.number_input("Trajectories", value=100, min_value=0, max_value=5000, step=50)
+    t_end = st.sidebar.number_input("Integration time (hr)", value=24.0, min_value=0.1)
+
     # Range for plotting
-    y1_range = np.linspace(y1_min, y1_max, 20)
-    y2_range = np.linspace(y2_min, y2_max, 20)
+    y1_range = np.linspace(y1_min, y1_max, grid_points)
+    y2_range = np.linspace(y2_min, y2_max, grid_points)
     
     # Plot phase plane
-    fig = plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label,
-                           f"Phase Plane Plot ({y1_label} vs {y2_label}, {state.capitalize()} State)")
-    
-    st.pyplot(fig)
+    draw = lambda: plot_phase_plane(y1_range, y2_range, state, y1_label, y2_label,
+                                    f"Phase Plane Plot ({y1_label} vs {y2_label}, {state.capitalize()} State)",
+                                    style=style, nullclines=nullclines, n_trajectories=n_trajectories, t_end=t_end)
+    # The figure is redrawn only when a control changes
+    show((__name__, state, y1_label, y2_label, y1_min, y1_max, y2_min, y2_max, grid_points, style, nullclines,
+          n_trajectories, t_end), draw)
     
 if __name__ == '__main__':
     two_phase()
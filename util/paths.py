@@ -0,0 +1,6 @@
+import os
+
+# Compiled kernels and cached results are written under this directory
+CACHE_DIR = os.environ.get("DSA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dsa"))
+# Secret that signs cached kernels; kept outside CACHE_DIR so write access there is not enough to forge one
+KEY_FILE = os.environ.get("DSA_KEY_FILE", os.path.join(os.path.expanduser("~"), ".config", "dsa", "cache.key"))
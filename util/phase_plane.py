@@ -0,0 +1,116 @@
+import numpy as np
+
+from util import instrument
+
+# Rendering styles offered by the phase-plane pages
+STYLES = ('Quiver', 'Streamlines', 'Speed')
+
+# Arrows beyond this many per axis only blacken the plot
+MAX_ARROWS = 40
+
+
+def draw_field(ax, Y1, Y2, U, V, style='Quiver', color='r'):
+    # Draw a vector field evaluated on a meshgrid in one of the STYLES
+    if style == 'Quiver':
+        step = max(1, int(np.ceil(Y1.shape[0] / MAX_ARROWS)))
+        ax.quiver(Y1[::step, ::step], Y2[::step, ::step], U[::step, ::step], V[::step, ::step],
+                  width=0.002, color=color)
+        return None
+
+    speed = np.hypot(U, V)
+    if style == 'Streamlines':
+        ax.streamplot(Y1, Y2, U, V, density=1.5, color=color, linewidth=0.8)
+        return None
+
+    # Speed: shaded magnitude underneath streamlines colored by the same scale
+    mesh = ax.pcolormesh(Y1, Y2, speed, shading='auto', cmap='viridis', alpha=0.6)
+    ax.streamplot(Y1, Y2, U, V, density=1.5, color=speed, cmap='viridis', linewidth=0.8)
+    return mesh
+
+
+@instrument.timed("trajectories")
+def trajectories(field, seeds, t_end, steps=400, bounds=None, margin=0.25):
+    """Classical RK4 from every seed at once; field maps states (n, batch) to rates (n, batch).
+
+    Returns (steps + 1, n, batch). A negative t_end integrates backwards. Trajectories
+    that leave the bounds (widened by margin on every side) or blow up become NaN
+    from then on and are no longer evaluated.
+    """
+    h = t_end / steps
+    y = np.array(seeds, dtype=float)
+    X = np.full((steps + 1,) + y.shape, np.nan)
+    X[0] = y
+    alive = np.all(np.isfinite(y), axis=0)
+    if bounds is not None:
+        lower, upper = np.asarray(bounds, dtype=float).T
+        pad = margin * (upper - lower)
+        lower, upper = (lower - pad)[:, None], (upper + pad)[:, None]
+
+    taken, evaluations = 0, 0
+    with np.errstate(all='ignore'):
+        for i in range(steps):
+            if not alive.any():
+                break
+            ya = y[:, alive]
+            taken += 1
+            evaluations += 4 * ya.shape[1]
+            k1 = field(ya)
+            k2 = field(ya + 0.5 * h * k1)
+            k3 = field(ya + 0.5 * h * k2)
+            k4 = field(ya + h * k3)
+            ya = ya + h / 6.0 * (k1 + 2 * k2 + 2 * k3 + k4)
+            keep = np.all(np.isfinite(ya), axis=0)
+            if bounds is not None:
+                keep &= np.all((ya >= lower) & (ya <= upper), axis=0)
+            index = np.flatnonzero(alive)
+            y[:, index] = ya
+            X[i + 1][:, index[keep]] = ya[:, keep]
+            alive[index[~keep]] = False
+    instrument.count(rk4_steps=taken, rhs_evaluations=evaluations)
+    return X
+
+
+def draw_trajectories(ax, X, i=0, j=1, color='k'):
+    # All trajectories as one LineCollection, with one arrow head halfway along each
+    from matplotlib.collections import LineCollection
+
+    segments = np.moveaxis(X[:, [i, j], :], 2, 0)
+    ax.add_collection(LineCollection(list(segments), colors=color, linewidths=0.6, alpha=0.7))
+    mid = (np.isfinite(segments[..., 0]).sum(axis=1) - 1) // 2
+    ok = mid >= 1
+    rows = np.flatnonzero(ok)
+    head, tail = segments[rows, mid[ok]], segments[rows, mid[ok] - 1]
+    direction = head - tail
+    length = np.hypot(*direction.T)
+    direction = direction / np.where(length > 0, length, 1.0)[:, None]
+    ax.quiver(head[:, 0], head[:, 1], direction[:, 0], direction[:, 1], color=color, angles='xy',
+              pivot='mid', scale=60, width=0.0015, headwidth=5, headlength=6, alpha=0.7)
+
+
+def draw_nullclines(ax, Y1, Y2, U, V, labels=('y1', 'y2')):
+    # Zero contours of each component of the field evaluated on the grid
+    for Z, color, label in ((U, 'tab:orange', labels[0]), (V, 'tab:green', labels[1])):
+        if np.nanmin(Z) < 0 < np.nanmax(Z):
+            ax.contour(Y1, Y2, Z, levels=[0.0], colors=color, linewidths=2.0)
+            ax.plot([], [], color=color, linewidth=2.0, label=f"{label} nullcline")
+
+
+# Marker of each stability type from util.stability.classify
+EQUILIBRIUM_MARKERS = {
+    'stable node': dict(marker='o', color='k'),
+    'stable focus': dict(marker='o', color='tab:blue'),
+    'unstable node': dict(marker='o', color='w', markeredgecolor='k'),
+    'unstable focus': dict(marker='o', color='w', markeredgecolor='tab:blue'),
+    'saddle': dict(marker='X', color='tab:red'),
+    'non-hyperbolic': dict(marker='s', color='tab:purple'),
+    'undefined': dict(marker='s', color='tab:gray'),
+}
+
+
+def draw_equilibria(ax, points, kinds):
+    # points has shape (count, 2); one legend entry per stability type
+    shown = set()
+    for (x, y), kind in zip(points, kinds):
+        ax.plot(x, y, linestyle='none', markersize=10, zorder=5, **EQUILIBRIUM_MARKERS[kind],
+                label=None if kind in shown else kind)
+        shown.add(kind)
@@ -0,0 +1,96 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from util import instrument
+
+
+@dataclass
+class Artifact:
+    stage: str
+    key: str        # digest of the stage name and its inputs
+    value: object
+
+
+def _update(h, value):
+    # Artifacts enter a key through their own key, never through their value
+    if isinstance(value, Artifact):
+        h.update(b"A" + value.key.encode())
+    elif isinstance(value, np.ndarray) and value.dtype == object:
+        # The buffer of an object array holds pointers, so hash the elements
+        h.update(b"O" + f"{value.shape}".encode())
+        _update(h, value.ravel().tolist())
+    elif isinstance(value, np.ndarray):
+        h.update(b"N" + f"{value.dtype.str}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(b"D%d" % len(value))
+        for k in sorted(value, key=repr):
+            _update(h, k)
+            _update(h, value[k])
+    elif isinstance(value, (list, tuple)):
+        h.update(b"L%d" % len(value))
+        for item in value:
+            _update(h, item)
+    else:
+        h.update(b"R" + repr(value).encode())
+
+
+def fingerprint(value):
+    h = hashlib.sha256()
+    _update(h, value)
+    return h.hexdigest()[:20]
+
+
+class Pipeline:
+    """Memoized stages of an analysis, each cached on the inputs of its own stage.
+
+    Inputs are plain values or artifacts of earlier stages. An artifact stands in by its
+    key, so changing one input recomputes only the stages downstream of it. Every stage
+    keeps its `size` most recent results.
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self._cache = {}
+        self.stats = {}
+        self.last = {}     # stage -> seconds spent in the current rerun, None when cached
+
+    def run(self, stage, func, *inputs):
+        key = fingerprint((stage, inputs))
+        cache = self._cache.setdefault(stage, OrderedDict())
+        stats = self.stats.setdefault(stage, {"hits": 0, "misses": 0, "seconds": 0.0})
+        if key in cache:
+            cache.move_to_end(key)
+            stats["hits"] += 1
+            self.last.setdefault(stage, None)
+            instrument.count(pipeline_hits=1)
+            return Artifact(stage, key, cache[key])
+
+        began = time.perf_counter()
+        value = func(*(a.value if isinstance(a, Artifact) else a for a in inputs))
+        elapsed = time.perf_counter() - began
+        cache[key] = value
+        while len(cache) > self.size:
+            cache.popitem(last=False)
+        stats["misses"] += 1
+        stats["seconds"] += elapsed
+        instrument.record(stage, elapsed)
+        instrument.count(pipeline_misses=1)
+        self.last[stage] = (self.last.get(stage) or 0.0) + elapsed
+        return Artifact(stage, key, value)
+
+    def new_run(self):
+        # Call at the top of a rerun so `summary` covers that rerun only
+        self.last.clear()
+
+    def summary(self):
+        return " · ".join(f"{stage}: cached" if seconds is None else f"{stage}: {1000 * seconds:.0f} ms"
+                          for stage, seconds in self.last.items())
+
+    def clear(self):
+        self._cache.clear()
+        self.last.clear()
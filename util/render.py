@@ -0,0 +1,165 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from util import instrument
+from util.pipeline import fingerprint
+
+# Encoded figures kept per process; the oldest are evicted past this many bytes
+CACHE_BYTES = int(os.environ.get("DSA_FIGURE_CACHE_BYTES", 64 * 2**20))
+FORMAT = os.environ.get("DSA_FIGURE_FORMAT", "png")
+DPI = 200
+# Layouts whose figure and axes are kept for reuse
+TEMPLATES = 16
+
+# Matplotlib is not thread-safe and Streamlit serves every session from its own thread
+lock = threading.RLock()
+
+
+def figure(figsize, nrows=1, ncols=1, **subplots):
+    """A Figure outside pyplot's registry and its axes; nothing holds it after rendering.
+
+    pyplot keeps every figure it creates until it is closed, which long-lived workers never do.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots(nrows, ncols, **subplots)
+
+
+def encode(fig, fmt=None, dpi=DPI):
+    # PNG as bytes or SVG as text, cropped as st.pyplot would
+    fmt = fmt or FORMAT
+    buf = io.BytesIO()
+    with lock:
+        fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+    data = buf.getvalue()
+    return data.decode() if fmt == 'svg' else data
+
+
+class FigureCache:
+    """LRU cache of encoded figures by content key, bounded in bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._items:
+                self._size -= len(self._items.pop(key))
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self._size -= len(old)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._items), "bytes": self._size}
+
+
+# One cache per server process, shared by every session
+figures = FigureCache()
+instrument.register_cache("figures", figures.stats)
+
+
+def rendered(key, draw, fmt=None, dpi=DPI):
+    """Encoded figure for a content key; draw() -> Figure runs only when the key is new.
+
+    The key must cover everything the figure shows, e.g. the inputs that produced its data.
+    """
+    fmt = fmt or FORMAT
+    full_key = fingerprint((key, fmt, dpi))
+    data = figures.get(full_key)
+    if data is None:
+        with lock, instrument.stage("render"):
+            data = encode(draw(), fmt, dpi)
+        figures.put(full_key, data)
+    return data
+
+
+def show(key, draw, fmt=None, container=None):
+    # Display a cached figure in a Streamlit container; repeated views skip drawing and rasterizing
+    import streamlit as st
+
+    (container or st).image(rendered(key, draw, fmt))
+
+
+_templates = OrderedDict()
+
+
+def template(layout, build):
+    """Figure and artists for a layout, built once by build() and reused while only data changes.
+
+    build() returns (fig, artists). Callers update the artists' data and render while
+    holding `lock`, as draw functions passed to rendered() do, and must not keep the
+    figure: the next caller with the same layout draws on it.
+    """
+    with lock:
+        if layout in _templates:
+            _templates.move_to_end(layout)
+            return _templates[layout]
+        _templates[layout] = built = build()
+        while len(_templates) > TEMPLATES:
+            _templates.popitem(last=False)
+        return built
+
+
+def line_panels(series, window, markers=(), ylabels=(), xlabel="Time (hr)", height=4.0, width=12.0):
+    """Stacked panels sharing the time axis, one (x, y, label) per panel, drawn on a reused figure.
+
+    Dashed vertical markers are drawn on every panel. Returns the figure, valid until the
+    next call with the same layout; use it from a draw function passed to rendered().
+    """
+    from matplotlib.collections import LineCollection
+
+    n = len(series)
+
+    def build():
+        fig, axes = figure((width, height * n), n, 1, sharex=True, squeeze=False)
+        # Fixed spacing: tight_layout would measure the tick labels of the previous data
+        fig.subplots_adjust(hspace=0.25)
+        artists = []
+        for ax in axes[:, 0]:
+            line, = ax.plot([], [], linewidth=2.0)
+            switches = LineCollection([], colors='gray', linestyles='dashed', linewidths=1,
+                                      transform=ax.get_xaxis_transform())
+            ax.add_collection(switches)
+            ax.tick_params(axis='y', labelsize=12)
+            ax.set_xlabel(xlabel, fontsize=15)
+            artists.append((ax, line, switches))
+        return fig, artists
+
+    fig, artists = template(('line_panels', n, width, height, xlabel), build)
+    segments = [[(x, 0.0), (x, 1.0)] for x in markers]
+    for (ax, line, switches), (x, y, label), ylabel in zip(artists, series, list(ylabels) + [None] * n):
+        line.set_data(x, y)
+        line.set_label(label)
+        switches.set_segments(segments)
+        ax.set_ylabel(ylabel or label, fontsize=15)
+        ax.set_xlim(*window)
+        # Rescale y to the new data only
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+        ax.legend()
+    return fig
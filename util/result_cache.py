@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from util import instrument
+from util.paths import CACHE_DIR
+
+# Results are shared by every worker through this directory
+RESULT_DIR = os.path.join(CACHE_DIR, "results")
+DISK_BYTES = int(os.environ.get("DSA_RESULT_CACHE_BYTES", 512 * 2**20))
+MEMORY_BYTES = int(os.environ.get("DSA_RESULT_MEMORY_BYTES", 128 * 2**20))
+
+
+def result_key(model, params, t, y0):
+    # Model identity plus every input that changes the trajectory
+    h = hashlib.sha256(str(model).encode())
+    for part in (params, t, y0):
+        a = np.ascontiguousarray(np.asarray(part, dtype=float))
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:32]
+
+
+class ResultCache:
+    """Two-level LRU cache of simulation results: arrays in memory, .npy files on disk."""
+
+    def __init__(self, directory=RESULT_DIR, disk_bytes=DISK_BYTES, memory_bytes=MEMORY_BYTES):
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def _remember(self, key, value):
+        # Caller holds the lock; memory-mapped arrays cost almost nothing to keep
+        size = 0 if isinstance(value, np.memmap) else value.nbytes
+        if key in self._memory:
+            old = self._memory.pop(key)
+            self._memory_size -= 0 if isinstance(old, np.memmap) else old.nbytes
+        self._memory[key] = value
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= 0 if isinstance(old, np.memmap) else old.nbytes
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        path = self._path(key)
+        try:
+            value = np.load(path, mmap_mode='r')
+            # The file's mtime is the shared recency used for disk eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self._remember(key, value)
+            self.hits += 1
+            self.disk_hits += 1
+        return value
+
+    def put(self, key, value):
+        value = np.asarray(value)
+        with self._lock:
+            self._remember(key, value)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write then rename so other workers never map a partial file
+            tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, value)
+            os.replace(tmp, self._path(key))
+            self._evict()
+        except OSError:
+            pass
+        return value
+
+    def _evict(self):
+        # Delete least recently used files until the directory fits its budget
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except OSError:
+                pass
+
+    def get_or_compute(self, model, params, t, y0, compute):
+        key = result_key(model, params, t, y0)
+        value = self.get(key)
+        if value is None:
+            with instrument.stage("simulate"):
+                value = compute()
+            value = self.put(key, value)
+        return value
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "memory_entries": len(self._memory), "memory_bytes": self._memory_size}
+
+
+# One cache per server process, sharing its files with the other workers
+results = ResultCache()
+instrument.register_cache("results", results.stats)
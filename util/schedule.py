@@ -0,0 +1,148 @@
+import numpy as np
+
+# Default protocol of the compartment models: asleep from 0 to 8 h, awake from 8 to 24 h of every day
+DAY = 24.0
+WAKE_ONSET = 8.0
+STATES = ('sleep', 'wake')
+
+
+class Schedule:
+    """Piecewise-constant sleep/wake protocol.
+
+    times are the sorted breakpoints, each starting a stretch in the matching state. With a
+    period the pattern repeats from times[0] = 0; without one the first state extends
+    back to -inf and the last forward to +inf. Lookups are binary searches of the index.
+    """
+
+    def __init__(self, times, states, period=None):
+        times = np.asarray(times, dtype=float)
+        codes = np.array([STATES.index(s) for s in states])
+        if len(times) == 0 or len(times) != len(codes):
+            raise ValueError("a schedule needs one state per breakpoint")
+        order = np.argsort(times, kind='stable')
+        times, codes = times[order], codes[order]
+        # Of several states given for one instant the last one holds
+        last = np.append(times[1:] != times[:-1], True)
+        times, codes = times[last], codes[last]
+        if period is not None:
+            if times[0] != 0 or times[-1] >= period:
+                raise ValueError("breakpoints of a periodic schedule must lie in [0, period) and start at 0")
+        # Consecutive stretches in the same state are one stretch
+        keep = np.concatenate([[True], np.diff(codes) != 0])
+        self.times = times[keep]
+        self.codes = codes[keep]
+        self.period = None if period is None else float(period)
+        # Breakpoints where the state really changes; a repeating pattern may end in the state it starts with
+        if self.period is None:
+            self._switching = self.times[1:]
+        else:
+            self._switching = self.times[self.codes != np.roll(self.codes, 1)]
+
+    def __repr__(self):
+        pairs = ", ".join(f"{t:g} {STATES[c]}" for t, c in zip(self.times, self.codes))
+        return f"Schedule([{pairs}], period={self.period})"
+
+    def key(self):
+        # Hashable identity, for caches; plain floats print at full precision, unlike repr()
+        return (tuple(self.times.tolist()), tuple(self.codes.tolist()), self.period)
+
+    def index(self, t):
+        # Stretch containing t, by binary search of the breakpoints
+        if self.period is not None:
+            t = np.mod(t, self.period)
+        return np.maximum(np.searchsorted(self.times, t, side='right') - 1, 0)
+
+    def codes_at(self, t):
+        return self.codes[self.index(t)]
+
+    def state_at(self, t):
+        if np.ndim(t) == 0:
+            return STATES[self.codes[self.index(t)]]
+        return np.array(STATES)[self.codes_at(t)]
+
+    def awake(self, t):
+        return self.codes_at(t) == 1
+
+    def switches(self, t0, t1):
+        """Times in (t0, t1) at which the state changes."""
+        if self.period is None:
+            candidates = self._switching
+        else:
+            first, last = np.floor(t0 / self.period), np.ceil(t1 / self.period)
+            offsets = np.arange(first, last + 1)[:, None] * self.period
+            candidates = (offsets + self._switching[None, :]).ravel()
+        return candidates[(candidates > t0) & (candidates < t1)]
+
+    def blocks(self, t0, t1):
+        """Split [t0, t1] at every switch; returns block starts, ends and state names."""
+        switches = self.switches(t0, t1)
+        starts = np.concatenate([[t0], switches])
+        ends = np.concatenate([switches, [t1]])
+        states = np.array(STATES)[self.codes_at(0.5 * (starts + ends))]
+        return starts, ends, states
+
+    @classmethod
+    def daily(cls, sleep_onset=0.0, sleep_hours=WAKE_ONSET, day=DAY):
+        # Same sleep window every day, e.g. night shifts with daytime sleep
+        onset = sleep_onset % day
+        end = (onset + sleep_hours) % day
+        if sleep_hours <= 0:
+            return cls([0.0], ['wake'], day)
+        if sleep_hours >= day:
+            return cls([0.0], ['sleep'], day)
+        if onset < end:
+            return cls([0.0, onset, end], ['wake', 'sleep', 'wake'], day)
+        return cls([0.0, end, onset], ['sleep', 'wake', 'sleep'], day)
+
+    @classmethod
+    def from_days(cls, days, day=DAY):
+        """Non-repeating protocol from a list with one (sleep onset, sleep hours) pair per day.
+
+        Sleep that runs past midnight continues into the next day; hours <= 0 is a night
+        without sleep. After the last day the final state continues.
+        """
+        merged = []
+        for i, (onset, hours) in enumerate(days):
+            start, end = i * day + onset, i * day + onset + hours
+            if hours <= 0:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        times, states = [0.0], ['wake']
+        for start, end in merged:
+            if start <= times[-1]:
+                states[-1] = 'sleep'
+            else:
+                times.append(start)
+                states.append('sleep')
+            times.append(end)
+            states.append('wake')
+        return cls(times, states)
+
+    @classmethod
+    def from_text(cls, text):
+        """Lines 'hour state', plus an optional line 'period hours'; blank lines and # comments skipped."""
+        times, states, period = [], [], None
+        for number, line in enumerate(text.split('\n'), start=1):
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            first, _, second = line.partition(' ')
+            second = second.strip().lower()
+            try:
+                if first.lower() == 'period':
+                    period = float(second)
+                    continue
+                if second not in STATES:
+                    raise ValueError(second)
+                times.append(float(first))
+                states.append(second)
+            except ValueError as e:
+                raise ValueError(f"line {number}: cannot read {line!r}") from e
+        return cls(times, states, period)
+
+
+# The protocol the compartment models were built for
+DAILY = Schedule.daily()
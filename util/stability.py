@@ -0,0 +1,20 @@
+import numpy as np
+
+
+def classify(eigenvalues, tol=1e-9):
+    """Stability type of each equilibrium from its eigenvalues, batched over leading axes."""
+    eigenvalues = np.asarray(eigenvalues, dtype=complex)
+    real = eigenvalues.real
+    oscillating = np.any(np.abs(eigenvalues.imag) > tol, axis=-1)
+    negative = np.all(real < -tol, axis=-1)
+    positive = np.all(real > tol, axis=-1)
+    hyperbolic = np.all(np.abs(real) > tol, axis=-1)
+
+    kind = np.full(real.shape[:-1], 'saddle', dtype=object)
+    kind[negative & ~oscillating] = 'stable node'
+    kind[negative & oscillating] = 'stable focus'
+    kind[positive & ~oscillating] = 'unstable node'
+    kind[positive & oscillating] = 'unstable focus'
+    kind[~hyperbolic] = 'non-hyperbolic'
+    kind[~np.all(np.isfinite(eigenvalues), axis=-1)] = 'undefined'
+    return kind
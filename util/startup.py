@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+# Libraries whose import cost is reported on its own
+HEAVY = ('sympy', 'scipy', 'matplotlib', 'matplotlib.pyplot', 'plotly', 'PIL', 'pandas', 'numpy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module, preload=('streamlit',), python=sys.executable):
+    """Import cost in seconds of a module and of the heavy libraries it pulls in, from -X importtime.
+
+    The import runs in a fresh interpreter after the preload modules, which a running
+    server already has, so the numbers are what opening the page costs a new worker.
+    Returns {name: cumulative seconds} for the module itself and for every heavy library
+    or public scipy subpackage it was first to import.
+    """
+    code = "".join(f"import {name}; " for name in preload) + f"import {module}"
+    result = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=ROOT, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    preloaded = True
+    times = {}
+    for line in result.stderr.splitlines():
+        # 'import time: self [us] | cumulative | imported package', children before parents
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if preloaded:
+            preloaded = name not in preload or name != preload[-1]
+            continue
+        scipy_subpackage = name.startswith('scipy.') and name.count('.') == 1 and not name.startswith('scipy._')
+        if name == module or name in HEAVY or scipy_subpackage:
+            times[name] = int(cumulative) / 1e6
+    return times
+
+
+def page_modules():
+    pages = os.path.join(ROOT, "util", "pages")
+    return sorted(f"util.pages.{name[:-3]}" for name in os.listdir(pages) if name.endswith(".py"))
+
+
+def report(modules, preload=('streamlit',), threshold=0.005):
+    # One row per module: its own import time and the heavy libraries above threshold seconds it brings in
+    rows = []
+    for module in modules:
+        times = import_times(module, preload)
+        rows.append({"module": module, "total (ms)": round(1000 * times.pop(module, 0.0), 1),
+                     "libraries": ", ".join(f"{name} {1000 * s:.0f} ms"
+                                            for name, s in sorted(times.items(), key=lambda item: -item[1])
+                                            if s >= threshold)})
+    return rows
+
+
+if __name__ == "__main__":
+    for row in report(sys.argv[1:] or page_modules()):
+        print(f"{row['module']:40s} {row['total (ms)']:9.1f} ms   {row['libraries']}")
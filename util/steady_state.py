@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.linalg import expm
+
+from util import instrument
+from util.propagator import augmented, propagate
+from util.schedule import DAILY
+
+
+@dataclass
+class PeriodicOrbit:
+    t: np.ndarray            # one period of sample times, starting at t0
+    y: np.ndarray            # trajectory on t, shape (len(t), n)
+    y0: np.ndarray           # periodic state at t0 (and t0 + period)
+    converged: bool
+    iterations: int
+    residual: float          # |P(y0) - y0| for the period map P
+    multipliers: np.ndarray  # Floquet multipliers, eigenvalues of dP/dy0
+
+
+def _grid(t0, period, dt):
+    # Samples of one period, ending exactly at t0 + period even when dt does not divide it
+    t = t0 + dt * np.arange(max(int(round(period / dt)), 1) + 1)
+    t[-1] = t0 + period
+    return t
+
+
+def _period(schedule, period):
+    # A periodic steady state needs a repeating protocol
+    period = schedule.period if period is None else period
+    if period is None:
+        raise ValueError("the schedule does not repeat, so it has no periodic steady state")
+    return period
+
+
+def monodromy(systems, period=None, t0=0.0, schedule=DAILY):
+    # Period map y -> Phi y + c of the linear system as one augmented matrix
+    period = _period(schedule, period)
+    n = len(next(iter(systems.values()))[1])
+    G = {state: augmented(M, b) for state, (M, b) in systems.items()}
+    total = np.eye(n + 1)
+    for start, end, state in zip(*schedule.blocks(t0, t0 + period)):
+        total = expm(G[state] * (end - start)) @ total
+    return total[:n, :n], total[:n, n]
+
+
+@instrument.timed("steady state")
+def periodic_linear(systems, period=None, t0=0.0, dt=0.01, schedule=DAILY):
+    """Entrained cycle of a piecewise-linear model as the fixed point of its period map."""
+    period = _period(schedule, period)
+    Phi, c = monodromy(systems, period, t0, schedule)
+    n = len(c)
+    y0 = np.linalg.solve(np.eye(n) - Phi, c)
+    residual = float(np.linalg.norm(Phi @ y0 + c - y0))
+    multipliers = np.linalg.eigvals(Phi)
+    t = _grid(t0, period, dt)
+    y = propagate(systems, y0, t, schedule=schedule)
+    converged = bool(np.all(np.abs(multipliers) < 1.0))
+    return PeriodicOrbit(t, y, y0, converged, 1, residual, multipliers)
+
+
+def _period_map(rhs, y0, t0, period, method, rtol, atol, schedule):
+    # Restart the integrator at every switch so the forcing jumps are not stepped over
+    from scipy.integrate import solve_ivp
+
+    y = np.asarray(y0, dtype=float)
+    for start, end, _ in zip(*schedule.blocks(t0, t0 + period)):
+        sol = solve_ivp(rhs, (start, end), y, method=method, rtol=rtol, atol=atol)
+        instrument.count(nfev=sol.nfev, njev=sol.njev, nlu=sol.nlu, segments=1)
+        y = sol.y[:, -1]
+    return y
+
+
+def _period_jacobian(rhs, y0, Py, t0, period, method, rtol, atol, schedule):
+    # Finite-difference Jacobian of the period map, one column per state
+    n = len(y0)
+    DP = np.empty((n, n))
+    for j in range(n):
+        h = 1e-6 * max(1.0, abs(y0[j]))
+        y_h = y0.copy()
+        y_h[j] += h
+        DP[:, j] = (_period_map(rhs, y_h, t0, period, method, rtol, atol, schedule) - Py) / h
+    return DP
+
+
+@instrument.timed("steady state")
+def periodic_shooting(rhs, y_guess, period=None, t0=0.0, dt=0.01, tol=1e-8, max_iter=50,
+                      method='LSODA', rtol=1e-9, atol=1e-11, schedule=DAILY):
+    """Periodic orbit of a nonlinear system dy/dt = rhs(t, y) by Newton shooting on the period map.
+
+    The Floquet multipliers of a converged orbit come from the last Jacobian of the period
+    map, which Newton computed one step before y0; it is only evaluated at y0 when the guess
+    already converged, or when the iterations ran out.
+    """
+    from scipy.integrate import solve_ivp
+
+    if max_iter < 1:
+        raise ValueError("max_iter must be at least 1")
+    period = _period(schedule, period)
+    y0 = np.asarray(y_guess, dtype=float)
+    n = len(y0)
+    DP = None
+    converged = False
+
+    for iteration in range(1, max_iter + 1):
+        Py = _period_map(rhs, y0, t0, period, method, rtol, atol, schedule)
+        F = Py - y0
+        residual = float(np.linalg.norm(F))
+        if residual < tol * max(1.0, np.linalg.norm(y0)):
+            converged = True
+            break
+
+        DP = _period_jacobian(rhs, y0, Py, t0, period, method, rtol, atol, schedule)
+        step = np.linalg.solve(DP - np.eye(n), -F)
+        # Damp the Newton step until the residual decreases
+        damping = 1.0
+        while damping > 1e-4:
+            y_new = y0 + damping * step
+            F_new = _period_map(rhs, y_new, t0, period, method, rtol, atol, schedule) - y_new
+            if np.linalg.norm(F_new) < residual:
+                break
+            damping *= 0.5
+        y0 = y_new
+
+    if not converged:
+        # Out of iterations: describe the last step's point, not the one before it
+        Py = _period_map(rhs, y0, t0, period, method, rtol, atol, schedule)
+        residual = float(np.linalg.norm(Py - y0))
+        DP = None
+    if DP is None:
+        DP = _period_jacobian(rhs, y0, Py, t0, period, method, rtol, atol, schedule)
+    multipliers = np.linalg.eigvals(DP)
+
+    t = _grid(t0, period, dt)
+    y = np.full((len(t), n), np.nan)
+    y[0] = y0
+    y_k = y0
+    for start, end, _ in zip(*schedule.blocks(t0, t0 + period)):
+        inside = (t > start) & (t <= end)
+        ivp = solve_ivp(rhs, (start, end), y_k, method=method, rtol=rtol, atol=atol,
+                        dense_output=True)
+        instrument.count(nfev=ivp.nfev, njev=ivp.njev, nlu=ivp.nlu, segments=1)
+        y[inside] = ivp.sol(t[inside]).T
+        y_k = ivp.y[:, -1]
+    return PeriodicOrbit(t, y, y0, converged, iteration, residual, multipliers)
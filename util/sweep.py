@@ -0,0 +1,65 @@
+import numpy as np
+import sympy as sp
+from sympy.printing.numpy import NumPyPrinter
+
+
+def _cpow(base, exponent):
+    # Adding +0j turns a -0.0 imaginary part into +0.0, so negative reals stay on
+    # the principal branch exactly as SymPy evaluates them
+    return (np.asarray(base) + 0j) ** exponent
+
+
+class _PrincipalBranchPrinter(NumPyPrinter):
+    def _print_Pow(self, expr, rational=False):
+        if expr.exp.is_Integer:
+            return super()._print_Pow(expr, rational=rational)
+        return f"_cpow({self._print(expr.base)}, {self._print(expr.exp)})"
+
+
+def equilibrium_kernel(expression, parameters):
+    # Vectorized f(*parameter_arrays) for a symbolic equilibrium expression
+    symbols = [sp.Symbol(p) for p in parameters]
+    f = sp.lambdify(symbols, expression, modules=[{'_cpow': _cpow}, 'numpy'],
+                    printer=_PrincipalBranchPrinter, cse=True)
+
+    def evaluate(*values):
+        shape = np.broadcast_shapes(*(np.shape(v) for v in values)) if values else ()
+        # Closed forms such as Cardano's pass through complex intermediates
+        out = np.asarray(f(*(np.asarray(v, dtype=complex) for v in values)), dtype=complex)
+        out = np.broadcast_to(out, shape)
+        # Complex branches are not equilibria of the real system
+        real = np.where(np.abs(out.imag) <= 1e-9 * np.maximum(1.0, np.abs(out.real)), out.real, np.nan)
+        return real
+
+    return evaluate
+
+
+def sweep(point, parameters, values):
+    """Evaluate every coordinate of an equilibrium over whole parameter arrays at once.
+
+    point maps state symbols to expressions, values maps every parameter name to a
+    scalar or array; all arrays broadcast against each other.
+    """
+    args = [values[p] for p in parameters]
+    with np.errstate(all='ignore'):
+        return {var: f(*args) for var, f in point_kernels(point, parameters).items()}
+
+
+def point_kernels(point, parameters):
+    # One vectorized kernel per coordinate of an equilibrium, keyed by variable name
+    return {str(var): equilibrium_kernel(expr, parameters) for var, expr in point.items()}
+
+
+def max_real_eigenvalue(compiled, states, values):
+    # Largest real part of the Jacobian spectrum at each swept equilibrium
+    y = np.array(np.broadcast_arrays(*[states[v] for v in compiled.variables]))
+    p = np.array(np.broadcast_arrays(*[np.broadcast_to(values[name], y.shape[1:])
+                                       for name in compiled.parameters])) \
+        if compiled.parameters else np.empty((0,) + y.shape[1:])
+    J = compiled.jac(0.0, y, p)
+    J = np.moveaxis(J, (0, 1), (-2, -1))
+    finite = np.all(np.isfinite(J), axis=(-2, -1))
+    growth = np.full(J.shape[:-2], np.nan)
+    if finite.any():
+        growth[finite] = np.linalg.eigvals(J[finite]).real.max(axis=-1)
+    return growth
@@ -0,0 +1,64 @@
+import numpy as np
+
+# About two points per horizontal pixel of a 12-inch figure
+DEFAULT_POINTS = 2000
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the kept points."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Interior points are split into n_out - 2 buckets; the end points are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Averages of every bucket, used as the third triangle vertex
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area between the last kept point, each candidate and the next average
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def visible(t, t0, t1):
+    # Slice bounds of the samples inside [t0, t1], with one neighbour on each side
+    lo = max(int(np.searchsorted(t, t0, side='left')) - 1, 0)
+    hi = min(int(np.searchsorted(t, t1, side='right')) + 1, len(t))
+    return slice(lo, hi)
+
+
+def decimate(t, y, t0, t1, n_out=DEFAULT_POINTS):
+    """The part of y(t) inside [t0, t1], reduced to at most n_out shape-preserving points."""
+    window = visible(t, t0, t1)
+    tw, yw = np.asarray(t[window]), np.asarray(y[window])
+    keep = lttb(tw, yw, n_out)
+    return tw[keep], yw[keep]
+
+
+def plotly_panels(t, sol, labels, window, markers=(), n_out=DEFAULT_POINTS):
+    # Stacked interactive panels, one per column of sol, decimated to the window
+    from plotly.subplots import make_subplots
+    import plotly.graph_objects as go
+
+    fig = make_subplots(rows=len(labels), cols=1, shared_xaxes=True, vertical_spacing=0.04)
+    for row, label in enumerate(labels, start=1):
+        tw, yw = decimate(t, sol[:, row - 1], *window, n_out=n_out)
+        fig.add_trace(go.Scatter(x=tw, y=yw, mode='lines', name=label, line=dict(width=2)), row=row, col=1)
+        fig.update_yaxes(title_text=f"{label} Concentration", row=row, col=1)
+        for x in markers:
+            if window[0] <= x <= window[1]:
+                fig.add_vline(x=x, line=dict(color='gray', dash='dash', width=1), row=row, col=1)
+    fig.update_xaxes(range=list(window), title_text="Time (hr)", row=len(labels), col=1)
+    fig.update_layout(height=300 * len(labels), margin=dict(l=40, r=20, t=20, b=40))
+    return fig